@@ -1,6 +1,7 @@
 package com.example.backend_NextFare.model.entities;
 
 import com.example.backend_NextFare.model.enums.EventSource;
+import com.fasterxml.jackson.annotation.JsonIgnore;
 import jakarta.persistence.*;
 import lombok.AllArgsConstructor;
 import lombok.Builder;
@@ -48,6 +49,16 @@ public class Event {
     @Column(name = "longitude")
     private Double longitude;
 
+    // Written by the scraper, see GeoTiles
+    @JsonIgnore
+    @Column(name = "geo_tile", insertable = false, updatable = false)
+    private Integer geoTile;
+
+    // Set by the scraper's dedup stage on every copy but the canonical one
+    @JsonIgnore
+    @Column(name = "duplicate_of", insertable = false, updatable = false)
+    private Long duplicateOf;
+
     @Column(name = "tickets_sold")
     private Integer ticketsSold;
 
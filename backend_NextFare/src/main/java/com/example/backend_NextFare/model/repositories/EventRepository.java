@@ -12,19 +12,21 @@ import java.util.List;
 @Repository
 public interface EventRepository extends JpaRepository<Event, Long> {
 
-    @Query("SELECT e FROM Event e WHERE e.eventEndTime > :now ORDER BY e.eventEndTime ASC")
+    @Query("SELECT e FROM Event e WHERE e.eventEndTime > :now AND e.duplicateOf IS NULL ORDER BY e.eventEndTime ASC")
     List<Event> findActiveEvents(@Param("now") LocalDateTime now);
 
     /**
      * Find events within a geographical bounding box that are still active
      * and filters by given time range
      * 4 lines across the north, south, east, and west boundaries create the boundary box of where to search for active events
+     * Duplicate listings of an event are left out in favour of its canonical row
      */
     @Query("SELECT e FROM Event e WHERE " +
             "e.latitude BETWEEN :south AND :north AND " +
             "e.longitude BETWEEN :west AND :east AND " +
             "e.eventStartTime <= :endOfTimeRange AND " +
-            "e.eventEndTime >= :startOfTimeRange " +
+            "e.eventEndTime >= :startOfTimeRange AND " +
+            "e.duplicateOf IS NULL " +
             "ORDER BY e.eventStartTime ASC")
     List<Event> geoSearchActiveEvents(@Param("north") double north,
                                        @Param("south") double south,
@@ -33,4 +35,25 @@ public interface EventRepository extends JpaRepository<Event, Long> {
                                        @Param("startOfTimeRange") LocalDateTime startOfTimeRange,
                                        @Param("endOfTimeRange") LocalDateTime endOfTimeRange
     );
+
+    /**
+     * Same search restricted to the geo tiles covering the bounding box, so
+     * Postgres can use the (geo_tile, event_start_time, event_end_time) index
+     */
+    @Query("SELECT e FROM Event e WHERE " +
+            "e.geoTile IN :tiles AND " +
+            "e.latitude BETWEEN :south AND :north AND " +
+            "e.longitude BETWEEN :west AND :east AND " +
+            "e.eventStartTime <= :endOfTimeRange AND " +
+            "e.eventEndTime >= :startOfTimeRange AND " +
+            "e.duplicateOf IS NULL " +
+            "ORDER BY e.eventStartTime ASC")
+    List<Event> geoSearchActiveEventsInTiles(@Param("tiles") List<Integer> tiles,
+                                             @Param("north") double north,
+                                             @Param("south") double south,
+                                             @Param("east") double east,
+                                             @Param("west") double west,
+                                             @Param("startOfTimeRange") LocalDateTime startOfTimeRange,
+                                             @Param("endOfTimeRange") LocalDateTime endOfTimeRange
+    );
 }
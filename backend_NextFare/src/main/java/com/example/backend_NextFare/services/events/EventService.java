@@ -3,12 +3,15 @@ package com.example.backend_NextFare.services.events;
 import com.example.backend_NextFare.model.entities.Event;
 import com.example.backend_NextFare.model.repositories.EventRepository;
 import lombok.extern.slf4j.Slf4j;
+import org.springframework.data.redis.core.Cursor;
 import org.springframework.data.redis.core.RedisTemplate;
+import org.springframework.data.redis.core.ScanOptions;
 import org.springframework.http.ResponseEntity;
 import org.springframework.stereotype.Service;
 
 import java.time.Duration;
 import java.time.LocalDateTime;
+import java.util.ArrayList;
 import java.util.List;
 
 @Service
@@ -20,6 +23,7 @@ public class EventService {
 
     private static final String CACHE_PREFIX = "events:bounds:";
     private static final Duration CACHE_TTL = Duration.ofMinutes(15);
+    private static final int CACHE_SCAN_BATCH = 500;
 
     public EventService(
             EventRepository eventRepository,
@@ -75,7 +79,10 @@ public class EventService {
                     north, south, east, west);
         }
 
-        List<Event> events = eventRepository.geoSearchActiveEvents(north, south, east, west, geoSearchDTO.getStartOfTimeRange(), geoSearchDTO.getEndOfTimeRange());
+        List<Integer> tiles = GeoTiles.tilesInBounds(north, south, east, west);
+        List<Event> events = tiles.isEmpty()
+                ? eventRepository.geoSearchActiveEvents(north, south, east, west, geoSearchDTO.getStartOfTimeRange(), geoSearchDTO.getEndOfTimeRange())
+                : eventRepository.geoSearchActiveEventsInTiles(tiles, north, south, east, west, geoSearchDTO.getStartOfTimeRange(), geoSearchDTO.getEndOfTimeRange());
 
         try{
             redisTemplate.opsForValue().set(cacheKey, events, CACHE_TTL);
@@ -150,13 +157,39 @@ public class EventService {
         return CACHE_PREFIX + roundedNorth + ":" + roundedSouth + ":" + roundedEast + ":" + roundedWest + "time:" + startTimeStr + ":" + endTimeStr;
     }
 
+    /**
+     * Clears every cached bounds query. SCAN and UNLINK keep Redis responsive
+     * where KEYS would block it; the scraper evicts only the affected areas
+     * after each write, so this is for manual full resets.
+     */
     public void clearEventCache() {
         try {
             String pattern = CACHE_PREFIX + "*";
-            redisTemplate.delete(redisTemplate.keys(pattern));
-            log.info("Cleared all event caches with pattern: {}", pattern);
+            ScanOptions options = ScanOptions.scanOptions().match(pattern).count(CACHE_SCAN_BATCH).build();
+            List<String> batch = new ArrayList<>();
+            long cleared = 0;
+
+            try (Cursor<String> cursor = redisTemplate.scan(options)) {
+                while (cursor.hasNext()) {
+                    batch.add(cursor.next());
+                    if (batch.size() >= CACHE_SCAN_BATCH) {
+                        cleared += unlinkKeys(batch);
+                    }
+                }
+            }
+            cleared += unlinkKeys(batch);
+            log.info("Cleared {} event caches with pattern: {}", cleared, pattern);
         } catch (Exception e) {
             log.warn("Failed to clear event cache: {}", e.getMessage());
         }
     }
+
+    private long unlinkKeys(List<String> keys) {
+        if (keys.isEmpty()) {
+            return 0;
+        }
+        Long unlinked = redisTemplate.unlink(keys);
+        keys.clear();
+        return unlinked == null ? 0 : unlinked;
+    }
 }
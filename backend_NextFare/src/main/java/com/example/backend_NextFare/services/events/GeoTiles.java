@@ -0,0 +1,55 @@
+package com.example.backend_NextFare.services.events;
+
+import java.util.ArrayList;
+import java.util.List;
+
+/**
+ * The fixed grid the scraper stores on every event as geo_tile
+ * (web_scraper/geo_tiles.py). Tiles are TILE_SIZE degrees on a side,
+ * numbered row by row from (-90, -180).
+ */
+public final class GeoTiles {
+
+    public static final double TILE_SIZE = 0.01;
+    private static final int LAT_TILES = 18000;
+    private static final int LNG_TILES = 36000;
+
+    // Larger searches (zoomed far out) skip the tile filter; a two mile
+    // radius covers about 60 tiles
+    public static final int MAX_SEARCH_TILES = 1000;
+
+    private GeoTiles() {
+    }
+
+    private static int tileIndex(double value, double offset, int count) {
+        return (int) Math.min(Math.max(Math.floor((value + offset) / TILE_SIZE), 0), count - 1);
+    }
+
+    public static int tileOf(double latitude, double longitude) {
+        return tileIndex(latitude, 90, LAT_TILES) * LNG_TILES + tileIndex(longitude, 180, LNG_TILES);
+    }
+
+    /**
+     * Every tile overlapping the bounds, or an empty list when there are more
+     * than MAX_SEARCH_TILES of them
+     */
+    public static List<Integer> tilesInBounds(double north, double south, double east, double west) {
+        int firstRow = tileIndex(south, 90, LAT_TILES);
+        int lastRow = tileIndex(north, 90, LAT_TILES);
+        int firstColumn = tileIndex(west, 180, LNG_TILES);
+        int lastColumn = tileIndex(east, 180, LNG_TILES);
+
+        long count = (long) (lastRow - firstRow + 1) * (lastColumn - firstColumn + 1);
+        if (count > MAX_SEARCH_TILES) {
+            return List.of();
+        }
+
+        List<Integer> tiles = new ArrayList<>((int) count);
+        for (int row = firstRow; row <= lastRow; row++) {
+            for (int column = firstColumn; column <= lastColumn; column++) {
+                tiles.add(row * LNG_TILES + column);
+            }
+        }
+        return tiles;
+    }
+}
@@ -0,0 +1,290 @@
+from collections import deque
+from email.utils import parsedate_to_datetime
+import datetime
+import re
+import threading
+import time
+
+# Adapts each domain's request rate and concurrency to how the site is
+# answering, the way TCP adapts its congestion window (AIMD), and pauses a
+# domain altogether once its fetches keep failing (circuit breaker).
+#
+#   healthy response                -> every INCREASE_EVERY in a row, add
+#                                      RATE_STEP of the ceiling rate and one
+#                                      concurrent request
+#   slow, 429, challenge, 5xx, etc. -> multiply both by DECREASE_FACTOR, at
+#                                      most once per DECREASE_HOLDOFF so the
+#                                      requests already in flight count once
+#
+# The configured rate (--rps) and --max-concurrency are ceilings; the limits
+# only climb back up to them, never past.
+
+OK = 'ok'
+SLOW = 'slow'
+THROTTLED = 'throttled'
+CHALLENGE = 'challenge'
+ERROR = 'error'
+# Outcomes that count against the circuit breaker; a slow page still arrived
+FAILURES = (THROTTLED, CHALLENGE, ERROR)
+
+INCREASE_EVERY = 10
+RATE_STEP = 0.1
+DECREASE_FACTOR = 0.5
+DECREASE_HOLDOFF = 10.0
+MIN_RATE_FRACTION = 1 / 16
+DEFAULT_MAX_CONCURRENCY = 4
+# A response is slow once it takes SLOW_FACTOR times the usual healthy
+# latency, and never below SLOW_SECONDS (browser page loads take a few)
+SLOW_SECONDS = 8.0
+SLOW_FACTOR = 3.0
+LATENCY_WEIGHT = 0.2
+MAX_RETRY_AFTER = 600
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+# Trips after FAILURE_STREAK failures in a row, or when FAILURE_RATE of the
+# last WINDOW outcomes (once there are MIN_OUTCOMES) failed
+FAILURE_STREAK = 5
+FAILURE_RATE = 0.5
+WINDOW = 20
+MIN_OUTCOMES = 10
+# Doubles with every trip in a row; after MAX_TRIPS without a successful
+# probe the domain stays open and every request fails fast
+COOLDOWN = 60.0
+MAX_COOLDOWN = 600.0
+MAX_TRIPS = 3
+PROBE_WAIT = 1.0
+# A probe that never reports back (a paced scroll, an interrupted worker)
+# hands the probe to the next request after this long
+PROBE_TIMEOUT = 60.0
+
+# Interstitials the sites' bot protection serves instead of the page
+# (Cloudflare, PerimeterX, DataDome, Akamai, Imperva). Titles are matched
+# whole so an event called "Security Check Workshop" is not a challenge, and
+# markup only the interstitial itself carries: real pages load some of these
+# vendors' scripts too.
+CHALLENGE_TITLE = re.compile(
+    r'^\s*(?:just a moment\.*|attention required!?(?: \| cloudflare)?|access denied|'
+    r'access to this page has been denied\.?|pardon our interruption\.*|are you a robot\??|'
+    r'robot or human\??|security check)\s*$',
+    re.IGNORECASE,
+)
+CHALLENGE_MARKUP = re.compile(
+    r'id=["\'](?:challenge-form|cf-challenge-running|px-captcha)["\']|captcha-delivery\.com',
+    re.IGNORECASE,
+)
+CHALLENGE_SELECTOR = '#challenge-form, #cf-challenge-running, #px-captcha, iframe[src*="captcha-delivery.com"]'
+TITLE_PATTERN = re.compile(r'<title[^>]*>(.*?)</title>', re.IGNORECASE | re.DOTALL)
+# Interstitials are small; the title and markers sit near the top
+CHALLENGE_SCAN = 64 * 1024
+
+class CircuitOpenError(Exception):
+    def __init__(self, domain, reason):
+        super().__init__(f"circuit open for {domain} ({reason})")
+        self.domain = domain
+        self.reason = reason
+
+class BlockedError(Exception):
+    def __init__(self, url, outcome):
+        super().__init__(f"{outcome} page instead of {url}")
+        self.url = url
+        self.outcome = outcome
+
+def is_challenge_title(title):
+    return bool(title) and bool(CHALLENGE_TITLE.match(title))
+
+def is_challenge_html(html):
+    head = html[:CHALLENGE_SCAN]
+    title = TITLE_PATTERN.search(head)
+    return is_challenge_title(title.group(1) if title else None) or bool(CHALLENGE_MARKUP.search(head))
+
+def retry_after_seconds(value):
+    # Retry-After is either a number of seconds or an HTTP date
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            when = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=datetime.timezone.utc)
+        seconds = (when - datetime.datetime.now(datetime.timezone.utc)).total_seconds()
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+def outcome_for_status(status_code):
+    if status_code == 429:
+        return THROTTLED
+    if status_code == 403:
+        # Both sites answer a blocked client with a 403 challenge
+        return CHALLENGE
+    if status_code >= 500:
+        return ERROR
+    # A 404 for a deleted event says nothing about the site's health
+    return OK
+
+class AimdLimit:
+    # Rate (through the domain's token bucket) and concurrent requests for
+    # one domain. Callers hold a slot from enter() to leave() for every
+    # request and report its outcome with update().
+
+    def __init__(self, bucket, max_concurrency=DEFAULT_MAX_CONCURRENCY, adaptive=True):
+        self.bucket = bucket
+        self.max_rate = bucket.rate
+        self.min_rate = bucket.rate * MIN_RATE_FRACTION
+        self.max_concurrency = max_concurrency
+        self.concurrency = max_concurrency
+        self.adaptive = adaptive
+        self.in_flight = 0
+        self.healthy = 0
+        self.latency = None
+        self.decreased_at = None
+        self.decreases = 0
+        self.paused_until = 0.0
+        self.condition = threading.Condition()
+
+    def enter(self, cancelled):
+        with self.condition:
+            while self.in_flight >= self.concurrency:
+                if cancelled.is_set():
+                    return False
+                self.condition.wait(0.5)
+            self.in_flight += 1
+            return True
+
+    def leave(self):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify()
+
+    def slow_after(self):
+        if self.latency is None:
+            return SLOW_SECONDS
+        return max(SLOW_SECONDS, SLOW_FACTOR * self.latency)
+
+    def pause_remaining(self):
+        return max(0.0, self.paused_until - time.monotonic())
+
+    def update(self, outcome, latency, retry_after=None):
+        # Returns True when the limits were cut
+        with self.condition:
+            now = time.monotonic()
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + retry_after)
+            if outcome == OK:
+                self.latency = latency if self.latency is None else (
+                    (1 - LATENCY_WEIGHT) * self.latency + LATENCY_WEIGHT * latency)
+                self.healthy += 1
+                if self.adaptive and self.healthy >= INCREASE_EVERY:
+                    self.healthy = 0
+                    self.bucket.rate = min(self.max_rate, self.bucket.rate + RATE_STEP * self.max_rate)
+                    if self.concurrency < self.max_concurrency:
+                        self.concurrency += 1
+                        self.condition.notify()
+                return False
+
+            self.healthy = 0
+            if not self.adaptive:
+                return False
+            if self.decreased_at is not None and now - self.decreased_at < DECREASE_HOLDOFF:
+                return False
+            self.decreased_at = now
+            self.bucket.rate = max(self.min_rate, self.bucket.rate * DECREASE_FACTOR)
+            self.concurrency = max(1, int(self.concurrency * DECREASE_FACTOR))
+            self.decreases += 1
+            return True
+
+    def describe(self):
+        return (f"{self.bucket.rate:.2f}/{self.max_rate:g} req/s, "
+                f"{self.concurrency}/{self.max_concurrency} concurrent")
+
+class CircuitBreaker:
+    # closed: requests flow. open: the domain is paused until the cooldown
+    # ends. half-open: a single probe request decides between the two.
+
+    def __init__(self, failure_streak=FAILURE_STREAK, failure_rate=FAILURE_RATE, window=WINDOW,
+                 cooldown=COOLDOWN, max_trips=MAX_TRIPS):
+        self.failure_streak = failure_streak
+        self.failure_rate = failure_rate
+        self.cooldown = cooldown
+        self.max_trips = max_trips
+        self.state = CLOSED
+        self.outcomes = deque(maxlen=window)
+        self.streak = 0
+        self.trips_in_row = 0
+        self.trips = 0
+        self.reopen_at = 0.0
+        self.probing = False
+        self.probe_started = 0.0
+        self.reason = None
+        self.lock = threading.Lock()
+
+    def gave_up(self):
+        return self.state == OPEN and self.trips_in_row >= self.max_trips
+
+    def admit(self):
+        # Seconds to wait before asking again, 0 to go ahead, or None once
+        # the breaker has given up on the domain
+        with self.lock:
+            if self.state == CLOSED:
+                return 0
+            if self.state == OPEN:
+                if self.trips_in_row >= self.max_trips:
+                    return None
+                remaining = self.reopen_at - time.monotonic()
+                if remaining > 0:
+                    return remaining
+                self.state = HALF_OPEN
+                self.probing = False
+            now = time.monotonic()
+            if not self.probing or now - self.probe_started >= PROBE_TIMEOUT:
+                self.probing = True
+                self.probe_started = now
+                return 0
+            return PROBE_WAIT
+
+    def record(self, outcome):
+        # Returns the new state when this outcome changed it
+        failed = outcome in FAILURES
+        with self.lock:
+            if self.state == OPEN:
+                # Requests that were in flight when the breaker tripped
+                return None
+            if self.state == HALF_OPEN:
+                self.probing = False
+                if failed:
+                    return self.trip(outcome)
+                self.state = CLOSED
+                self.trips_in_row = 0
+                self.outcomes.clear()
+                self.streak = 0
+                return CLOSED
+
+            self.outcomes.append(failed)
+            self.streak = self.streak + 1 if failed else 0
+            failures = sum(self.outcomes)
+            if self.streak >= self.failure_streak or (
+                    len(self.outcomes) >= MIN_OUTCOMES and failures >= self.failure_rate * len(self.outcomes)):
+                return self.trip(outcome)
+            return None
+
+    def trip(self, outcome):
+        self.state = OPEN
+        self.trips += 1
+        self.trips_in_row += 1
+        self.reason = outcome
+        self.reopen_at = time.monotonic() + self.current_cooldown()
+        self.outcomes.clear()
+        self.streak = 0
+        return OPEN
+
+    def current_cooldown(self):
+        return min(MAX_COOLDOWN, self.cooldown * 2 ** max(0, self.trips_in_row - 1))
+
+    def describe(self):
+        if self.gave_up():
+            return f"circuit open for the rest of the run after {self.trips} trips"
+        return f"circuit {self.state}, {self.trips} trips"
@@ -0,0 +1,113 @@
+# Cross-source dedup benchmark on synthetic events, no database needed.
+#
+#   python benchmarks/bench_dedup.py                   # 100k events
+#   python benchmarks/bench_dedup.py --events 500000 --duplicate-rate 0.3
+#
+# Generates NYC events where a share of them is listed a second time on the
+# other source with a reworded title, jittered venue coordinates and a
+# shifted start, plus hard negatives: different events at the same venue
+# and time. Reports throughput, how many pairs were actually compared
+# against the n^2 / 2 a pairwise scan would need, and precision/recall
+# against the generated ground truth.
+import argparse
+import datetime
+import os
+import random
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedup import DedupIndex, minhash
+
+NORTH, SOUTH, EAST, WEST = 40.92, 40.49, -73.70, -74.26
+DAYS = 30
+
+WORDS = (
+    'jazz salsa yoga python startup founders book club night market comedy open mic brunch run hike '
+    'photography workshop networking women tech data science design ux ai meetup happy hour wine '
+    'tasting trivia board games chess pottery painting sketch poetry reading film screening rooftop '
+    'party techno house vinyl swap climbing cycling kayak chinatown harlem brooklyn queens bronx '
+    'language exchange spanish french japanese beginners advanced intro masterclass panel talk demo '
+    'hackathon blockchain crypto marketing sales career fair volunteer cleanup garden farmers dance '
+    'swing tango bachata kpop karaoke improv storytelling standup magic drag bingo ramen pizza tacos'
+).split()
+SUFFIXES = (' - NYC', ' (Free)', ' | New York', '!', ' 2026', ' [In Person]')
+
+def reword(title, rng):
+    words = title.split()
+    change = rng.random()
+    if change < 0.3:
+        title = title.upper() if rng.random() < 0.5 else title.title()
+    elif change < 0.55 and len(words) > 3:
+        words.pop(rng.randrange(len(words)))
+        title = ' '.join(words)
+    elif change < 0.75:
+        position = rng.randrange(len(title))
+        title = title[:position] + title[position + 1:]
+    return title + (rng.choice(SUFFIXES) if rng.random() < 0.5 else '')
+
+def generate_events(count, duplicate_rate, hard_negative_rate, seed):
+    rng = random.Random(seed)
+    origin = datetime.datetime(2026, 10, 1)
+    events = []
+    duplicates = set()
+
+    def add(title, latitude, longitude, start, source):
+        events.append((len(events) + 1, title, latitude, longitude, start, source))
+        return len(events)
+
+    while len(events) < count:
+        title = ' '.join(rng.sample(WORDS, rng.randint(3, 6))).capitalize()
+        latitude, longitude = rng.uniform(SOUTH, NORTH), rng.uniform(WEST, EAST)
+        start = origin + datetime.timedelta(days=rng.randrange(DAYS), minutes=rng.randrange(0, 24 * 60, 15))
+        source = rng.choice(('MEETUP', 'EVENTBRITE'))
+        event_id = add(title, latitude, longitude, start, source)
+
+        if rng.random() < duplicate_rate:
+            other = 'EVENTBRITE' if source == 'MEETUP' else 'MEETUP'
+            duplicate_id = add(reword(title, rng), latitude + rng.uniform(-0.0006, 0.0006),
+                               longitude + rng.uniform(-0.0006, 0.0006),
+                               start + datetime.timedelta(minutes=rng.choice((0, 0, 0, -15, 15, 30))), other)
+            duplicates.add((event_id, duplicate_id))
+        if rng.random() < hard_negative_rate:
+            # A different event on the other source at the same place and time
+            other_title = ' '.join(rng.sample(WORDS, rng.randint(3, 6))).capitalize()
+            add(other_title, latitude, longitude, start, 'EVENTBRITE' if source == 'MEETUP' else 'MEETUP')
+
+    return events[:count], {pair for pair in duplicates if pair[1] <= count}
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark cross-source event dedup on synthetic events')
+    parser.add_argument('--events', type=int, default=100000)
+    parser.add_argument('--duplicate-rate', type=float, default=0.25, help='share of events listed on both sources')
+    parser.add_argument('--hard-negative-rate', type=float, default=0.05,
+                        help='share of events with a different event at the same venue and time')
+    parser.add_argument('--seed', type=int, default=11)
+    args = parser.parse_args()
+
+    events, truth = generate_events(args.events, args.duplicate_rate, args.hard_negative_rate, args.seed)
+    print(f"{len(events)} events, {len(truth)} true duplicate pairs")
+
+    minhash.cache_clear()
+    index = DedupIndex()
+    start = time.perf_counter()
+    for event in events:
+        index.add(*event)
+    canonical = index.canonical_ids()
+    elapsed = time.perf_counter() - start
+
+    found = {(root, event_id) for event_id, root in canonical.items()}
+    true_positives = len(found & truth)
+    precision = true_positives / len(found) if found else 1.0
+    recall = true_positives / len(truth) if truth else 1.0
+    pairwise = len(events) * (len(events) - 1) // 2
+
+    print(f"{elapsed:.2f}s, {len(events) / elapsed:,.0f} events/s, "
+          f"peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+    print(f"{index.compared:,} pairs compared, {index.compared / pairwise:.2e} of the {pairwise:,} a pairwise scan needs")
+    print(f"{len(found)} duplicates linked: precision {precision:.3f}, recall {recall:.3f}")
+
+if __name__ == "__main__":
+    main()
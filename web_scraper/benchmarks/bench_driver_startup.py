@@ -0,0 +1,63 @@
+# Compares driver startup and page load time before and after the shared
+# driver factory.
+#
+#   python benchmarks/bench_driver_startup.py https://www.meetup.com/... --runs 3
+#
+# "legacy" mirrors the old setup: ChromeDriverManager().install() on every
+# start, normal page load strategy and no resource blocking (run headless
+# here so it also works on a box without a display). "factory" is
+# driver_factory.create_driver() with its defaults.
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from webdriver_manager.chrome import ChromeDriverManager
+from driver_factory import create_driver
+from scheduler import wait_for_page_ready
+
+def create_legacy_driver():
+    options = webdriver.ChromeOptions()
+    options.add_argument('--headless=new')
+    service = Service(ChromeDriverManager().install())
+    return webdriver.Chrome(service=service, options=options)
+
+def measure(name, factory, urls, runs):
+    startups = []
+    loads = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        driver = factory()
+        startups.append(time.perf_counter() - start)
+        try:
+            for url in urls:
+                start = time.perf_counter()
+                driver.get(url)
+                wait_for_page_ready(driver)
+                loads.append(time.perf_counter() - start)
+        finally:
+            driver.quit()
+
+    print(f"{name:>8}: startup mean {statistics.mean(startups):.2f}s "
+          f"(first {startups[0]:.2f}s)", end='')
+    if loads:
+        print(f", page load mean {statistics.mean(loads):.2f}s, max {max(loads):.2f}s")
+    else:
+        print()
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark driver startup and page load time')
+    parser.add_argument('urls', nargs='*', help='pages to load with each driver')
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    measure('legacy', create_legacy_driver, args.urls, args.runs)
+    measure('factory', create_driver, args.urls, args.runs)
+
+if __name__ == "__main__":
+    main()
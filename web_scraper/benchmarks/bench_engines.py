@@ -0,0 +1,252 @@
+# End-to-end scraper benchmark that runs without the network or Postgres.
+#
+#   python benchmarks/bench_engines.py                       # synthetic corpus, every config
+#   python benchmarks/bench_engines.py --corpus corpus/ --configs meetup-http eventbrite-pool \
+#       --workers 4 --latency-ms 80 --repeat 3 --output results.json
+#
+# A local server replays the corpus (see corpus.py) and each configuration
+# runs the real engine code in a fresh process against it, so peak RSS and
+# warm-up costs are not shared between runs. Rows go to RecordingWriter
+# unless --writer postgres points the run at the database in .env (a local
+# Postgres or any Postgres-compatible server). Configurations that need
+# Chrome are reported as skipped when no browser is available.
+import argparse
+import contextlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from corpus import build_synthetic_corpus, load_manifest
+from replay_server import start_replay_server
+
+CONFIGS = (
+    'meetup-http',
+    'meetup-selenium',
+    'meetup-pool',
+    'meetup-harvest',
+    'eventbrite-parse',
+    'eventbrite-serial',
+    'eventbrite-pool',
+    'eventbrite-harvest',
+)
+REPORTED_STAGES = ('listing', 'navigation', 'extraction', 'tickets', 'db_write')
+
+def run_eventbrite_parse(origin, manifest, writer):
+    # Browserless baseline: the same __SERVER_DATA__ parsing the Selenium
+    # path does on driver.page_source, fed by plain HTTP fetches. Pages
+    # without the event block only yield ticket data here; the browser
+    # configurations fill those from the DOM.
+    from event_brite import eventbrite_records_from_payload, extract_event_from_page_source, extract_server_data
+    from http_fetch import create_session
+    from scheduler import default_scheduler as scheduler
+    from instrumentation import metrics
+
+    session = create_session()
+    base_url = origin + manifest['eventbrite_listing']
+    try:
+        urls = []
+        for page_num in range(1, manifest['eventbrite_pages'] + 1):
+            page = scheduler.fetch(session, f"{base_url}?page={page_num}", stage='listing')
+            for record in eventbrite_records_from_payload(extract_server_data(page) or {}):
+                if record['page_url'] not in urls:
+                    urls.append(record['page_url'])
+
+        for url in urls:
+            page = scheduler.fetch(session, url)
+            with metrics.stage('extraction'):
+                event_data, ticket_data = extract_event_from_page_source(page)
+            if not event_data.get('page_url'):
+                event_data['page_url'] = url
+            writer.add_eventbrite_event(event_data, ticket_data)
+    finally:
+        writer.close()
+        session.close()
+
+def run_config(config, origin, manifest, writer, workers, driver_options):
+    import meetup
+    import event_brite
+
+    meetup_url = origin + manifest['meetup_listing']
+    eventbrite_url = origin + manifest['eventbrite_listing']
+    max_pages = manifest['eventbrite_pages']
+
+    if config == 'meetup-http':
+        meetup.run_http_engine(meetup_url, writer=writer)
+    elif config == 'meetup-selenium':
+        meetup.run_selenium_engine(meetup_url, driver_options=driver_options, writer=writer)
+    elif config == 'meetup-pool':
+        meetup.run_pool_engine(meetup_url, workers, driver_options=driver_options, writer=writer)
+    elif config == 'meetup-harvest':
+        meetup.run_pool_engine(meetup_url, workers, driver_options=driver_options, harvest=True, writer=writer)
+    elif config == 'eventbrite-parse':
+        run_eventbrite_parse(origin, manifest, writer)
+    elif config == 'eventbrite-serial':
+        driver = event_brite.create_driver(**driver_options)
+        try:
+            event_brite.scrape_all_pages(driver, eventbrite_url, writer, max_pages)
+        finally:
+            driver.quit()
+    elif config == 'eventbrite-pool':
+        event_brite.scrape_all_pages_parallel(eventbrite_url, writer, max_pages, workers, driver_options=driver_options)
+    elif config == 'eventbrite-harvest':
+        event_brite.scrape_all_pages_parallel(eventbrite_url, writer, max_pages, workers,
+                                              driver_options=driver_options, harvest=True)
+    else:
+        raise ValueError(f"Unknown config {config}")
+
+def create_writer(kind, write_latency_ms):
+    if kind == 'postgres':
+        from database_utils import EventWriter
+        return EventWriter()
+    from recording_writer import RecordingWriter
+    return RecordingWriter(write_latency_ms=write_latency_ms)
+
+def child_main(args):
+    from instrumentation import metrics
+    from scheduler import default_scheduler
+
+    # The replay server is local, so only throttle when asked to, and keep
+    # the limits fixed so every configuration runs at the same ones
+    default_scheduler.configure(rps=args.rps or 1e6, burst=args.burst or 10 ** 6,
+                                max_concurrency=max(args.workers + 1, 2), adaptive=False)
+    metrics.reset()
+    metrics.source = args.child
+    manifest = load_manifest(args.corpus)
+    driver_options = {'headless': not args.headed}
+
+    result = {'config': args.child}
+    start = time.perf_counter()
+    try:
+        writer = create_writer(args.writer, args.write_latency_ms)
+        output = sys.stdout if args.verbose else open(os.devnull, 'w')
+        with contextlib.redirect_stdout(output):
+            run_config(args.child, args.origin, manifest, writer, args.workers, driver_options)
+        elapsed = time.perf_counter() - start
+        snapshot = metrics.snapshot()
+        result.update({
+            'events': writer.saved,
+            'failed': writer.failed,
+            'seconds': elapsed,
+            'events_per_second': writer.saved / elapsed if elapsed else 0.0,
+            'stages': {name: snapshot['stages'][name] for name in REPORTED_STAGES},
+        })
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {str(e).strip().splitlines()[0] if str(e).strip() else ''}"
+
+    # ru_maxrss is in KiB on Linux; children covers chromedriver and the
+    # browser processes it reaped
+    result['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    result['peak_child_rss_mb'] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+
+    with open(args.result_file, 'w', encoding='utf-8') as f:
+        json.dump(result, f)
+
+def run_child(config, args, origin, corpus_dir):
+    with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+        result_file = f.name
+    command = [
+        sys.executable, os.path.abspath(__file__),
+        '--child', config,
+        '--origin', origin,
+        '--corpus', corpus_dir,
+        '--result-file', result_file,
+        '--workers', str(args.workers),
+        '--writer', args.writer,
+        '--write-latency-ms', str(args.write_latency_ms),
+    ]
+    for flag, value in (('--rps', args.rps), ('--burst', args.burst)):
+        if value:
+            command += [flag, str(value)]
+    if args.headed:
+        command.append('--headed')
+    if args.verbose:
+        command.append('--verbose')
+
+    try:
+        completed = subprocess.run(command, timeout=args.timeout)
+        if completed.returncode != 0:
+            return {'config': config, 'error': f"exited with status {completed.returncode}"}
+        with open(result_file, encoding='utf-8') as f:
+            return json.load(f)
+    except subprocess.TimeoutExpired:
+        return {'config': config, 'error': f"timed out after {args.timeout}s"}
+    finally:
+        os.unlink(result_file)
+
+def format_ms(value):
+    return '-' if value is None else f"{value * 1000:.1f}"
+
+def print_result(result):
+    if 'error' in result:
+        print(f"{result['config']:<20} skipped: {result['error']}")
+        return
+    print(f"{result['config']:<20} {result['events']:>6} events {result['seconds']:>7.2f}s "
+          f"{result['events_per_second']:>8.1f} ev/s  rss {result['peak_rss_mb']:.0f} MB "
+          f"(children {result['peak_child_rss_mb']:.0f} MB)  failed {result['failed']}")
+    for name, stage in result['stages'].items():
+        if stage['count']:
+            print(f"{'':<20} {name:>11} ms p50 {format_ms(stage['p50'])} p95 {format_ms(stage['p95'])} "
+                  f"p99 {format_ms(stage['p99'])} (n={stage['count']}, failures={stage['failures']})")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the scraper engines against a replayed page corpus')
+    parser.add_argument('--corpus', help='corpus directory from corpus.py; a synthetic one is generated when omitted')
+    parser.add_argument('--events', type=int, default=100, help='events in the generated synthetic corpus')
+    parser.add_argument('--configs', nargs='+', choices=CONFIGS, default=list(CONFIGS))
+    parser.add_argument('--workers', type=int, default=4, help='drivers for the pool configurations')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--latency-ms', type=float, default=0, help='delay the replay server adds to every response')
+    parser.add_argument('--writer', choices=('recording', 'postgres'), default='recording')
+    parser.add_argument('--write-latency-ms', type=float, default=0,
+                        help='simulated round trip per batch for the recording writer')
+    parser.add_argument('--rps', type=float, help='per-domain request rate; unthrottled when omitted')
+    parser.add_argument('--burst', type=int)
+    parser.add_argument('--headed', action='store_true')
+    parser.add_argument('--timeout', type=float, default=900, help='seconds before a configuration is abandoned')
+    parser.add_argument('--verbose', action='store_true', help="show the scrapers' own output")
+    parser.add_argument('--output', help='write all results to this JSON file')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--origin', help=argparse.SUPPRESS)
+    parser.add_argument('--result-file', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child_main(args)
+        return
+
+    with tempfile.TemporaryDirectory() as scratch:
+        corpus_dir = args.corpus
+        if not corpus_dir:
+            corpus_dir = os.path.join(scratch, 'corpus')
+            build_synthetic_corpus(corpus_dir, events=args.events)
+        manifest = load_manifest(corpus_dir)
+        server, origin = start_replay_server(corpus_dir, latency_ms=args.latency_ms)
+        print(f"Replaying {manifest['kind']} corpus ({manifest['meetup_events']} Meetup, "
+              f"{manifest['eventbrite_events']} Eventbrite events) at {origin}, "
+              f"latency {args.latency_ms:g} ms, writer {args.writer}\n")
+
+        results = []
+        try:
+            for config in args.configs:
+                for _ in range(args.repeat):
+                    result = run_child(config, args, origin, corpus_dir)
+                    results.append(result)
+                    print_result(result)
+        finally:
+            server.shutdown()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+if __name__ == "__main__":
+    main()
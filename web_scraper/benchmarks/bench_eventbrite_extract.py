@@ -0,0 +1,69 @@
+# Microbenchmark for Eventbrite detail page parsing against saved pages.
+#
+#   python benchmarks/bench_eventbrite_extract.py saved_pages/*.html --iterations 200
+#
+# Compares the old "cut at the first '};'" slicing of __SERVER_DATA__ with the
+# single-pass raw_decode extractor, and reports how many pages each one parses.
+# Both sides read the same fields (event details and ticket classes) from the
+# decoded payload, so the timings differ only in how it is located and decoded.
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from event_brite import event_details_from_server_data, extract_event_from_page_source
+
+def legacy_extract(page_source):
+    start = page_source.find('window.__SERVER_DATA__ = ') + len('window.__SERVER_DATA__ = ')
+    end = page_source.find('};', start) + 1
+    server_data = json.loads(page_source[start:end])
+    return event_details_from_server_data(server_data)
+
+def single_pass_extract(page_source):
+    return extract_event_from_page_source(page_source)
+
+def time_extractor(extractor, pages, iterations):
+    timings = []
+    parsed = 0
+    for page_source in pages:
+        try:
+            extractor(page_source)
+            parsed += 1
+        except Exception:
+            continue
+        start = time.perf_counter()
+        for _ in range(iterations):
+            extractor(page_source)
+        timings.append((time.perf_counter() - start) / iterations)
+    return parsed, timings
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Eventbrite __SERVER_DATA__ extraction')
+    parser.add_argument('pages', nargs='+', help='saved Eventbrite event page HTML files')
+    parser.add_argument('--iterations', type=int, default=100)
+    args = parser.parse_args()
+
+    pages = []
+    for path in args.pages:
+        with open(path, encoding='utf-8') as f:
+            pages.append(f.read())
+
+    for name, extractor in (('legacy slice', legacy_extract), ('single pass', single_pass_extract)):
+        parsed, timings = time_extractor(extractor, pages, args.iterations)
+        if timings:
+            mean_us = statistics.mean(timings) * 1e6
+            print(f"{name:>12}: parsed {parsed}/{len(pages)} pages, mean {mean_us:.1f} us/page, "
+                  f"max {max(timings) * 1e6:.1f} us/page")
+        else:
+            print(f"{name:>12}: parsed 0/{len(pages)} pages")
+
+    # Each DOM field lookup is a separate WebDriver HTTP round trip; the single
+    # pass path needs one page_source call when __SERVER_DATA__ is complete
+    print("WebDriver round trips per event: legacy 10, single pass 1 (+ fallbacks for missing fields)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+# Bounding box search benchmark for the geo_tile index.
+#
+#   python benchmarks/bench_geo_query.py                      # 1M events, 200 searches
+#   python benchmarks/bench_geo_query.py --rows 100000 --queries 50 --keep
+#
+# Fills a scratch table shaped like events with synthetic NYC events, then
+# times the backend's search (EventRepository.geoSearchActiveEvents) as it
+# runs today and the tile search after migrate_geo_tiles.py's index exists.
+# Searches are two mile radius boxes converted the way
+# EventService.getActiveEventsWithinRadius does, over one day. Uses the
+# database in .env; the events table itself is not touched.
+import argparse
+import datetime
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database_utils import setup_database_connection
+from geo_tiles import GEO_TILE_SQL, tiles_in_bounds
+from instrumentation import percentile
+from migrate_geo_tiles import INDEXES
+
+TABLE = 'geo_bench_events'
+# Roughly the five boroughs
+NORTH, SOUTH, EAST, WEST = 40.92, 40.49, -73.70, -74.26
+DAYS = 90
+
+CREATE_TABLE = f"""
+CREATE TABLE {TABLE} (
+    id BIGSERIAL PRIMARY KEY,
+    event_title VARCHAR(255),
+    event_summary TEXT,
+    latitude DOUBLE PRECISION,
+    longitude DOUBLE PRECISION,
+    event_start_time TIMESTAMP,
+    event_end_time TIMESTAMP,
+    geo_tile INTEGER
+)
+"""
+
+# Start times spread over DAYS, one to four hour events, and a summary so
+# rows are about as wide as scraped ones
+FILL_TABLE = f"""
+INSERT INTO {TABLE} (event_title, event_summary, latitude, longitude, event_start_time, event_end_time)
+SELECT 'Event ' || n,
+       repeat('x', 300),
+       {SOUTH} + random() * {NORTH - SOUTH},
+       {WEST} + random() * {EAST - WEST},
+       start_time,
+       start_time + make_interval(hours => 1 + (random() * 3)::int)
+FROM (
+    SELECT n, %(origin)s::timestamp + random() * interval '{DAYS} days' AS start_time
+    FROM generate_series(1, %(rows)s) AS n
+) generated
+"""
+
+BASELINE_QUERY = f"""
+SELECT * FROM {TABLE} e WHERE
+    e.latitude BETWEEN %(south)s AND %(north)s AND
+    e.longitude BETWEEN %(west)s AND %(east)s AND
+    e.event_start_time <= %(range_end)s AND
+    e.event_end_time >= %(range_start)s
+ORDER BY e.event_start_time ASC
+"""
+
+TILE_QUERY = f"""
+SELECT * FROM {TABLE} e WHERE
+    e.geo_tile = ANY(%(tiles)s) AND
+    e.latitude BETWEEN %(south)s AND %(north)s AND
+    e.longitude BETWEEN %(west)s AND %(east)s AND
+    e.event_start_time <= %(range_end)s AND
+    e.event_end_time >= %(range_start)s
+ORDER BY e.event_start_time ASC
+"""
+
+def radius_bounds(center_lat, center_lng, radius_miles):
+    # EventService.getActiveEventsWithinRadius
+    lat_offset = radius_miles / 69.0
+    lng_offset = radius_miles / (69.0 * math.cos(math.radians(center_lat)))
+    return center_lat + lat_offset, center_lat - lat_offset, center_lng + lng_offset, center_lng - lng_offset
+
+def make_searches(count, origin, radius_miles, seed):
+    rng = random.Random(seed)
+    searches = []
+    for _ in range(count):
+        north, south, east, west = radius_bounds(rng.uniform(SOUTH, NORTH), rng.uniform(WEST, EAST), radius_miles)
+        day = origin + datetime.timedelta(days=rng.randrange(DAYS))
+        searches.append({
+            'north': north, 'south': south, 'east': east, 'west': west,
+            'range_start': day, 'range_end': day + datetime.timedelta(days=1),
+            'tiles': tiles_in_bounds(north, south, east, west),
+        })
+    return searches
+
+def build_table(conn, rows, origin, seed):
+    start = time.perf_counter()
+    with conn.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cursor.execute(CREATE_TABLE)
+        cursor.execute("SELECT setseed(%s)", (seed / 2 ** 31,))
+        cursor.execute(FILL_TABLE, {'origin': origin, 'rows': rows})
+        # The scraper stores geo_tile from Python; this is the same grid
+        cursor.execute(f"UPDATE {TABLE} SET geo_tile = {GEO_TILE_SQL}")
+        cursor.execute(f"ANALYZE {TABLE}")
+    conn.commit()
+    print(f"Generated {rows} events in {time.perf_counter() - start:.1f}s")
+
+def create_tile_index(conn):
+    # The migration's index, on the scratch table
+    definition = INDEXES['events_geo_tile_time_idx'].replace('events ', f'{TABLE} ', 1)
+    start = time.perf_counter()
+    with conn.cursor() as cursor:
+        cursor.execute(f"CREATE INDEX {TABLE}_geo_tile_time_idx ON {definition}")
+        cursor.execute(f"ANALYZE {TABLE}")
+    conn.commit()
+    print(f"Built index on {definition} in {time.perf_counter() - start:.1f}s")
+
+def explain(conn, query, params):
+    with conn.cursor() as cursor:
+        cursor.execute("EXPLAIN (ANALYZE, BUFFERS) " + query, params)
+        return [line for (line,) in cursor.fetchall()]
+
+def time_searches(conn, query, searches):
+    timings = []
+    counts = []
+    with conn.cursor() as cursor:
+        # Warm the cache so both phases read from shared buffers
+        cursor.execute(query, searches[0])
+        cursor.fetchall()
+        for params in searches:
+            start = time.perf_counter()
+            cursor.execute(query, params)
+            counts.append(len(cursor.fetchall()))
+            timings.append(time.perf_counter() - start)
+    conn.rollback()
+    return timings, counts
+
+def report(label, timings, counts, plan):
+    ordered = sorted(timings)
+    print(f"\n{label}: {len(timings)} searches, {sum(counts) / len(counts):.0f} events per search")
+    print(f"  ms p50 {percentile(ordered, 0.5) * 1000:.2f}  p95 {percentile(ordered, 0.95) * 1000:.2f}  "
+          f"p99 {percentile(ordered, 0.99) * 1000:.2f}  mean {sum(ordered) / len(ordered) * 1000:.2f}")
+    for line in plan:
+        print(f"  | {line}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the bounding box search before and after geo tiles')
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--radius-miles', type=float, default=2.0)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--keep', action='store_true', help=f'leave {TABLE} in place afterwards')
+    args = parser.parse_args()
+
+    origin = datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    searches = make_searches(args.queries, origin, args.radius_miles, args.seed)
+    print(f"{sum(len(search['tiles']) for search in searches) / len(searches):.0f} tiles per search on average")
+
+    conn = setup_database_connection()
+    try:
+        build_table(conn, args.rows, origin, args.seed)
+
+        plan = explain(conn, BASELINE_QUERY, searches[0])
+        timings, before_counts = time_searches(conn, BASELINE_QUERY, searches)
+        report('Before (latitude/longitude/time filter, no index)', timings, before_counts, plan)
+
+        create_tile_index(conn)
+        plan = explain(conn, TILE_QUERY, searches[0])
+        timings, after_counts = time_searches(conn, TILE_QUERY, searches)
+        report('After (geo_tile = ANY(tiles) on the tile/time index)', timings, after_counts, plan)
+
+        if before_counts != after_counts:
+            print("\nWARNING: the tile search returned different results from the baseline")
+    finally:
+        if not args.keep:
+            with conn.cursor() as cursor:
+                cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+            conn.commit()
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+# Builds the page corpus replayed by bench_engines.py.
+#
+#   python benchmarks/corpus.py synthetic corpus/ --events 200
+#   python benchmarks/corpus.py record corpus/ --meetup-url https://www.meetup.com/find/... \
+#       --eventbrite-url https://www.eventbrite.com/d/ny--new-york--manhattan/events--today/
+#
+# "synthetic" writes generated Meetup and Eventbrite listing and detail pages
+# shaped like the live ones. "record" saves real pages once (this is the only
+# step that needs the network) and rewrites their links to local paths so
+# the replay never leaves the box. Absolute links are written as
+# ORIGIN_TOKEN, which the replay server swaps for its own address. Both
+# produce the same layout:
+#
+#   manifest.json
+#   meetup/find/index.html                  listing
+#   meetup/events/<id>/index.html           detail pages
+#   eventbrite/d/bench/page-<n>.html        listing, one file per ?page=n
+#   eventbrite/e/<slug>/index.html          detail pages
+import argparse
+import html
+import json
+import os
+import random
+import re
+import sys
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MANIFEST = 'manifest.json'
+MEETUP_LISTING = '/meetup/find/'
+EVENTBRITE_LISTING = '/eventbrite/d/bench/'
+ORIGIN_TOKEN = '__REPLAY_ORIGIN__'
+
+VENUES = [
+    ('Bryant Park', '41 W 40th St', 'New York', 'NY', 40.7536, -73.9832),
+    ('Brooklyn Public Library', '10 Grand Army Plaza', 'Brooklyn', 'NY', 40.6725, -73.9682),
+    ('The Shed', '545 W 30th St', 'New York', 'NY', 40.7536, -74.0022),
+    ('Pier 17', '89 South St', 'New York', 'NY', 40.7055, -74.0021),
+    ('Queens Museum', 'Flushing Meadows Corona Park', 'Queens', 'NY', 40.7458, -73.8467),
+]
+TOPICS = ['Python', 'Jazz', 'Startup', 'Running', 'Photography', 'Board Game', 'Salsa', 'Poetry', 'AI', 'Chess']
+FORMATS = ['Meetup', 'Night', 'Workshop', 'Social', 'Open Mic', 'Hack Night', 'Walk', 'Mixer']
+
+def write_file(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+def script_json(data):
+    # Same escaping Next.js uses, so the payload cannot close the script tag
+    return json.dumps(data).replace('</', '<\\/')
+
+def synthetic_event(rng, index):
+    name, address, city, state, lat, lng = rng.choice(VENUES)
+    start_hour = rng.randint(9, 21)
+    return {
+        'index': index,
+        'title': f"{rng.choice(TOPICS)} {rng.choice(FORMATS)} #{index}",
+        'description': ' '.join(rng.choice(TOPICS).lower() for _ in range(rng.randint(40, 160))),
+        'venue': (name, address, city, state, lat + rng.uniform(-0.002, 0.002), lng + rng.uniform(-0.002, 0.002)),
+        'date': f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        'start': f"{start_hour:02d}:00",
+        'end': f"{min(start_hour + 2, 23):02d}:30",
+        'going': rng.randint(0, 400),
+        'capacity': rng.choice([50, 100, 250, 500]),
+    }
+
+def meetup_event_json(event, event_url):
+    name, address, city, state, lat, lng = event['venue']
+    return {
+        'id': str(event['index']),
+        'title': event['title'],
+        'description': event['description'],
+        'eventUrl': event_url,
+        'dateTime': f"{event['date']}T{event['start']}:00-05:00",
+        'endTime': f"{event['date']}T{event['end']}:00-05:00",
+        'timezone': 'America/New_York',
+        'going': {'totalCount': event['going']},
+        'venue': {'name': name, 'address': address, 'city': city, 'state': state, 'lat': lat, 'lng': lng},
+        'featuredEventPhoto': {'source': f"/meetup/photos/{event['index']}.jpeg"},
+    }
+
+def meetup_detail_page(event, event_url):
+    next_data = {'props': {'pageProps': {'event': meetup_event_json(event, event_url)}}, 'page': '/[urlname]/events/[eventId]'}
+    return (
+        "<!DOCTYPE html><html><head><title>{title}</title></head><body>"
+        "<main><h1>{title}</h1><p>{description}</p></main>"
+        '<script id="__NEXT_DATA__" type="application/json">{next_data}</script>'
+        "</body></html>"
+    ).format(title=html.escape(event['title']), description=html.escape(event['description'][:300]),
+             next_data=script_json(next_data))
+
+def meetup_listing_page(events):
+    cards = []
+    results = []
+    for event in events:
+        path = f"{ORIGIN_TOKEN}/meetup/events/{100000 + event['index']}/"
+        cards.append(
+            '<div class="relative"><div class="absolute inset-0"></div>'
+            f'<a href="{path}?recId=bench&amp;searchId=bench"><h2>{html.escape(event["title"])}</h2></a></div>'
+        )
+        results.append({'node': meetup_event_json(event, path)})
+    next_data = {'props': {'pageProps': {'searchResults': {'edges': results}}}, 'page': '/find'}
+    return (
+        "<!DOCTYPE html><html><head><title>Find events</title></head><body><main>{cards}</main>"
+        '<script id="__NEXT_DATA__" type="application/json">{next_data}</script>'
+        "</body></html>"
+    ).format(cards=''.join(cards), next_data=script_json(next_data))
+
+def eventbrite_search_result(event, path):
+    name, address, city, state, lat, lng = event['venue']
+    return {
+        'name': event['title'],
+        'summary': event['description'][:140],
+        'url': path,
+        'start_date': event['date'],
+        'start_time': event['start'],
+        'end_date': event['date'],
+        'end_time': event['end'],
+        'timezone': 'America/New_York',
+        'image': {'url': f"/eventbrite/img/{event['index']}.jpg"},
+        'primary_venue': {'name': name, 'address': {
+            'localized_address_display': f"{address}, {city}, {state}",
+            'latitude': str(lat),
+            'longitude': str(lng),
+        }},
+    }
+
+def eventbrite_detail_page(event, path, complete):
+    name, address, city, state, lat, lng = event['venue']
+    sold = min(event['going'], event['capacity'])
+    server_data = {
+        'event_listing_response': {'tickets': {'ticketClasses': [
+            {'name': 'General Admission', 'capacity': event['capacity'] - 20,
+             'quantityRemaining': event['capacity'] - 20 - max(sold - 10, 0), 'onSaleStatusEnum': 'AVAILABLE'},
+            {'name': 'VIP', 'capacity': 20, 'quantityRemaining': 20 - min(sold, 10), 'onSaleStatusEnum': 'AVAILABLE'},
+        ]}},
+    }
+    if complete:
+        server_data['event'] = {
+            'name': event['title'],
+            'summary': event['description'][:140],
+            'url': path,
+            'start': {'local': f"{event['date']}T{event['start']}:00", 'timezone': 'America/New_York'},
+            'end': {'local': f"{event['date']}T{event['end']}:00", 'timezone': 'America/New_York'},
+            'image': {'url': f"/eventbrite/img/{event['index']}.jpg"},
+            'venue': {'name': name, 'address': {
+                'localizedAddressDisplay': f"{address}, {city}, {state}",
+                'latitude': str(lat),
+                'longitude': str(lng),
+            }},
+        }
+    # Pages without the event block make the scraper fall back to the DOM
+    return (
+        "<!DOCTYPE html><html><head><title>{title}</title></head><body>"
+        '<h1 class="event-title css-0">{title}</h1>'
+        '<time class="start-date">{date}</time>'
+        '<span class="date-info__full-datetime">{date} {start} - {end}</span>'
+        '<p class="summary">{summary}</p>'
+        '<div class="location-info__address">{address}</div>'
+        '<img data-testid="hero-img" src="/eventbrite/img/{index}.jpg">'
+        '<button class="eds-btn eds-btn--link">Show map</button>'
+        '<a aria-label="Driving directions" href="https://maps.google.com/?daddr={lat},{lng}">Directions</a>'
+        "<script>window.__SERVER_DATA__ = {server_data};</script>"
+        "</body></html>"
+    ).format(title=html.escape(event['title']), date=event['date'], start=event['start'], end=event['end'],
+             summary=html.escape(event['description'][:140]), address=html.escape(f"{address}, {city}, {state}"),
+             index=event['index'], lat=lat, lng=lng, server_data=script_json(server_data))
+
+def eventbrite_listing_page(events):
+    cards = []
+    results = []
+    for event in events:
+        path = f"{ORIGIN_TOKEN}/eventbrite/e/bench-event-{200000 + event['index']}"
+        cards.append(f'<a class="event-card-link " href="{path}?aff=ebdssbdestsearch">{html.escape(event["title"])}</a>')
+        results.append(eventbrite_search_result(event, path))
+    server_data = {'search_data': {'events': {'results': results}}}
+    return (
+        "<!DOCTYPE html><html><head><title>Events</title></head><body><section>{cards}</section>"
+        "<script>window.__SERVER_DATA__ = {server_data};</script>"
+        "</body></html>"
+    ).format(cards=''.join(cards), server_data=script_json(server_data))
+
+def build_synthetic_corpus(corpus_dir, events=200, page_size=20, dom_fallback_every=4, seed=7):
+    rng = random.Random(seed)
+    generated = [synthetic_event(rng, i) for i in range(1, events + 1)]
+
+    write_file(os.path.join(corpus_dir, 'meetup', 'find', 'index.html'), meetup_listing_page(generated))
+    for event in generated:
+        path = f"meetup/events/{100000 + event['index']}"
+        write_file(os.path.join(corpus_dir, path, 'index.html'),
+                   meetup_detail_page(event, f"{ORIGIN_TOKEN}/{path}/"))
+
+    pages = [generated[i:i + page_size] for i in range(0, len(generated), page_size)]
+    for page_num, page_events in enumerate(pages, 1):
+        write_file(os.path.join(corpus_dir, EVENTBRITE_LISTING.strip('/'), f'page-{page_num}.html'),
+                   eventbrite_listing_page(page_events))
+    for event in generated:
+        path = f"eventbrite/e/bench-event-{200000 + event['index']}"
+        complete = not dom_fallback_every or event['index'] % dom_fallback_every
+        write_file(os.path.join(corpus_dir, path, 'index.html'),
+                   eventbrite_detail_page(event, f"{ORIGIN_TOKEN}/{path}", complete))
+
+    manifest = {
+        'kind': 'synthetic',
+        'meetup_listing': MEETUP_LISTING,
+        'meetup_events': len(generated),
+        'eventbrite_listing': EVENTBRITE_LISTING,
+        'eventbrite_pages': len(pages),
+        'eventbrite_events': len(generated),
+    }
+    write_file(os.path.join(corpus_dir, MANIFEST), json.dumps(manifest, indent=2))
+    return manifest
+
+def load_manifest(corpus_dir):
+    with open(os.path.join(corpus_dir, MANIFEST), encoding='utf-8') as f:
+        return json.load(f)
+
+def rewrite_links(page, origin, prefix):
+    # Absolute and root-relative links both point back into the corpus,
+    # including the JSON-escaped copies inside __NEXT_DATA__/__SERVER_DATA__
+    local = ORIGIN_TOKEN + prefix
+    page = page.replace(origin + '/', local)
+    page = page.replace(origin.replace('/', '\\/') + '\\/', local.replace('/', '\\/'))
+    return re.sub(r'(href=["\'])/(?!/)', r'\1' + local, page)
+
+def record_meetup(session, corpus_dir, listing_url, limit):
+    from meetup import get_event_urls_from_listing_html
+
+    origin = '{0.scheme}://{0.netloc}'.format(urlsplit(listing_url))
+    listing = session.get(listing_url, timeout=15).text
+    event_urls = get_event_urls_from_listing_html(listing, listing_url)[:limit]
+    write_file(os.path.join(corpus_dir, 'meetup', 'find', 'index.html'), rewrite_links(listing, origin, '/meetup/'))
+
+    recorded = 0
+    for event_url in event_urls:
+        response = session.get(event_url, timeout=15)
+        if response.ok:
+            path = urlsplit(event_url).path.strip('/')
+            write_file(os.path.join(corpus_dir, 'meetup', path, 'index.html'),
+                       rewrite_links(response.text, origin, '/meetup/'))
+            recorded += 1
+    return recorded
+
+def record_eventbrite(session, corpus_dir, base_url, max_pages, limit):
+    origin = '{0.scheme}://{0.netloc}'.format(urlsplit(base_url))
+    recorded = 0
+    pages = 0
+    for page_num in range(1, max_pages + 1):
+        listing = session.get(f"{base_url}?page={page_num}", timeout=15).text
+        event_urls = []
+        for href in re.findall(r'href="(https://www\.eventbrite\.[^"]+/e/[^"?]+)', listing):
+            if href not in event_urls:
+                event_urls.append(href)
+        if not event_urls:
+            break
+        write_file(os.path.join(corpus_dir, EVENTBRITE_LISTING.strip('/'), f'page-{page_num}.html'),
+                   rewrite_links(listing, origin, '/eventbrite/'))
+        pages += 1
+
+        for event_url in event_urls:
+            if recorded >= limit:
+                break
+            response = session.get(event_url, timeout=15)
+            if response.ok:
+                path = urlsplit(event_url).path.strip('/')
+                write_file(os.path.join(corpus_dir, 'eventbrite', path, 'index.html'),
+                           rewrite_links(response.text, origin, '/eventbrite/'))
+                recorded += 1
+    return pages, recorded
+
+def record_corpus(corpus_dir, meetup_url=None, eventbrite_url=None, max_pages=3, limit=100):
+    from http_fetch import create_session
+
+    session = create_session()
+    manifest = {'kind': 'recorded', 'meetup_listing': MEETUP_LISTING, 'eventbrite_listing': EVENTBRITE_LISTING,
+                'meetup_events': 0, 'eventbrite_pages': 0, 'eventbrite_events': 0}
+    try:
+        if meetup_url:
+            manifest['meetup_events'] = record_meetup(session, corpus_dir, meetup_url, limit)
+        if eventbrite_url:
+            manifest['eventbrite_pages'], manifest['eventbrite_events'] = record_eventbrite(
+                session, corpus_dir, eventbrite_url, max_pages, limit)
+    finally:
+        session.close()
+
+    write_file(os.path.join(corpus_dir, MANIFEST), json.dumps(manifest, indent=2))
+    return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the page corpus replayed by the offline benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    synthetic = commands.add_parser('synthetic', help='generate pages shaped like the live sites')
+    synthetic.add_argument('corpus_dir')
+    synthetic.add_argument('--events', type=int, default=200)
+    synthetic.add_argument('--page-size', type=int, default=20, help='Eventbrite events per listing page')
+    synthetic.add_argument('--dom-fallback-every', type=int, default=4,
+                           help='every Nth Eventbrite page omits the event block so the DOM fallback runs; 0 disables')
+    synthetic.add_argument('--seed', type=int, default=7)
+
+    record = commands.add_parser('record', help='save live pages once for later offline replay')
+    record.add_argument('corpus_dir')
+    record.add_argument('--meetup-url')
+    record.add_argument('--eventbrite-url')
+    record.add_argument('--max-pages', type=int, default=3)
+    record.add_argument('--limit', type=int, default=100, help='max detail pages saved per source')
+
+    args = parser.parse_args()
+    if args.command == 'synthetic':
+        manifest = build_synthetic_corpus(args.corpus_dir, args.events, args.page_size, args.dom_fallback_every, args.seed)
+    else:
+        manifest = record_corpus(args.corpus_dir, args.meetup_url, args.eventbrite_url, args.max_pages, args.limit)
+    print(json.dumps(manifest, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# Stand-in for database_utils.EventWriter used by the offline benchmarks.
+# It runs the same normalization, content hashing and batching as the real
+# writer and only replaces the upsert round trip, so the save path costs
+# what it does in production minus the database.
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database_utils import EventWriter, UPSERTS
+from instrumentation import metrics
+
+class RecordingWriter(EventWriter):
+    def __init__(self, batch_size=50, flush_interval=30, write_latency_ms=0):
+        # Skips EventWriter.__init__, which opens the connection pool
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.write_latency = write_latency_ms / 1000
+        self.pending = {source: {} for source in UPSERTS}
+        self.pending_count = 0
+        self.last_flush = time.monotonic()
+        self.lock = threading.Lock()
+        self.saved = 0
+        self.failed = 0
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.on_flush = []
+        self.on_change = []
+        self.rows = {}
+        self.batches = 0
+
+    def write_batch(self, source, rows):
+        start = time.perf_counter()
+        if self.write_latency:
+            # Roughly one multi-row upsert round trip
+            time.sleep(self.write_latency)
+
+        # Mirrors the RETURNING result of the real upsert: new keys are
+        # inserted, changed hashes updated, matching hashes skipped
+        results = []
+        with self.lock:
+            self.batches += 1
+            for row in rows:
+                key = (source, row.event_page_url)
+                previous = self.rows.get(key)
+                self.rows[key] = row
+                if previous is None:
+                    results.append((True, row.event_page_url))
+                elif previous.content_hash != row.content_hash:
+                    results.append((False, row.event_page_url))
+        self.record_results(len(rows), results)
+        self.notify_flushed(source, rows, results)
+        metrics.observe('db_write', time.perf_counter() - start)
+
+    def close(self):
+        self.flush()
@@ -0,0 +1,87 @@
+# Serves a corpus built by corpus.py on localhost so the scrapers can be
+# benchmarked without the network.
+#
+#   python benchmarks/replay_server.py corpus/ --port 8765 --latency-ms 50
+#
+# Directory paths serve their index.html without the trailing-slash
+# redirect, "?page=n" serves page-<n>.html, and ORIGIN_TOKEN in a page is
+# replaced with the server's own address.
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import argparse
+import os
+import posixpath
+import threading
+import time
+
+from corpus import ORIGIN_TOKEN
+
+class ReplayHandler(SimpleHTTPRequestHandler):
+    corpus_dir = '.'
+    latency = 0.0
+
+    def resolve(self):
+        parts = urlsplit(self.path)
+        path = os.path.join(self.corpus_dir, *[p for p in posixpath.normpath(parts.path).split('/') if p not in ('', '..')])
+        page = parse_qs(parts.query).get('page')
+        if os.path.isdir(path):
+            candidate = os.path.join(path, f'page-{page[0]}.html') if page else os.path.join(path, 'index.html')
+            if page and not os.path.exists(candidate) and page[0] == '1':
+                candidate = os.path.join(path, 'index.html')
+            path = candidate
+        return path
+
+    def do_GET(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+        path = self.resolve()
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+
+        with open(path, 'rb') as f:
+            body = f.read()
+        content_type = self.guess_type(path)
+        if content_type.startswith('text/html'):
+            host, port = self.server.server_address[:2]
+            body = body.replace(ORIGIN_TOKEN.encode(), f"http://{host}:{port}".encode())
+            content_type = 'text/html; charset=utf-8'
+
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_replay_server(corpus_dir, port=0, latency_ms=0):
+    handler = type('CorpusReplayHandler', (ReplayHandler,), {
+        'corpus_dir': os.path.abspath(corpus_dir),
+        'latency': latency_ms / 1000,
+    })
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name='replay-server', daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}"
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a saved page corpus over HTTP')
+    parser.add_argument('corpus_dir')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=0, help='delay added to every response')
+    args = parser.parse_args()
+
+    server, origin = start_replay_server(args.corpus_dir, args.port, args.latency_ms)
+    print(f"Replaying {args.corpus_dir} at {origin} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
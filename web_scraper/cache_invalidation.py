@@ -0,0 +1,254 @@
+try:
+    import redis
+except ImportError:
+    redis = None
+from dotenv import load_dotenv
+from geo_tiles import TILE_SIZE
+import argparse
+from decimal import Decimal, ROUND_HALF_UP
+import datetime
+import json
+import math
+import os
+import re
+import threading
+import arrow
+
+load_dotenv()
+
+# EventService caches geo searches for 15 minutes under
+#   events:bounds:<north>:<south>:<east>:<west>time:<start>:<end>
+# with the bounds formatted as %.4f and the times as LocalDateTime.toString().
+CACHE_PREFIX = 'events:bounds:'
+CACHE_KEY_PATTERN = re.compile(
+    r'^events:bounds:(?P<north>-?[\d.]+):(?P<south>-?[\d.]+):(?P<east>-?[\d.]+):(?P<west>-?[\d.]+)'
+    r'time:(?P<start>[\dT:.\-]+?):(?P<end>\d{4}-[\dT:.\-]+)$'
+)
+
+CHANGES_STREAM = 'events:changes'
+# Changes are published on the same grid the events table's geo_tile uses,
+# roughly 1.1 km by 0.85 km in NYC
+CELL_SIZE = TILE_SIZE
+# Postgres stores event times without a zone, converted to the session
+# TimeZone, and the backend compares a search's LocalDateTime range against
+# those values. This should match the database's TimeZone setting.
+EVENTS_TIMEZONE = os.getenv('EVENTS_TIMEZONE', 'America/New_York')
+
+def redis_client_from_env():
+    # REDIS_* for the scraper's .env, SPRING_REDIS_* as the backend names them
+    return redis.Redis(
+        host=os.getenv('REDIS_HOST') or os.getenv('SPRING_REDIS_HOST') or 'localhost',
+        port=int(os.getenv('REDIS_PORT') or os.getenv('SPRING_REDIS_PORT') or 6379),
+        password=os.getenv('REDIS_PASSWORD') or None,
+        socket_timeout=5,
+    )
+
+def local_time(value, timezone=EVENTS_TIMEZONE):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = arrow.get(value).datetime
+    if value.tzinfo is not None:
+        return arrow.get(value).to(timezone).naive
+    return value
+
+def parse_local_date_time(value):
+    # LocalDateTime.toString() drops zero seconds and can carry nanoseconds
+    date_time, _, fraction = value.partition('.')
+    parsed = datetime.datetime.fromisoformat(date_time)
+    if fraction:
+        parsed = parsed.replace(microsecond=int(fraction[:6].ljust(6, '0')))
+    return parsed
+
+def format_local_date_time(value):
+    # LocalDateTime.toString(): minutes always, seconds unless they and the
+    # fraction are zero, and the fraction in groups of three digits
+    text = value.strftime('%Y-%m-%dT%H:%M')
+    if value.second or value.microsecond:
+        text += f":{value.second:02d}"
+    if value.microsecond:
+        text += f".{value.microsecond // 1000:03d}" if value.microsecond % 1000 == 0 else f".{value.microsecond:06d}"
+    return text
+
+def format_bound(value):
+    # Java's String.format("%.4f") rounds the shortest decimal form of the
+    # double half up, where Python's would round its exact binary value
+    return str(Decimal(repr(float(value))).quantize(Decimal('0.0001'), rounding=ROUND_HALF_UP))
+
+def cache_key(north, south, east, west, start, end):
+    # EventService.createCacheKey
+    bounds = ':'.join(format_bound(value) for value in (north, south, east, west))
+    return f"{CACHE_PREFIX}{bounds}time:{format_local_date_time(start)}:{format_local_date_time(end)}"
+
+def cell_id(latitude, longitude, cell_size=CELL_SIZE):
+    return f"{math.floor(latitude / cell_size)}:{math.floor(longitude / cell_size)}"
+
+def cell_bounds(cell, cell_size=CELL_SIZE):
+    lat_index, lng_index = (int(part) for part in cell.split(':'))
+    # (north, south, east, west), the order the cache key uses
+    return ((lat_index + 1) * cell_size, lat_index * cell_size, (lng_index + 1) * cell_size, lng_index * cell_size)
+
+def changed_cells(rows, cell_size=CELL_SIZE, timezone=EVENTS_TIMEZONE):
+    # Maps each grid cell holding a changed event to the time window its
+    # changed events span. None on either side leaves the window open, so an
+    # event whose times could not be parsed evicts every cached range.
+    # Events without coordinates never match a bounds query and are skipped.
+    cells = {}
+    for row in rows:
+        if row.latitude is None or row.longitude is None:
+            continue
+        cell = cell_id(row.latitude, row.longitude, cell_size)
+        start = local_time(row.event_start_time, timezone)
+        end = local_time(row.event_end_time, timezone)
+        if cell not in cells:
+            cells[cell] = [start, end]
+            continue
+        window = cells[cell]
+        window[0] = None if start is None or window[0] is None else min(window[0], start)
+        window[1] = None if end is None or window[1] is None else max(window[1], end)
+    return cells
+
+def key_is_affected(key, cells, cell_size=CELL_SIZE):
+    match = CACHE_KEY_PATTERN.match(key)
+    if not match:
+        # Unknown layout, so it cannot be ruled out
+        return True
+    try:
+        north, south, east, west = (float(match.group(name)) for name in ('north', 'south', 'east', 'west'))
+        range_start = parse_local_date_time(match.group('start'))
+        range_end = parse_local_date_time(match.group('end'))
+    except ValueError:
+        return True
+
+    for cell, (start, end) in cells.items():
+        cell_north, cell_south, cell_east, cell_west = cell_bounds(cell, cell_size)
+        if cell_south > north or cell_north < south or cell_west > east or cell_east < west:
+            continue
+        # Same overlap test as EventRepository.geoSearchActiveEvents
+        if start is not None and start > range_end:
+            continue
+        if end is not None and end < range_start:
+            continue
+        return True
+    return False
+
+class CacheInvalidator:
+    # EventWriter.on_change callback. Each committed batch of changed events
+    # is published to the events:changes stream as grid cells and time
+    # windows, then only the cached bounds that overlap one of them are
+    # unlinked. An event that moved is only evicted around its new location;
+    # searches around the old one expire with the TTL.
+
+    def __init__(self, client, cell_size=CELL_SIZE, stream=CHANGES_STREAM, stream_maxlen=10000,
+                 timezone=EVENTS_TIMEZONE, scan_count=500):
+        self.client = client
+        self.cell_size = cell_size
+        self.stream = stream
+        self.stream_maxlen = stream_maxlen
+        self.timezone = timezone
+        self.scan_count = scan_count
+        self.lock = threading.Lock()
+        self.published = 0
+        self.scanned = 0
+        self.evicted = 0
+        self.failed = 0
+
+    def rows_changed(self, source, rows):
+        cells = changed_cells(rows, self.cell_size, self.timezone)
+        if not cells:
+            return 0
+        try:
+            self.publish(source, cells, len(rows))
+            evicted, scanned = self.evict(cells)
+        except redis.RedisError as e:
+            print(f"Cache invalidation failed: {e}")
+            with self.lock:
+                self.failed += 1
+            return 0
+        with self.lock:
+            self.published += 1
+            self.scanned += scanned
+            self.evicted += evicted
+        return evicted
+
+    def publish(self, source, cells, event_count):
+        entry = {
+            'source': source,
+            'events': event_count,
+            'cell_size': self.cell_size,
+            'cells': json.dumps({
+                cell: [value.isoformat() if value else None for value in window]
+                for cell, window in cells.items()
+            }),
+        }
+        self.client.xadd(self.stream, entry, maxlen=self.stream_maxlen, approximate=True)
+
+    def evict(self, cells):
+        # SCAN walks the keyspace in small steps instead of blocking Redis
+        # the way KEYS does, and UNLINK frees the values off the main thread
+        scanned = 0
+        evicted = 0
+        batch = []
+        for key in self.client.scan_iter(match=CACHE_PREFIX + '*', count=self.scan_count):
+            scanned += 1
+            if isinstance(key, bytes):
+                key = key.decode('utf-8')
+            if key_is_affected(key, cells, self.cell_size):
+                batch.append(key)
+            if len(batch) >= self.scan_count:
+                evicted += self.client.unlink(*batch)
+                batch = []
+        if batch:
+            evicted += self.client.unlink(*batch)
+        return evicted, scanned
+
+    def summary(self):
+        with self.lock:
+            return (f"{self.published} change batches published, {self.evicted} of {self.scanned} "
+                    f"scanned cache keys evicted, {self.failed} failed")
+
+def add_cache_arguments(parser):
+    parser.add_argument('--invalidate-cache', action='store_true',
+                        help="evict the backend's cached searches around changed events (needs REDIS_HOST)")
+
+def invalidator_from_args(args):
+    if not args.invalidate_cache:
+        return None
+    if redis is None:
+        print("Cache invalidation disabled: the redis package is not installed")
+        return None
+    client = redis_client_from_env()
+    try:
+        client.ping()
+    except redis.RedisError as e:
+        print(f"Cache invalidation disabled: {e}")
+        return None
+    return CacheInvalidator(client)
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the backend's event search cache")
+    parser.add_argument('--latitude', type=float, help='only list cached searches covering this point')
+    parser.add_argument('--longitude', type=float)
+    parser.add_argument('--evict', action='store_true', help='unlink the listed keys')
+    args = parser.parse_args()
+
+    if redis is None:
+        print("The redis package is not installed")
+        return
+    client = redis_client_from_env()
+    cells = None
+    if args.latitude is not None and args.longitude is not None:
+        cells = {cell_id(args.latitude, args.longitude): [None, None]}
+
+    keys = []
+    for key in client.scan_iter(match=CACHE_PREFIX + '*', count=500):
+        key = key.decode('utf-8') if isinstance(key, bytes) else key
+        if cells is None or key_is_affected(key, cells):
+            keys.append(key)
+            print(f"{key} (ttl {client.ttl(key)}s)")
+    print(f"{len(keys)} cached searches")
+    if args.evict and keys:
+        print(f"Evicted {client.unlink(*keys)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+try:
+    import redis
+except ImportError:
+    redis = None
+from database_utils import SchemaError, check_schema, setup_database_connection
+from cache_invalidation import EVENTS_TIMEZONE, cache_key, local_time, redis_client_from_env
+from geo_tiles import MAX_SEARCH_TILES, tiles_in_bounds
+import argparse
+import datetime
+import json
+import math
+import os
+import threading
+import time
+import arrow
+import psycopg2
+
+# Precomputes the backend's geo searches for the map viewports and time
+# ranges users open most, so the first request after a run (or after the
+# cache expired) is a hit instead of a cold geoSearchActiveEvents query.
+# Keys are built like EventService.createCacheKey and values serialized like
+# RedisConfig's Jackson serializer: a plain JSON array of Event objects with
+# camelCase properties, @JsonIgnore fields left out, LocalDateTime as ISO
+# strings. A search only hits when its bounds round to the same four
+# decimals and its range is exactly the same, so clients have to ask for
+# these fixed ranges (the API's default range starts at the request time).
+
+# EventService.CACHE_TTL
+CACHE_TTL = 15 * 60
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scrape_config.json')
+RANGES = ('today', 'tonight', 'tomorrow', 'weekend')
+DEFAULT_RANGES = ('today', 'tonight', 'weekend')
+TONIGHT_HOUR = 18
+MILES_PER_DEGREE = 69.0
+
+# Event's serialized properties in declaration order, by column
+EVENT_PROPERTIES = [
+    ('id', 'id'),
+    ('event_title', 'eventTitle'),
+    ('event_date_time', 'eventDateTime'),
+    ('event_summary', 'eventSummary'),
+    ('event_address', 'eventAddress'),
+    ('event_image_url', 'eventImageUrl'),
+    ('event_page_url', 'eventPageUrl'),
+    ('latitude', 'latitude'),
+    ('longitude', 'longitude'),
+    ('tickets_sold', 'ticketsSold'),
+    ('event_start_time', 'eventStartTime'),
+    ('event_end_time', 'eventEndTime'),
+    ('event_source', 'eventSource'),
+    ('time_added', 'timeAdded'),
+    ('time_updated', 'timeUpdated'),
+]
+EVENT_COLUMNS = ', '.join(column for column, _ in EVENT_PROPERTIES)
+START_INDEX = [column for column, _ in EVENT_PROPERTIES].index('event_start_time')
+END_INDEX = [column for column, _ in EVENT_PROPERTIES].index('event_end_time')
+
+# EventRepository.geoSearchActiveEvents and geoSearchActiveEventsInTiles,
+# over the union of every warmed range; each range is filtered out of it
+VIEWPORT_QUERY = f"""
+SELECT {EVENT_COLUMNS}
+FROM events
+WHERE latitude BETWEEN %(south)s AND %(north)s
+  AND longitude BETWEEN %(west)s AND %(east)s
+  AND event_start_time <= %(end)s
+  AND event_end_time >= %(start)s
+  AND duplicate_of IS NULL
+"""
+TILES_CONDITION = "  AND geo_tile = ANY(%(tiles)s)\n"
+ORDER = "ORDER BY event_start_time ASC"
+
+def time_ranges(names, now):
+    # {name: (start, end)} as naive local times, like the LocalDateTimes
+    # the backend builds its keys from
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    tomorrow = today + datetime.timedelta(days=1)
+    # The coming weekend, or the current one on a Saturday or Sunday
+    saturday = today + datetime.timedelta(days=5 - today.weekday())
+    ranges = {
+        'today': (today, tomorrow),
+        'tonight': (today.replace(hour=TONIGHT_HOUR), tomorrow),
+        'tomorrow': (tomorrow, tomorrow + datetime.timedelta(days=1)),
+        'weekend': (saturday, saturday + datetime.timedelta(days=2)),
+    }
+    return {name: ranges[name] for name in names}
+
+def viewport_bounds(viewport):
+    # (north, south, east, west) of a configured viewport, either given
+    # directly or as a radius around a point converted the way
+    # EventService.getActiveEventsWithinRadius does
+    if 'radius_miles' in viewport:
+        latitude, longitude = viewport['latitude'], viewport['longitude']
+        lat_offset = viewport['radius_miles'] * (1.0 / MILES_PER_DEGREE)
+        lng_offset = viewport['radius_miles'] * (1.0 / (MILES_PER_DEGREE * math.cos(math.radians(latitude))))
+        return latitude + lat_offset, latitude - lat_offset, longitude + lng_offset, longitude - lng_offset
+    return viewport['north'], viewport['south'], viewport['east'], viewport['west']
+
+def jackson_value(value):
+    # JavaTimeModule with WRITE_DATES_AS_TIMESTAMPS off writes LocalDateTime
+    # as ISO_LOCAL_DATE_TIME: seconds always, the fraction without trailing zeros
+    if isinstance(value, datetime.datetime):
+        text = value.strftime('%Y-%m-%dT%H:%M:%S')
+        if value.microsecond:
+            text += f".{value.microsecond:06d}".rstrip('0')
+        return text
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+def serialize_events(rows, timezone=EVENTS_TIMEZONE):
+    events = []
+    for row in rows:
+        event = {}
+        for (_, name), value in zip(EVENT_PROPERTIES, row):
+            if isinstance(value, datetime.datetime):
+                value = local_time(value, timezone)
+            event[name] = value
+        events.append(event)
+    return json.dumps(events, default=jackson_value, separators=(',', ':'))
+
+class CacheWarmer:
+    # Runs each viewport's search once over the union of the warmed ranges,
+    # splits the rows by range and writes every key through one pipeline
+
+    def __init__(self, client, viewports, ranges=DEFAULT_RANGES, ttl=CACHE_TTL, timezone=EVENTS_TIMEZONE):
+        self.client = client
+        self.viewports = viewports
+        self.ranges = ranges
+        self.ttl = ttl
+        self.timezone = timezone
+        self.lock = threading.Lock()
+        self.runs = 0
+        self.warmed = 0
+        self.events = 0
+        self.failed = 0
+        self.elapsed = 0.0
+
+    def searches(self, now=None):
+        # [(name, bounds, range name, start, end)] for every viewport x range
+        now = now or arrow.now(self.timezone).naive
+        ranges = time_ranges(self.ranges, now)
+        searches = []
+        for viewport in self.viewports:
+            bounds = viewport_bounds(viewport)
+            for range_name, (start, end) in ranges.items():
+                searches.append((viewport['name'], bounds, range_name, start, end))
+        return searches
+
+    def load(self, searches):
+        # {cache key: (serialized events, count)}
+        by_bounds = {}
+        for search in searches:
+            by_bounds.setdefault(search[1], []).append(search)
+
+        values = {}
+        conn = setup_database_connection()
+        try:
+            check_schema(conn)
+            with conn.cursor() as cursor:
+                for (north, south, east, west), bound_searches in by_bounds.items():
+                    params = {
+                        'north': north, 'south': south, 'east': east, 'west': west,
+                        'start': min(search[3] for search in bound_searches),
+                        'end': max(search[4] for search in bound_searches),
+                    }
+                    tiles = tiles_in_bounds(north, south, east, west)
+                    query = VIEWPORT_QUERY
+                    if len(tiles) <= MAX_SEARCH_TILES:
+                        query += TILES_CONDITION
+                        params['tiles'] = tiles
+                    cursor.execute(query + ORDER, params)
+                    rows = cursor.fetchall()
+
+                    for _, _, _, start, end in bound_searches:
+                        # Same overlap test as the repository queries
+                        matched = [row for row in rows if row[START_INDEX] <= end and row[END_INDEX] >= start]
+                        key = cache_key(north, south, east, west, start, end)
+                        values[key] = (serialize_events(matched, self.timezone), len(matched))
+        finally:
+            conn.close()
+        return values
+
+    def warm(self, now=None):
+        start = time.perf_counter()
+        try:
+            values = self.load(self.searches(now))
+            # One round trip for every key instead of one SET each
+            pipeline = self.client.pipeline(transaction=False)
+            for key, (value, _) in values.items():
+                pipeline.set(key, value, ex=self.ttl)
+            pipeline.execute()
+        except (psycopg2.Error, redis.RedisError, SchemaError) as e:
+            print(f"Cache warming failed: {e}")
+            with self.lock:
+                self.failed += 1
+            return 0
+        with self.lock:
+            self.runs += 1
+            self.warmed += len(values)
+            self.events += sum(count for _, count in values.values())
+            self.elapsed += time.perf_counter() - start
+        return len(values)
+
+    def summary(self):
+        with self.lock:
+            return (f"{self.warmed} searches warmed with {self.events} events in {self.elapsed:.2f}s "
+                    f"over {self.runs} runs, {self.failed} failed")
+
+def load_warming_config(path):
+    with open(path, encoding='utf-8') as f:
+        config = json.load(f).get('warm_cache', {})
+    ranges = tuple(config.get('ranges', DEFAULT_RANGES))
+    for name in ranges:
+        if name not in RANGES:
+            raise ValueError(f"Unknown warm range {name!r}, expected one of {', '.join(RANGES)}")
+    return config.get('viewports', []), ranges
+
+def add_warming_arguments(parser):
+    parser.add_argument('--warm-cache', action='store_true',
+                        help="precompute the backend's searches for the configured viewports after the run (needs REDIS_HOST)")
+
+def warmer_from_args(args, config_path=DEFAULT_CONFIG_PATH):
+    if not args.warm_cache:
+        return None
+    if redis is None:
+        print("Cache warming disabled: the redis package is not installed")
+        return None
+    viewports, ranges = load_warming_config(config_path)
+    if not viewports:
+        print(f"Cache warming disabled: no warm_cache viewports in {config_path}")
+        return None
+    client = redis_client_from_env()
+    try:
+        client.ping()
+    except redis.RedisError as e:
+        print(f"Cache warming disabled: {e}")
+        return None
+    return CacheWarmer(client, viewports, ranges)
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm the backend's event search cache for popular viewports")
+    parser.add_argument('--config', default=DEFAULT_CONFIG_PATH, help='JSON file with a warm_cache section')
+    parser.add_argument('--ranges', nargs='+', choices=RANGES, help='override the time ranges in the config')
+    parser.add_argument('--list', action='store_true', help='print the keys that would be warmed')
+    args = parser.parse_args()
+
+    if redis is None:
+        print("The redis package is not installed")
+        return
+    viewports, ranges = load_warming_config(args.config)
+    warmer = CacheWarmer(redis_client_from_env(), viewports, args.ranges or ranges)
+    if args.list:
+        for name, bounds, range_name, start, end in warmer.searches():
+            print(f"{name} / {range_name}: {cache_key(*bounds, start, end)}")
+        return
+    warmer.warm()
+    print(f"Cache: {warmer.summary()}")
+
+if __name__ == "__main__":
+    main()
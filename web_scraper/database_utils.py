@@ -1,155 +1,63 @@
 import psycopg2
-import arrow
+from psycopg2 import pool
+from psycopg2.extras import execute_values
+from operator import attrgetter
+import hashlib
+import json
+import re
+import threading
+import time
 from dotenv import load_dotenv
+from instrumentation import metrics
+from event_record import eventbrite_record, meetup_record
 import os
 
 load_dotenv()
 
-def setup_database_connection():
-    conn = psycopg2.connect(
-        host=os.getenv('DB_HOST'),
-        database=os.getenv('DB_NAME'),
-        user=os.getenv('DB_USER'),
-        password=os.getenv('DB_PASSWORD'),
-        port=os.getenv('DB_PORT')
-    )
-    return conn
+EVENTBRITE_UPSERT_QUERY = """
+INSERT INTO events (
+    event_title, event_start_date, event_date_time, event_summary,
+    event_address, event_image_url, directions_url, event_page_url,
+    latitude, longitude, geo_tile, total_capacity, tickets_sold, tickets_remaining,
+    event_start_time, event_end_time, time_added, time_updated, event_source, content_hash
+) VALUES %s
+ON CONFLICT (event_page_url)
+DO UPDATE SET
+    event_title = EXCLUDED.event_title,
+    event_start_date = EXCLUDED.event_start_date,
+    event_date_time = EXCLUDED.event_date_time,
+    event_summary = EXCLUDED.event_summary,
+    event_address = EXCLUDED.event_address,
+    event_image_url = EXCLUDED.event_image_url,
+    directions_url = EXCLUDED.directions_url,
+    latitude = EXCLUDED.latitude,
+    longitude = EXCLUDED.longitude,
+    geo_tile = EXCLUDED.geo_tile,
+    total_capacity = EXCLUDED.total_capacity,
+    tickets_sold = EXCLUDED.tickets_sold,
+    tickets_remaining = EXCLUDED.tickets_remaining,
+    event_start_time = EXCLUDED.event_start_time,
+    event_end_time = EXCLUDED.event_end_time,
+    content_hash = EXCLUDED.content_hash,
+    time_updated = CURRENT_TIMESTAMP
+WHERE events.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+RETURNING (xmax = 0) AS inserted, event_page_url
+"""
 
-def save_eventbrite_event(event_data, ticket_data):
-    conn = setup_database_connection()
-    if not conn:
-        return False
-    
-    cursor = conn.cursor()
-    
-    try:
-        insert_data = {
-            'event_title': event_data.get('title'),
-            'event_start_date': event_data.get('start_date'),
-            'event_date_time': event_data.get('date_time'),
-            'event_summary': event_data.get('summary'),
-            'event_address': event_data.get('address'),
-            'event_image_url': event_data.get('image'),
-            'directions_url': event_data.get('directions_url'),
-            'event_page_url': event_data.get('page_url'),
-            'latitude': float(event_data.get('latitude')) if event_data.get('latitude') else None,
-            'longitude': float(event_data.get('longitude')) if event_data.get('longitude') else None,
-            'total_capacity': ticket_data.get('total_capacity') if ticket_data else None,
-            'tickets_sold': ticket_data.get('tickets_sold') if ticket_data else None,
-            'tickets_remaining': ticket_data.get('tickets_remaining') if ticket_data else None,
-            'event_source': 'EVENTBRITE'
-        }
-        
-        insert_query = """
-        INSERT INTO events (
-            event_title, event_start_date, event_date_time, event_summary,
-            event_address, event_image_url, directions_url, event_page_url,
-            latitude, longitude, total_capacity, tickets_sold, tickets_remaining,
-            time_added, time_updated, event_source
-        ) VALUES (
-            %(event_title)s, %(event_start_date)s, %(event_date_time)s, %(event_summary)s,
-            %(event_address)s, %(event_image_url)s, %(directions_url)s, %(event_page_url)s,
-            %(latitude)s, %(longitude)s, %(total_capacity)s, %(tickets_sold)s, %(tickets_remaining)s,
-            CURRENT_TIMESTAMP, CURRENT_TIMESTAMP, %(event_source)s
-        )
-        ON CONFLICT (event_page_url)
-        DO UPDATE SET
-            event_title = EXCLUDED.event_title,
-            event_start_date = EXCLUDED.event_start_date,
-            event_date_time = EXCLUDED.event_date_time,
-            event_summary = EXCLUDED.event_summary,
-            event_address = EXCLUDED.event_address,
-            event_image_url = EXCLUDED.event_image_url,
-            directions_url = EXCLUDED.directions_url,
-            latitude = EXCLUDED.latitude,
-            longitude = EXCLUDED.longitude,
-            total_capacity = EXCLUDED.total_capacity,
-            tickets_sold = EXCLUDED.tickets_sold,
-            tickets_remaining = EXCLUDED.tickets_remaining,
-            time_updated = CURRENT_TIMESTAMP
-        """
-        
-        cursor.execute(insert_query, insert_data)
-        conn.commit()
-        return True
-        
-    except Exception as e:
-        print(f"Database error for {insert_data.get('event_title', 'Unknown')}: {e}")
-        conn.rollback()
-        return False
-    finally:
-        cursor.close()
-        conn.close()
+EVENTBRITE_TEMPLATE = """(
+    %(event_title)s, %(event_start_date)s, %(event_date_time)s, %(event_summary)s,
+    %(event_address)s, %(event_image_url)s, %(directions_url)s, %(event_page_url)s,
+    %(latitude)s, %(longitude)s, %(geo_tile)s, %(total_capacity)s, %(tickets_sold)s, %(tickets_remaining)s,
+    %(event_start_time)s, %(event_end_time)s, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP, %(event_source)s, %(content_hash)s
+)"""
 
-def save_meetup_event(meetup_data):
-    conn = setup_database_connection()
-    if not conn:
-        return False
-    
-    cursor = conn.cursor()
-    
-    try:
-        # Parse timestamps first
-        raw_start_date = None
-        raw_end_date = None
-        date_time_formatted = None
-        
-        if meetup_data.get('start_datetime'):
-            try:
-                raw_start_date = arrow.get(meetup_data['start_datetime']).datetime
-            except:
-                pass
-                
-        if meetup_data.get('end_datetime'):
-            try:
-                raw_end_date = arrow.get(meetup_data['end_datetime']).datetime
-            except:
-                pass
-        
-        # Format readable date_time string
-        if meetup_data.get('start_datetime') and meetup_data.get('end_datetime'):
-            try:
-                start_dt = arrow.get(meetup_data['start_datetime'])
-                end_dt = arrow.get(meetup_data['end_datetime'])
-                start_readable = start_dt.format('dddd, MMMM D, YYYY [at] h:mm A')
-                end_readable = end_dt.format('h:mm A')
-                date_time_formatted = f"{start_readable} - {end_readable}"
-            except:
-                pass
-        elif meetup_data.get('start_datetime'):
-            try:
-                start_dt = arrow.get(meetup_data['start_datetime'])
-                date_time_formatted = start_dt.format('dddd, MMMM D, YYYY [at] h:mm A')
-            except:
-                pass
-        
-        insert_data = {
-    'event_title': meetup_data.get('title'),
-    'event_date_time': date_time_formatted,
-    'event_summary': meetup_data.get('description'),
-    'event_address': meetup_data.get('full_address') or meetup_data.get('venue_address'),
-    'event_image_url': meetup_data.get('image_url'),
-    'event_page_url': meetup_data.get('event_url'),
-    'latitude': float(meetup_data.get('latitude')) if meetup_data.get('latitude') else None,
-    'longitude': float(meetup_data.get('longitude')) if meetup_data.get('longitude') else None,
-    'tickets_sold': meetup_data.get('going_count'),
-    'event_start_time': raw_start_date,
-    'event_end_time': raw_end_date,
-    'event_source': 'MEETUP'
-}
-        
-        insert_query = """
+MEETUP_UPSERT_QUERY = """
 INSERT INTO events (
     event_title, event_date_time, event_summary,
     event_address, event_image_url, event_page_url,
-    latitude, longitude, tickets_sold,
-    event_start_time, event_end_time, event_source
-) VALUES (
-    %(event_title)s, %(event_date_time)s, %(event_summary)s,
-    %(event_address)s, %(event_image_url)s, %(event_page_url)s,
-    %(latitude)s, %(longitude)s, %(tickets_sold)s,
-    %(event_start_time)s, %(event_end_time)s, %(event_source)s
-)
+    latitude, longitude, geo_tile, tickets_sold,
+    event_start_time, event_end_time, time_added, time_updated, event_source, content_hash
+) VALUES %s
 ON CONFLICT (event_page_url)
 DO UPDATE SET
     event_title = EXCLUDED.event_title,
@@ -159,21 +67,330 @@ DO UPDATE SET
     event_image_url = EXCLUDED.event_image_url,
     latitude = EXCLUDED.latitude,
     longitude = EXCLUDED.longitude,
+    geo_tile = EXCLUDED.geo_tile,
     tickets_sold = EXCLUDED.tickets_sold,
     event_start_time = EXCLUDED.event_start_time,
     event_end_time = EXCLUDED.event_end_time,
     event_source = EXCLUDED.event_source,
+    content_hash = EXCLUDED.content_hash,
     time_updated = CURRENT_TIMESTAMP
+WHERE events.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+RETURNING (xmax = 0) AS inserted, event_page_url
 """
-        
-        cursor.execute(insert_query, insert_data)
-        conn.commit()
-        return True
-        
-    except Exception as e:
-        print(f"Database error for {meetup_data.get('title', 'Unknown')}: {e}")
+
+MEETUP_TEMPLATE = """(
+    %(event_title)s, %(event_date_time)s, %(event_summary)s,
+    %(event_address)s, %(event_image_url)s, %(event_page_url)s,
+    %(latitude)s, %(longitude)s, %(geo_tile)s, %(tickets_sold)s,
+    %(event_start_time)s, %(event_end_time)s, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP, %(event_source)s, %(content_hash)s
+)"""
+
+# Columns the upserts, dedup and refresh rely on beyond the backend's own
+# entity. They are added by migrate_schema.py; writers only check for them,
+# since even a no-op ALTER TABLE takes an exclusive lock on events.
+REQUIRED_COLUMNS = {
+    'events': ('content_hash', 'geo_tile', 'duplicate_of'),
+    'event_snapshots': ('event_id', 'captured_at', 'tickets_sold', 'tickets_remaining', 'total_capacity'),
+}
+
+class SchemaError(Exception):
+    def __init__(self, missing):
+        super().__init__(f"database is missing {', '.join(missing)}; run python migrate_schema.py")
+        self.missing = missing
+
+# Recorded for every row an upsert batch commits, changed or not; an
+# unchanged count is what marks an event as static
+SNAPSHOT_QUERY = """
+INSERT INTO event_snapshots (event_id, tickets_sold, tickets_remaining, total_capacity)
+SELECT events.id, observed.tickets_sold, observed.tickets_remaining, observed.total_capacity
+FROM (VALUES %s) AS observed (event_page_url, tickets_sold, tickets_remaining, total_capacity)
+JOIN events ON events.event_page_url = observed.event_page_url
+"""
+
+SNAPSHOT_TEMPLATE = "(%s, %s::integer, %s::integer, %s::integer)"
+
+
+UPSERTS = {
+    'EVENTBRITE': (EVENTBRITE_UPSERT_QUERY, EVENTBRITE_TEMPLATE),
+    'MEETUP': (MEETUP_UPSERT_QUERY, MEETUP_TEMPLATE),
+}
+
+def template_columns(template):
+    return re.findall(r'%\((\w+)\)s', template)
+
+# The named templates document each source's columns (and spool.py builds
+# its merge from them); execute_values is given positional templates and
+# one tuple per EventRecord, read off its slots in a single attrgetter call
+ROW_VALUES = {
+    source: (re.sub(r'%\(\w+\)s', '%s', template), attrgetter(*template_columns(template)))
+    for source, (_, template) in UPSERTS.items()
+}
+HASHED_COLUMNS = {
+    source: [column for column in template_columns(template) if column != 'content_hash']
+    for source, (_, template) in UPSERTS.items()
+}
+
+def get_connection_params():
+    return {
+        'host': os.getenv('DB_HOST'),
+        'database': os.getenv('DB_NAME'),
+        'user': os.getenv('DB_USER'),
+        'password': os.getenv('DB_PASSWORD'),
+        'port': os.getenv('DB_PORT'),
+    }
+
+def setup_database_connection():
+    conn = psycopg2.connect(**get_connection_params())
+    return conn
+
+def missing_columns(conn):
+    # table.column for every required column the database does not have
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT table_name, column_name FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = ANY(%s)",
+            (list(REQUIRED_COLUMNS),),
+        )
+        present = set(cursor.fetchall())
+    conn.commit()
+    return [
+        f"{table}.{column}"
+        for table, columns in REQUIRED_COLUMNS.items()
+        for column in columns
+        if (table, column) not in present
+    ]
+
+def check_schema(conn):
+    missing = missing_columns(conn)
+    if missing:
+        raise SchemaError(missing)
+
+def write_snapshots(cursor, rows):
+    observations = [
+        (row.event_page_url, row.tickets_sold, row.tickets_remaining, row.total_capacity)
+        for row in rows if row.event_page_url
+    ]
+    if observations:
+        execute_values(cursor, SNAPSHOT_QUERY, observations, template=SNAPSHOT_TEMPLATE, page_size=len(observations))
+
+def compute_content_hash(record):
+    # Stable over the source's upsert columns, so re-scraping an unchanged
+    # event produces the same digest and the upsert can skip the write. The
+    # JSON is the same as for the dict rows written before EventRecord, so
+    # stored hashes still match.
+    fields = {column: getattr(record, column) for column in HASHED_COLUMNS[record.event_source]}
+    payload = json.dumps(fields, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def rollback(conn):
+    # False when the connection is gone and has to be discarded
+    try:
         conn.rollback()
+        return True
+    except psycopg2.Error:
         return False
-    finally:
-        cursor.close()
-        conn.close()
\ No newline at end of file
+
+def notify(callbacks, source, rows):
+    for callback in callbacks:
+        try:
+            callback(source, rows)
+        except Exception as e:
+            print(f"Flush callback failed: {e}")
+
+# How often the flush thread looks for rows that have waited flush_interval
+FLUSH_CHECK_INTERVAL = 1.0
+
+def flush_periodically(writer):
+    # Body of a writer's flush thread. add() only notices an overdue flush
+    # when another row arrives, which never happens once a listing ends or a
+    # source goes quiet between refresh cycles.
+    while not writer.closed.wait(min(writer.flush_interval, FLUSH_CHECK_INTERVAL)):
+        try:
+            writer.flush_if_due()
+        except Exception as e:
+            print(f"Background flush failed: {e}")
+
+def start_flush_thread(writer):
+    thread = threading.Thread(target=flush_periodically, args=(writer,), name='writer-flush', daemon=True)
+    thread.start()
+    return thread
+
+class EventWriter:
+    # Buffers EventRecords and writes them as multi-row upserts over a
+    # pooled connection. Rows are flushed once batch_size rows are pending,
+    # by a background thread once they have waited flush_interval seconds
+    # since the last flush (checked every FLUSH_CHECK_INTERVAL), and on close().
+
+    def __init__(self, batch_size=50, flush_interval=30, min_connections=1, max_connections=4):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pool = pool.ThreadedConnectionPool(min_connections, max_connections, **get_connection_params())
+        conn = self.pool.getconn()
+        try:
+            check_schema(conn)
+        except Exception:
+            self.pool.closeall()
+            raise
+        self.pool.putconn(conn)
+        self.pending = {source: {} for source in UPSERTS}
+        self.pending_count = 0
+        self.last_flush = time.monotonic()
+        self.lock = threading.Lock()
+        self.saved = 0
+        self.failed = 0
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        # Called with (source, rows) once rows are committed
+        self.on_flush = []
+        # Called with (source, rows) for the committed rows that were
+        # inserted or updated, not skipped by their content hash
+        self.on_change = []
+        self.closed = threading.Event()
+        self.flusher = start_flush_thread(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add_eventbrite_event(self, event_data, ticket_data):
+        self.add(eventbrite_record(event_data, ticket_data))
+
+    def add_meetup_event(self, meetup_data):
+        self.add(meetup_record(meetup_data))
+
+    def add(self, record):
+        record.content_hash = compute_content_hash(record)
+        with self.lock:
+            rows = self.pending[record.event_source]
+            # A multi-row ON CONFLICT cannot touch the same key twice, so the
+            # latest copy of an event replaces any pending one
+            key = record.event_page_url or id(record)
+            if key not in rows:
+                self.pending_count += 1
+            rows[key] = record
+
+            due = (self.pending_count >= self.batch_size or
+                   time.monotonic() - self.last_flush >= self.flush_interval)
+
+        if due:
+            self.flush()
+
+    def flush_if_due(self):
+        with self.lock:
+            due = self.pending_count and time.monotonic() - self.last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            batches = {source: list(rows.values()) for source, rows in self.pending.items() if rows}
+            self.pending = {source: {} for source in UPSERTS}
+            self.pending_count = 0
+            self.last_flush = time.monotonic()
+
+        for source, rows in batches.items():
+            self.write_batch(source, rows)
+
+    def write_batch(self, source, rows):
+        query, _ = UPSERTS[source]
+        template, values = ROW_VALUES[source]
+        start = time.perf_counter()
+        conn = None
+        broken = False
+
+        try:
+            conn = self.pool.getconn()
+            try:
+                with conn.cursor() as cursor:
+                    results = execute_values(cursor, query, [values(row) for row in rows], template=template,
+                                             page_size=len(rows), fetch=True)
+                    write_snapshots(cursor, rows)
+                conn.commit()
+                self.record_results(len(rows), results)
+                self.notify_flushed(source, rows, results)
+                return
+            except Exception as e:
+                broken = not rollback(conn)
+                if broken or len(rows) == 1:
+                    # A dropped connection would fail every replayed row too
+                    self.report_failures(rows, e)
+                    return
+
+            # Replay the batch row by row so a single bad event is reported
+            # without losing the rest of the batch
+            for i, row in enumerate(rows):
+                try:
+                    with conn.cursor() as cursor:
+                        results = execute_values(cursor, query, [values(row)], template=template, fetch=True)
+                        write_snapshots(cursor, [row])
+                    conn.commit()
+                    self.record_results(1, results)
+                    self.notify_flushed(source, [row], results)
+                except Exception as e:
+                    if not rollback(conn):
+                        broken = True
+                        self.report_failures(rows[i:], e)
+                        return
+                    self.report_failure(row, e)
+        except psycopg2.Error as e:
+            # No connection could be taken from the pool
+            self.report_failures(rows, e)
+        finally:
+            if conn is not None:
+                # A broken connection is closed instead of going back to the pool
+                self.pool.putconn(conn, close=broken)
+            metrics.observe('db_write', time.perf_counter() - start)
+
+    def notify_flushed(self, source, rows, results):
+        changed_urls = {url for _, url in results}
+        changed = [row for row in rows if row.event_page_url in changed_urls]
+        notify(self.on_flush, source, rows)
+        if changed:
+            notify(self.on_change, source, changed)
+
+    def report_failure(self, row, error):
+        print(f"Database error for {row.event_title or 'Unknown'}: {error}")
+        metrics.fail('db_write')
+        self.record(failed=1)
+
+    def report_failures(self, rows, error):
+        if len(rows) == 1:
+            self.report_failure(rows[0], error)
+            return
+        print(f"Database error for {len(rows)} events: {error}")
+        metrics.fail('db_write')
+        self.record(failed=len(rows))
+
+    def record_results(self, row_count, results):
+        # RETURNING only yields rows that were inserted or actually updated;
+        # rows whose content hash matched were left untouched
+        inserted = sum(1 for was_inserted, _ in results if was_inserted)
+        updated = len(results) - inserted
+        with self.lock:
+            self.saved += row_count
+            self.inserted += inserted
+            self.updated += updated
+            self.unchanged += row_count - len(results)
+
+    def record(self, saved=0, failed=0):
+        with self.lock:
+            self.saved += saved
+            self.failed += failed
+
+    def summary(self):
+        return (f"{self.saved} saved ({self.inserted} inserted, {self.updated} updated, "
+                f"{self.unchanged} unchanged), {self.failed} failed")
+
+    def close(self):
+        if self.pool.closed:
+            return
+        # A background flush still writing must finish before the pool closes
+        self.closed.set()
+        self.flusher.join()
+        try:
+            self.flush()
+        finally:
+            self.pool.closeall()
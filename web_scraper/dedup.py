@@ -0,0 +1,242 @@
+from database_utils import check_schema, setup_database_connection
+from event_record import EventRecord
+from geo_tiles import geo_tile, tiles_in_bounds
+from psycopg2.extras import execute_values
+from collections import defaultdict
+from functools import lru_cache
+import argparse
+import datetime
+import hashlib
+import math
+import re
+import struct
+import time
+import unicodedata
+
+# Finds the same real-world event listed more than once (usually once on
+# Meetup and once on Eventbrite) and links every copy to a canonical row
+# through events.duplicate_of, which the backend's searches filter on.
+#
+# Candidates are blocked by geo tile and start hour, so an event is only
+# ever compared with events that could be within MAX_DISTANCE_M and
+# MAX_START_DIFF of it. Inside a block, titles are MinHashed over character
+# shingles and banded (LSH), so only events sharing a band are compared,
+# however crowded the block. Matches are merged with union-find and the
+# lowest id of each cluster stays canonical, so links are stable across runs.
+
+SHINGLE_SIZE = 3
+BANDS = 8
+ROWS = 4
+NUM_HASHES = BANDS * ROWS
+# Estimated Jaccard similarity of title shingles for a match. The banding
+# catches pairs above roughly (1 / BANDS) ** (1 / ROWS) = 0.59.
+SIMILARITY = 0.6
+MAX_DISTANCE_M = 250
+MAX_START_DIFF = 30 * 60
+BUCKET_SECONDS = 4 * 3600
+METERS_PER_DEGREE = 111320
+
+# One SHAKE digest per shingle, read as NUM_HASHES independent 32-bit hashes
+HASH_FORMAT = struct.Struct(f'<{NUM_HASHES}I')
+
+def normalize_title(title):
+    title = unicodedata.normalize('NFKD', title or '').encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^a-z0-9]+', ' ', title.lower()).strip()
+
+def shingles(title):
+    text = f" {normalize_title(title)} "
+    if len(text) <= SHINGLE_SIZE:
+        return set()
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+@lru_cache(maxsize=32768)
+def shingle_hashes(shingle):
+    # Titles share most of their trigrams, so this is nearly always a hit
+    return HASH_FORMAT.unpack(hashlib.shake_128(shingle.encode('utf-8')).digest(HASH_FORMAT.size))
+
+@lru_cache(maxsize=65536)
+def minhash(title):
+    hashes = [shingle_hashes(shingle) for shingle in shingles(title)]
+    if not hashes:
+        return None
+    # Column-wise minimum: one MinHash value per hash function
+    return tuple(map(min, zip(*hashes)))
+
+def similarity(signature, other):
+    return sum(1 for a, b in zip(signature, other) if a == b) / NUM_HASHES
+
+def epoch_seconds(value):
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            # Naive timestamps from the database are compared with each other
+            return value.replace(tzinfo=datetime.timezone.utc).timestamp()
+        return value.timestamp()
+    return None
+
+def distance_m(lat, lng, other_lat, other_lng):
+    # Equirectangular is exact enough at a few hundred metres
+    x = (lng - other_lng) * math.cos(math.radians((lat + other_lat) / 2))
+    return math.hypot(lat - other_lat, x) * METERS_PER_DEGREE
+
+class UnionFind:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        parent = self.parent.setdefault(item, item)
+        if parent != item:
+            parent = self.parent[item] = self.find(parent)
+        return parent
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            # The lowest id stays the canonical row
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+class DedupIndex:
+    # Events are added one at a time; each is matched against the events
+    # already indexed in the blocks it could have a duplicate in
+
+    def __init__(self, similarity_threshold=SIMILARITY, max_distance_m=MAX_DISTANCE_M,
+                 max_start_diff=MAX_START_DIFF, cross_source_only=True):
+        self.similarity_threshold = similarity_threshold
+        self.max_distance_m = max_distance_m
+        self.max_start_diff = max_start_diff
+        self.cross_source_only = cross_source_only
+        self.bands = defaultdict(list)
+        self.events = {}
+        self.clusters = UnionFind()
+        self.added = 0
+        self.skipped = 0
+        self.compared = 0
+        self.matched = 0
+
+    def nearby_blocks(self, latitude, longitude, start):
+        # Every tile and hour bucket a match could have been filed under
+        lat_margin = self.max_distance_m / METERS_PER_DEGREE
+        lng_margin = lat_margin / max(math.cos(math.radians(latitude)), 0.01)
+        tiles = tiles_in_bounds(latitude + lat_margin, latitude - lat_margin,
+                                longitude + lng_margin, longitude - lng_margin)
+        first_bucket = math.floor((start - self.max_start_diff) / BUCKET_SECONDS)
+        last_bucket = math.floor((start + self.max_start_diff) / BUCKET_SECONDS)
+        return [(tile, bucket) for tile in tiles for bucket in range(first_bucket, last_bucket + 1)]
+
+    def is_match(self, event, other):
+        if self.cross_source_only and event['source'] == other['source']:
+            return False
+        if abs(event['start'] - other['start']) > self.max_start_diff:
+            return False
+        if distance_m(event['latitude'], event['longitude'], other['latitude'], other['longitude']) > self.max_distance_m:
+            return False
+        return similarity(event['signature'], other['signature']) >= self.similarity_threshold
+
+    def add(self, event_id, title, latitude, longitude, start_time, source=None):
+        start = epoch_seconds(start_time)
+        signature = minhash(normalize_title(title))
+        if latitude is None or longitude is None or start is None or signature is None:
+            self.skipped += 1
+            return []
+
+        event = {
+            'source': source, 'latitude': latitude, 'longitude': longitude,
+            'start': start, 'signature': signature,
+        }
+        bands = [(band, signature[band * ROWS:(band + 1) * ROWS]) for band in range(BANDS)]
+
+        candidates = set()
+        for block in self.nearby_blocks(latitude, longitude, start):
+            for band in bands:
+                candidates.update(self.bands.get(hash((block, band)), ()))
+
+        matches = []
+        for other_id in candidates:
+            self.compared += 1
+            if self.is_match(event, self.events[other_id]):
+                matches.append(other_id)
+                self.clusters.union(event_id, other_id)
+        self.matched += len(matches)
+
+        # Keyed by the hash alone to keep the table small; a collision only
+        # adds a candidate that is_match rejects
+        block = (geo_tile(latitude, longitude), math.floor(start / BUCKET_SECONDS))
+        for band in bands:
+            self.bands[hash((block, band))].append(event_id)
+        self.events[event_id] = event
+        self.added += 1
+        return matches
+
+    def canonical_ids(self):
+        # {event id: canonical id} for every event that is a duplicate
+        canonical = {}
+        for event_id in self.events:
+            root = self.clusters.find(event_id)
+            if root != event_id:
+                canonical[event_id] = root
+        return canonical
+
+    def summary(self):
+        return (f"{self.added} events indexed, {self.skipped} skipped without title, location or start, "
+                f"{self.compared} candidate pairs compared, {self.matched} matched")
+
+ACTIVE_EVENTS_QUERY = """
+SELECT id, event_title, latitude, longitude, event_start_time, event_end_time, event_source, duplicate_of
+FROM events
+WHERE event_end_time >= LOCALTIMESTAMP
+ORDER BY id
+"""
+
+SET_DUPLICATE_OF = """
+UPDATE events SET duplicate_of = links.duplicate_of
+FROM (VALUES %s) AS links (id, duplicate_of)
+WHERE events.id = links.id
+"""
+
+def dedup_active_events(cross_source_only=True, dry_run=False):
+    # Links the duplicates among events that have not ended and unlinks
+    # rows that no longer match. Returns the rows whose link changed, for
+    # cache invalidation.
+    start = time.perf_counter()
+    conn = setup_database_connection()
+    try:
+        check_schema(conn)
+        with conn.cursor() as cursor:
+            cursor.execute(ACTIVE_EVENTS_QUERY)
+            rows = cursor.fetchall()
+
+        index = DedupIndex(cross_source_only=cross_source_only)
+        for event_id, title, latitude, longitude, start_time, _, source, _ in rows:
+            index.add(event_id, title, latitude, longitude, start_time, source)
+        canonical = index.canonical_ids()
+
+        changed = [row for row in rows if canonical.get(row[0]) != row[7]]
+        if changed and not dry_run:
+            with conn.cursor() as cursor:
+                execute_values(cursor, SET_DUPLICATE_OF, [(row[0], canonical.get(row[0])) for row in changed],
+                               template='(%s, %s::bigint)', page_size=1000)
+            conn.commit()
+    finally:
+        conn.close()
+
+    print(f"Dedup: {index.summary()}")
+    print(f"Dedup: {len(canonical)} of {len(rows)} active events are duplicates, "
+          f"{len(changed)} links {'would change' if dry_run else 'changed'} in {time.perf_counter() - start:.1f}s")
+    return [
+        EventRecord(source, latitude=latitude, longitude=longitude, event_start_time=start_time, event_end_time=end_time)
+        for _, _, latitude, longitude, start_time, end_time, source, _ in changed
+    ]
+
+def add_dedup_arguments(parser):
+    parser.add_argument('--dedup', action='store_true',
+                        help='link the same event listed on several sources to one canonical row after the run')
+
+def main():
+    parser = argparse.ArgumentParser(description='Link duplicate active events to a canonical row')
+    parser.add_argument('--same-source', action='store_true',
+                        help='also match events from the same source, not only across sources')
+    parser.add_argument('--dry-run', action='store_true', help='report the links without writing them')
+    args = parser.parse_args()
+    dedup_active_events(cross_source_only=not args.same_source, dry_run=args.dry_run)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from webdriver_manager.chrome import ChromeDriverManager
+import os
+import threading
+
+DRIVER_PATH_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'chromedriver_path')
+
+# Passed to Network.setBlockedURLs; the scrapers only read inline JSON and
+# the DOM, so none of these are needed to extract an event
+BLOCKED_URL_PATTERNS = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.avif', '*.svg', '*.ico',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    '*.mp4', '*.webm', '*.m3u8', '*.mp3',
+    '*googletagmanager.com*', '*google-analytics.com*', '*doubleclick.net*',
+    '*googlesyndication.com*', '*facebook.net*', '*facebook.com/tr*',
+    '*hotjar.com*', '*segment.io*', '*segment.com*', '*amplitude.com*',
+    '*branch.io*', '*optimizely.com*', '*newrelic.com*', '*nr-data.net*',
+    '*sentry.io*', '*bing.com*', '*tiktok.com*', '*snapchat.com*', '*pinterest.com*',
+]
+
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+def resolve_driver_path():
+    # ChromeDriverManager().install() checks for the latest release on every
+    # call, so resolve the binary once and reuse it across drivers and runs
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path:
+            return _driver_path
+
+        path = os.getenv('CHROMEDRIVER_PATH')
+        if not path:
+            try:
+                with open(DRIVER_PATH_CACHE, encoding='utf-8') as f:
+                    cached = f.read().strip()
+                if os.path.exists(cached):
+                    path = cached
+            except OSError:
+                pass
+
+        if not path:
+            path = ChromeDriverManager().install()
+            os.makedirs(os.path.dirname(DRIVER_PATH_CACHE), exist_ok=True)
+            with open(DRIVER_PATH_CACHE, 'w', encoding='utf-8') as f:
+                f.write(path)
+
+        _driver_path = path
+        return path
+
+def create_driver(headless=True, block_resources=True, page_load_strategy='eager', performance_log=False):
+    options = webdriver.ChromeOptions()
+    options.page_load_strategy = page_load_strategy
+    if headless:
+        options.add_argument('--headless=new')
+    options.add_argument('--window-size=1400,1000')
+    options.add_argument('--disable-extensions')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument('--no-first-run')
+    # Every event opens in the same tab; the back/forward cache would keep
+    # the previous pages alive in the renderer
+    options.add_argument('--disable-features=BackForwardCache')
+    if block_resources:
+        options.add_experimental_option('prefs', {
+            'profile.managed_default_content_settings.images': 2,
+            'profile.managed_default_content_settings.media_stream': 2,
+        })
+    if performance_log:
+        options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+
+    driver = webdriver.Chrome(service=Service(resolve_driver_path()), options=options)
+
+    if block_resources:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URL_PATTERNS})
+
+    return driver
+
+def add_driver_arguments(parser):
+    parser.add_argument('--headed', action='store_true', help='show the browser window')
+    parser.add_argument('--no-block', action='store_true', help='load images, fonts and third-party scripts')
+
+def driver_options_from_args(args):
+    return {'headless': not args.headed, 'block_resources': not args.no_block}
@@ -0,0 +1,216 @@
+from driver_factory import create_driver
+from scheduler import default_scheduler as scheduler, CircuitOpenError
+from memory import driver_rss_mb
+import queue
+import threading
+
+DONE = object()
+# Walking /proc for a driver's process tree takes a few milliseconds
+RSS_CHECK_EVERY = 10
+
+class PoolStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.discovered = 0
+        self.scraped = 0
+        self.succeeded = 0
+        self.recycled = 0
+        self.peak_driver_mb = 0.0
+
+    def record(self, success):
+        with self.lock:
+            self.scraped += 1
+            if success:
+                self.succeeded += 1
+
+    def driver_measured(self, rss):
+        with self.lock:
+            self.peak_driver_mb = max(self.peak_driver_mb, rss)
+
+    def add(self, other):
+        with self.lock:
+            self.scraped += other.scraped
+            self.succeeded += other.succeeded
+            self.recycled += other.recycled
+            self.peak_driver_mb = max(self.peak_driver_mb, other.peak_driver_mb)
+
+class DriverPool:
+    # One listing worker expands listing pages into event URLs on a shared
+    # queue; num_workers scrape workers each own a driver and drain it.
+    #
+    #   expand_listing(driver) -> iterable of event URLs
+    #   scrape_url(driver, url, index) -> True when the event was extracted
+    #
+    # A scrape worker replaces its driver after recycle_pages pages, or once
+    # the driver's process tree passes max_driver_rss_mb, so long runs do
+    # not accumulate browser state.
+    #
+    # With dedupe, a URL the listing yields twice is scraped once. Pools fed
+    # from a queue that already decides when a URL is due again (refresh,
+    # journal retries) turn it off.
+    #
+    # retries (a Journal) is only read once the listing and every worker
+    # have finished, so failures recorded by the last workers are retried
+    # too: each round scrapes the failures whose backoff is due, until none
+    # are left within the journal's retry_wait.
+
+    def __init__(self, expand_listing, scrape_url, num_workers=4, create_driver=create_driver,
+                 create_listing_driver=None, queue_size=200, recycle_pages=None, max_driver_rss_mb=None,
+                 dedupe=True, retries=None):
+        self.expand_listing = expand_listing
+        self.scrape_url = scrape_url
+        self.num_workers = num_workers
+        self.create_driver = create_driver
+        self.create_listing_driver = create_listing_driver or create_driver
+        self.recycle_pages = recycle_pages
+        self.max_driver_rss_mb = max_driver_rss_mb
+        self.dedupe = dedupe
+        self.retries = retries
+        self.urls = queue.Queue(maxsize=queue_size)
+        self.stop = threading.Event()
+        self.stats = PoolStats()
+
+    def put(self, item):
+        while not self.stop.is_set():
+            try:
+                self.urls.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def listing_worker(self):
+        driver = None
+        try:
+            driver = self.create_listing_driver()
+            seen = set()
+            for url in self.expand_listing(driver):
+                if self.stop.is_set():
+                    break
+                if self.dedupe:
+                    if url in seen:
+                        continue
+                    seen.add(url)
+                with self.stats.lock:
+                    self.stats.discovered += 1
+                    index = self.stats.discovered
+                if not self.put((index, url)):
+                    break
+        except CircuitOpenError as e:
+            # The rest of the listing would only fail fast too
+            print(f"Listing stopped: {e}")
+            self.stop.set()
+        except Exception as e:
+            print(f"Listing worker failed: {e}")
+        finally:
+            if driver:
+                driver.quit()
+            for _ in range(self.num_workers):
+                self.put(DONE)
+
+    def recycle_reason(self, driver, pages):
+        if self.recycle_pages and pages >= self.recycle_pages:
+            rss = driver_rss_mb(driver)
+            if rss is not None:
+                self.stats.driver_measured(rss)
+            return f"{pages} pages"
+        if self.max_driver_rss_mb and pages % RSS_CHECK_EVERY == 0:
+            rss = driver_rss_mb(driver)
+            if rss is None:
+                return None
+            self.stats.driver_measured(rss)
+            if rss >= self.max_driver_rss_mb:
+                return f"{rss:.0f} MB"
+        return None
+
+    def scrape_worker(self, worker_id):
+        driver = None
+        pages = 0
+        try:
+            driver = self.create_driver()
+            while not self.stop.is_set():
+                try:
+                    item = self.urls.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                if item is DONE:
+                    break
+                index, url = item
+                try:
+                    success = self.scrape_url(driver, url, index)
+                except CircuitOpenError as e:
+                    print(f"Worker {worker_id} stopping: {e}")
+                    self.stop.set()
+                    break
+                except Exception as e:
+                    print(f"Worker {worker_id} failed on {url}: {e}")
+                    success = False
+                self.stats.record(success)
+
+                pages += 1
+                reason = self.recycle_reason(driver, pages)
+                if reason:
+                    print(f"Worker {worker_id} recycling its driver after {reason}")
+                    driver.quit()
+                    driver = None
+                    driver = self.create_driver()
+                    pages = 0
+                    with self.stats.lock:
+                        self.stats.recycled += 1
+        except Exception as e:
+            print(f"Worker {worker_id} could not start a driver: {e}")
+        finally:
+            if driver:
+                driver.quit()
+
+    def run(self):
+        listing = threading.Thread(target=self.listing_worker, name='listing', daemon=True)
+        workers = [
+            threading.Thread(target=self.scrape_worker, args=(i,), name=f'scraper-{i}', daemon=True)
+            for i in range(1, self.num_workers + 1)
+        ]
+        threads = [listing] + workers
+
+        for thread in threads:
+            thread.start()
+
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=0.5)
+                if listing.is_alive() and not any(worker.is_alive() for worker in workers):
+                    print("All scrape workers exited, stopping listing worker")
+                    self.stop.set()
+        except KeyboardInterrupt:
+            print("\nStopping driver pool...")
+            self.stop.set()
+            scheduler.cancel()
+            for thread in threads:
+                thread.join()
+            raise
+
+        if self.retries:
+            self.run_retries()
+        return self.stats
+
+    def run_retries(self):
+        while not self.stop.is_set() and self.retries.retries_due():
+            retry = DriverPool(
+                expand_listing=lambda driver: self.retries.iter_retries(),
+                scrape_url=self.scrape_url,
+                num_workers=self.num_workers,
+                create_driver=self.create_driver,
+                # Retries come from the journal, not from a page
+                create_listing_driver=lambda: None,
+                recycle_pages=self.recycle_pages,
+                max_driver_rss_mb=self.max_driver_rss_mb,
+                dedupe=False,
+            )
+            print("Retrying failed events")
+            retry.run()
+            self.stats.add(retry.stats)
+            if retry.stop.is_set():
+                self.stop.set()
+            if not retry.stats.scraped:
+                # Workers that could not start would otherwise loop forever
+                break
@@ -1,16 +1,80 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-import time
+from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.common.by import By
 import re
 import json
-import random
-from database_utils import save_eventbrite_event
+import arrow
+import argparse
+from spool import add_spool_arguments, writer_from_args
+from driver_pool import DriverPool
+from driver_factory import create_driver, add_driver_arguments, driver_options_from_args
+from scheduler import default_scheduler as scheduler, wait_for, add_scheduler_arguments, configure_from_args, CircuitOpenError
+from frontier import add_frontier_arguments, frontier_from_args
+from journal import add_journal_arguments, journal_from_args, journal_event_urls
+from cache_invalidation import add_cache_arguments, invalidator_from_args
+from instrumentation import metrics, add_report_arguments, finish_run
+from listing_harvester import NetworkRecorder, find_records
+from event_record import eventbrite_record
 
-def setup_driver():
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service)
-    return driver
+SEARCH_API_PATTERN = re.compile(r'/api/v3/destination/')
+
+LISTING_READY = (By.XPATH, '//a[@class="event-card-link "]')
+DIRECTIONS_READY = (By.XPATH, '//a[@aria-label="Driving directions"]')
+
+def event_page_ready(driver):
+    return driver.execute_script("return !!window.__SERVER_DATA__ || !!document.querySelector('h1')")
+
+DOM_FIELDS = {
+    'title': ('//h1[@class="event-title css-0"]', None),
+    'start_date': ('//time[@class="start-date"]', None),
+    'date_time': ('//span[@class="date-info__full-datetime"]', None),
+    'summary': ('//p[@class="summary"]', None),
+    'address': ('//div[@class="location-info__address"]', None),
+    'image': ('//img[@data-testid="hero-img"]', 'src'),
+}
+
+SERVER_DATA_MARKER = 'window.__SERVER_DATA__'
+JSON_DECODER = json.JSONDecoder()
+# Serializes only the payload in the browser, instead of copying the whole
+# rendered document into Python through page_source
+SERVER_DATA_SCRIPT = "return window.__SERVER_DATA__ ? JSON.stringify(window.__SERVER_DATA__) : null"
+# Hrefs of the listing's event cards that have text, read in one round trip
+# so no WebElement references outlive the page
+LISTING_HREFS_SCRIPT = """
+return Array.from(document.querySelectorAll('a[class="event-card-link "]'))
+    .filter(a => a.innerText.trim())
+    .map(a => a.href);
+"""
+
+# Candidate locations of each field inside __SERVER_DATA__, most specific first
+SERVER_DATA_FIELDS = {
+    'title': [('event', 'name'), ('components', 'eventTitle', 'title')],
+    'summary': [('event', 'summary'), ('components', 'eventDescription', 'summary')],
+    'address': [
+        ('event', 'venue', 'address', 'localizedAddressDisplay'),
+        ('event', 'venue', 'address', 'localized_address_display'),
+        ('components', 'eventMap', 'venueAddress'),
+    ],
+    'latitude': [
+        ('event', 'venue', 'address', 'latitude'),
+        ('event', 'venue', 'latitude'),
+        ('components', 'eventMap', 'location', 'latitude'),
+    ],
+    'longitude': [
+        ('event', 'venue', 'address', 'longitude'),
+        ('event', 'venue', 'longitude'),
+        ('components', 'eventMap', 'location', 'longitude'),
+    ],
+    'image': [
+        ('event', 'image', 'url'),
+        ('event', 'logo', 'url'),
+        ('components', 'eventHero', 'items', 0, 'croppedLogoUrl940'),
+        ('components', 'eventHero', 'items', 0, 'croppedLogoUrl600'),
+    ],
+    'page_url': [('event', 'url')],
+    'start': [('event', 'start'), ('event', 'startDate')],
+    'end': [('event', 'end'), ('event', 'endDate')],
+    'ticket_classes': [('event_listing_response', 'tickets', 'ticketClasses')],
+}
 
 def extract_coordinates_from_google_url(google_url):
     coords = re.search(r'daddr=([0-9.-]+),([0-9.-]+)', google_url)
@@ -18,206 +82,470 @@ def extract_coordinates_from_google_url(google_url):
         return coords.groups()
     return None, None
 
-def get_events_from_listing_page(driver, website):
-    driver.get(website)
-    time.sleep(random.uniform(2, 4))
+def get_event_urls_from_listing_page(driver, website):
+    if not scheduler.get(driver, website, LISTING_READY, stage='listing'):
+        print(f"Listing {website} did not load")
+        return []
     
-    events = driver.find_elements("xpath", '//a[@class="event-card-link "]')
-    events_with_text = [event for event in events if event.text.strip()]
+    hrefs = driver.execute_script(LISTING_HREFS_SCRIPT) or []
+    print(f"Found {len(hrefs)} unique events on this page")
     
-    print(f"Found {len(events_with_text)} unique events on this page")
-    return events_with_text
+    urls = []
+    for url in hrefs:
+        if url and url.split('?')[0] not in urls:
+            urls.append(url.split('?')[0])
+    return urls
 
-def navigate_to_event_page(driver, event):
-    main_window = driver.current_window_handle
-    
-    driver.execute_script("arguments[0].click();", event)
-    time.sleep(2)
+def is_eventbrite_search_result(node):
+    url = node.get('url')
+    return (isinstance(url, str) and '/e/' in url and 'name' in node and
+            ('start_date' in node or 'primary_venue' in node))
+
+def search_result_datetime(date, time_of_day, timezone):
+    if not date:
+        return None
+    local = f"{date}T{time_of_day or '00:00'}"
+    try:
+        return (arrow.get(local, tzinfo=timezone) if timezone else arrow.get(local)).isoformat()
+    except (ValueError, TypeError):
+        return None
+
+def event_data_from_search_result(node):
+    address = (node.get('primary_venue') or {}).get('address') or {}
+    return {
+        'title': node.get('name'),
+        'summary': node.get('summary'),
+        'address': address.get('localized_address_display'),
+        'latitude': address.get('latitude'),
+        'longitude': address.get('longitude'),
+        'image': (node.get('image') or {}).get('url'),
+        'page_url': node['url'].split('?')[0],
+        'start_datetime': search_result_datetime(node.get('start_date'), node.get('start_time'), node.get('timezone')),
+        'end_datetime': search_result_datetime(node.get('end_date'), node.get('end_time'), node.get('timezone')),
+    }
+
+def eventbrite_records_from_payload(payload):
+    for node in find_records(payload, is_eventbrite_search_result):
+        yield event_data_from_search_result(node)
+
+def harvest_listing_records(driver, base_url, max_pages):
+    # Reads search results from each listing page's __SERVER_DATA__ and any
+    # search API responses it made, instead of scraping the rendered cards.
+    # Needs a driver created with performance_log=True.
+    recorder = NetworkRecorder(driver, lambda url: SEARCH_API_PATTERN.search(url))
+    seen = set()
     
-    all_windows = driver.window_handles
-    if len(all_windows) > 1:
-        for window in all_windows:
-            if window != main_window:
-                driver.switch_to.window(window)
-                break
+    for page_num in range(1, max_pages + 1):
+        print(f"\nHARVESTING PAGE {page_num}")
+        if not scheduler.get(driver, f"{base_url}?page={page_num}", LISTING_READY, stage='listing'):
+            print(f"Page {page_num} did not load. Stopping.")
+            break
+        
+        payloads = []
+        server_data = read_server_data(driver)
+        if server_data:
+            payloads.append(server_data)
+        payloads.extend(recorder.drain())
+        
+        new_records = 0
+        for payload in payloads:
+            for record in eventbrite_records_from_payload(payload):
+                if record['page_url'] in seen:
+                    continue
+                seen.add(record['page_url'])
+                new_records += 1
+                yield record
+        
+        if not new_records:
+            print(f"No new events found on page {page_num}. Stopping.")
+            break
+
+def iter_listing_event_urls(driver, base_url, max_pages, harvest=False, journal=None):
+    if harvest:
+        for record in harvest_listing_records(driver, base_url, max_pages):
+            yield record['page_url']
+        return
     
-    return main_window
+    for page_num in range(1, max_pages + 1):
+        website = f"{base_url}?page={page_num}"
+        if journal and journal.is_listed(website):
+            print(f"\nPAGE {page_num} already expanded in the journaled run")
+            continue
+        
+        print(f"\nEXPANDING PAGE {page_num}")
+        event_urls = get_event_urls_from_listing_page(driver, website)
+        
+        if not event_urls:
+            print(f"No events found on page {page_num}. Stopping.")
+            break
+        
+        yield from event_urls
+        if journal:
+            journal.mark_listed(website)
+
+def iter_event_urls(driver, base_url, max_pages, harvest=False, frontier=None, journal=None):
+    event_urls = iter_listing_event_urls(driver, base_url, max_pages, harvest, journal)
+    if journal:
+        event_urls = journal_event_urls(journal, event_urls)
+    return frontier.filter(event_urls) if frontier else event_urls
 
-def close_event_tab_and_return_to_main(driver, main_window):
-    current_window = driver.current_window_handle
-    if current_window != main_window:
-        driver.close()
-        driver.switch_to.window(main_window)
+def record_scrape(url, success, journal=None):
+    # The frontier marks the event once the writer commits its row
+    if journal:
+        journal.record(url, success, None if success else 'scrape failed')
 
 def expand_directions_section(driver):
     try:
         expand_button = driver.find_element("xpath", '//button[@class="eds-btn eds-btn--link"]')
         driver.execute_script("arguments[0].click();", expand_button)
-        time.sleep(1)
-    except:
+        wait_for(driver, lambda d: d.find_elements(*DIRECTIONS_READY), timeout=3)
+    except NoSuchElementException:
         pass
 
-def extract_basic_event_details(driver):
+def extract_basic_event_details(driver, fields=None):
     event_data = {}
     
-    try:
-        event_data['title'] = driver.find_element("xpath", '//h1[@class="event-title css-0"]').text
-    except:
-        event_data['title'] = None
+    for field, (xpath, attribute) in DOM_FIELDS.items():
+        if fields is not None and field not in fields:
+            continue
+        try:
+            element = driver.find_element("xpath", xpath)
+            event_data[field] = element.get_attribute(attribute) if attribute else element.text
+        except NoSuchElementException:
+            event_data[field] = None
 
-    try:
-        event_data['start_date'] = driver.find_element("xpath", '//time[@class="start-date"]').text
-    except:
-        event_data['start_date'] = None
+    if fields is None or 'directions_url' in fields:
+        try:
+            directions_url = driver.find_element("xpath", '//a[@aria-label="Driving directions"]').get_attribute('href')
+            lat, lng = extract_coordinates_from_google_url(directions_url)
+            event_data['directions_url'] = directions_url
+            event_data['latitude'] = lat
+            event_data['longitude'] = lng
+        except NoSuchElementException:
+            event_data['directions_url'] = None
+            event_data['latitude'] = None
+            event_data['longitude'] = None
 
-    try:
-        event_data['date_time'] = driver.find_element("xpath", '//span[@class="date-info__full-datetime"]').text
-    except:
-        event_data['date_time'] = None
+    if fields is None or 'page_url' in fields:
+        event_data['page_url'] = driver.current_url
+    
+    return event_data
 
-    try:
-        event_data['summary'] = driver.find_element("xpath", '//p[@class="summary"]').text
-    except:
-        event_data['summary'] = None
+def extract_server_data(page_source):
+    marker = page_source.find(SERVER_DATA_MARKER)
+    if marker == -1:
+        return None
+    start = page_source.find('{', marker)
+    if start == -1:
+        return None
+    # raw_decode scans exactly one JSON value, so nested objects and "};"
+    # inside strings do not cut the payload short
+    server_data, _ = JSON_DECODER.raw_decode(page_source, start)
+    return server_data
 
+def read_server_data(driver):
     try:
-        event_data['address'] = driver.find_element("xpath", '//div[@class="location-info__address"]').text
-    except:
-        event_data['address'] = None
+        payload = driver.execute_script(SERVER_DATA_SCRIPT)
+        if payload is None:
+            # Not exposed as a global on this page; parse it from the markup
+            return extract_server_data(driver.page_source)
+        return json.loads(payload)
+    except ValueError:
+        return None
 
-    try:
-        event_data['image'] = driver.find_element("xpath", '//img[@data-testid="hero-img"]').get_attribute('src')
-    except:
-        event_data['image'] = None
+def dig(data, path):
+    for key in path:
+        try:
+            data = data[key]
+        except (KeyError, IndexError, TypeError):
+            return None
+    return data
+
+def first_server_value(server_data, field):
+    for path in SERVER_DATA_FIELDS[field]:
+        value = dig(server_data, path)
+        if value not in (None, ''):
+            return value
+    return None
 
+def server_datetime_to_iso(value):
+    if not value:
+        return None
     try:
-        directions_url = driver.find_element("xpath", '//a[@aria-label="Driving directions"]').get_attribute('href')
-        lat, lng = extract_coordinates_from_google_url(directions_url)
-        event_data['directions_url'] = directions_url
-        event_data['latitude'] = lat
-        event_data['longitude'] = lng
-    except:
-        event_data['directions_url'] = None
-        event_data['latitude'] = None
-        event_data['longitude'] = None
+        if isinstance(value, dict):
+            if value.get('local') and value.get('timezone'):
+                return arrow.get(value['local'], tzinfo=value['timezone']).isoformat()
+            if value.get('utc'):
+                return arrow.get(value['utc']).isoformat()
+            return None
+        return arrow.get(value).isoformat()
+    except (ValueError, TypeError):
+        return None
+
+def parse_ticket_classes(ticket_classes):
+    total_capacity = 0
+    tickets_sold = 0
+    ticket_status = []
+    
+    for ticket in ticket_classes:
+        capacity = ticket.get('capacity') or 0
+        remaining = ticket.get('quantityRemaining') or 0
+        status = ticket.get('onSaleStatusEnum', '')
+        
+        total_capacity += capacity
+        tickets_sold += (capacity - remaining)
+        ticket_status.append(status)
+    
+    return {
+        'total_capacity': total_capacity,
+        'tickets_sold': tickets_sold,
+        'tickets_remaining': total_capacity - tickets_sold,
+        'ticket_statuses': ticket_status
+    }
+
+def event_details_from_server_data(server_data):
+    event_data = {
+        field: first_server_value(server_data, field)
+        for field in ('title', 'summary', 'address', 'latitude', 'longitude', 'image', 'page_url')
+    }
+    event_data['start_datetime'] = server_datetime_to_iso(first_server_value(server_data, 'start'))
+    event_data['end_datetime'] = server_datetime_to_iso(first_server_value(server_data, 'end'))
+    
+    ticket_classes = first_server_value(server_data, 'ticket_classes')
+    ticket_data = None
+    if ticket_classes:
+        with metrics.stage('tickets'):
+            ticket_data = parse_ticket_classes(ticket_classes)
+    
+    return event_data, ticket_data
 
+def extract_event_from_page_source(page_source):
     try:
-        event_data['page_url'] = driver.current_url
-    except:
-        event_data['page_url'] = None
+        server_data = extract_server_data(page_source)
+    except ValueError:
+        server_data = None
     
-    return event_data
+    if not server_data:
+        return {}, None
+    return event_details_from_server_data(server_data)
+
+def extract_event_from_driver(driver):
+    server_data = read_server_data(driver)
+    if not server_data:
+        return {}, None
+    return event_details_from_server_data(server_data)
+
+def extract_event_details(driver):
+    # One round trip for everything __SERVER_DATA__ carries; WebDriver
+    # lookups only run for the fields it did not provide
+    event_data, ticket_data = extract_event_from_driver(driver)
+    
+    missing = [field for field in DOM_FIELDS if not event_data.get(field)]
+    if event_data.get('start_datetime'):
+        # The display strings are rebuilt from the ISO timestamps on save
+        missing = [field for field in missing if field not in ('start_date', 'date_time')]
+    if not event_data.get('latitude') or not event_data.get('longitude'):
+        expand_directions_section(driver)
+        missing.append('directions_url')
+    if not event_data.get('page_url'):
+        missing.append('page_url')
+    
+    if missing:
+        fallback = extract_basic_event_details(driver, missing)
+        for field, value in fallback.items():
+            if value and not event_data.get(field):
+                event_data[field] = value
+    
+    return event_data, ticket_data
 
 def extract_ticket_data(driver):
-    try:
-        script_content = driver.page_source
-        
-        start = script_content.find('window.__SERVER_DATA__ = ') + len('window.__SERVER_DATA__ = ')
-        end = script_content.find('};', start) + 1
-        
-        if start > len('window.__SERVER_DATA__ = ') - 1:
-            server_data_str = script_content[start:end]
-            server_data = json.loads(server_data_str)
-            
-            ticket_classes = server_data['event_listing_response']['tickets']['ticketClasses']
-            
-            total_capacity = 0
-            tickets_sold = 0
-            ticket_status = []
-            
-            for ticket in ticket_classes:
-                capacity = ticket.get('capacity', 0)
-                remaining = ticket.get('quantityRemaining', 0)
-                status = ticket.get('onSaleStatusEnum', '')
-                
-                total_capacity += capacity
-                tickets_sold += (capacity - remaining)
-                ticket_status.append(status)
-            
-            return {
-                'total_capacity': total_capacity,
-                'tickets_sold': tickets_sold,
-                'tickets_remaining': total_capacity - tickets_sold,
-                'ticket_statuses': ticket_status
-            }
-    except Exception as e:
-        return None
+    _, ticket_data = extract_event_from_driver(driver)
+    return ticket_data
 
-def scrape_single_event(driver, event, main_window):
+def scrape_event_url(driver, url, writer):
     try:
-        navigate_to_event_page(driver, event)
-        time.sleep(random.uniform(2, 4))
+        if not scheduler.get(driver, url, event_page_ready):
+            # A challenge page or one that never rendered; retried later
+            print(f"{url} did not load")
+            return False
         
-        expand_directions_section(driver)
+        with metrics.stage('extraction'):
+            event_data, ticket_data = extract_event_details(driver)
+        if not event_data.get('title'):
+            # A challenge or error page; saving it would only write empty fields
+            metrics.fail('extraction')
+            print(f"No event data on {url}")
+            return False
         
-        event_data = extract_basic_event_details(driver)
-        ticket_data = extract_ticket_data(driver)
+        record = eventbrite_record(event_data, ticket_data)
+        if not record.event_start_time:
+            # Would never match a time window search, dedup or refresh
+            metrics.fail('extraction')
+            print(f"No parseable start time on {url}")
+            return False
         
-        success = save_eventbrite_event(event_data, ticket_data)
+        metrics.count('extracted')
+        writer.add(record)
+        print(f"✓ Scraped and queued: {event_data.get('title')}")
         
-        if success:
-            print(f"✓ Scraped and saved: {event_data.get('title', 'Unknown Event')}")
-        else:
-            print(f"✗ Failed to save: {event_data.get('title', 'Unknown Event')}")
-        
-        return success
+        return True
         
+    except CircuitOpenError:
+        raise
     except Exception as e:
-        print(f"Error scraping event: {e}")
+        print(f"Error scraping event {url}: {e}")
         return False
-    finally:
-        close_event_tab_and_return_to_main(driver, main_window)
-        time.sleep(random.uniform(1, 2))
 
-def scrape_all_pages(driver, base_url, max_pages=5):
-    total_scraped = 0
-    total_saved = 0
+def listing_driver_options(driver_options, harvest):
+    options = dict(driver_options or {})
+    if harvest:
+        options['performance_log'] = True
+    return options
+
+def scrape_listing_only(base_url, writer, max_pages=5, frontier=None, driver_options=None):
+    # Saves the fields the search results already carry without opening any
+    # event page; ticket counts are only available from the detail page
+    driver = create_driver(**listing_driver_options(driver_options, True))
+    total_queued = 0
     
-    for page_num in range(1, max_pages + 1):
-        print(f"\nSCRAPING PAGE {page_num}")
-        
-        website = f"{base_url}?page={page_num}"
-        events_with_text = get_events_from_listing_page(driver, website)
-        
-        if not events_with_text:
-            print(f"No events found on page {page_num}. Stopping.")
-            break
+    try:
+        for event_data in harvest_listing_records(driver, base_url, max_pages):
+            if frontier and frontier.should_skip(event_data['page_url']):
+                continue
+            record = eventbrite_record(event_data)
+            if not record.event_start_time:
+                print(f"No parseable start time for {event_data['page_url']}")
+                continue
+            writer.add(record)
+            total_queued += 1
+    finally:
+        driver.quit()
+        writer.flush()
         
-        main_window = driver.current_window_handle
+        print(f"\nSCRAPING COMPLETED")
+        print(f"Total listing events queued: {total_queued}")
+        if frontier:
+            print(f"Total events skipped as fresh: {frontier.skipped}")
+        print(f"Database writes: {writer.summary()}")
+
+def scrape_all_pages_parallel(base_url, writer, max_pages=5, workers=4, frontier=None, driver_options=None, harvest=False,
+                              journal=None):
+    def expand_listing(driver):
+        yield from iter_event_urls(driver, base_url, max_pages, harvest, frontier, journal)
+    
+    def scrape_url(driver, url, index):
+        success = scrape_event_url(driver, url, writer)
+        record_scrape(url, success, journal)
+        return success
+    
+    pool = DriverPool(
+        expand_listing=expand_listing,
+        scrape_url=scrape_url,
+        num_workers=workers,
+        create_driver=lambda: create_driver(**(driver_options or {})),
+        create_listing_driver=lambda: create_driver(**listing_driver_options(driver_options, harvest)),
+        retries=journal,
+    )
+    try:
+        pool.run()
+    finally:
+        writer.flush()
         
-        for i, event in enumerate(events_with_text, 1):
-            print(f"Scraping event {i}/{len(events_with_text)} on page {page_num}")
-            
-            success = scrape_single_event(driver, event, main_window)
-            total_scraped += 1
-            
-            if success:
-                total_saved += 1
-            
-            time.sleep(random.uniform(2, 4))
+        print(f"\nSCRAPING COMPLETED")
+        print(f"Total events scraped: {pool.stats.scraped}")
+        if frontier:
+            print(f"Total events skipped as fresh: {frontier.skipped}")
+        print(f"Database writes: {writer.summary()}")
+    
+    return pool.stats
+
+def scrape_all_pages(driver, base_url, writer, max_pages=5, frontier=None, journal=None):
+    total_scraped = 0
+    
+    # Each listing page's URLs are collected before any of them is yielded,
+    # so the listing page is left exactly once and every event is opened in
+    # the same tab with driver.get
+    for i, event_url in enumerate(iter_event_urls(driver, base_url, max_pages, frontier=frontier, journal=journal), 1):
+        print(f"Scraping event {i}: {event_url}")
         
-        print(f"Page {page_num} completed: {len(events_with_text)} events processed")
-        time.sleep(random.uniform(3, 6))
+        success = scrape_event_url(driver, event_url, writer)
+        total_scraped += 1
+        record_scrape(event_url, success, journal)
+    
+    if journal:
+        total_scraped += journal.retry_failed(lambda url: scrape_event_url(driver, url, writer))
+    
+    writer.flush()
     
     print(f"\nSCRAPING COMPLETED")
     print(f"Total events scraped: {total_scraped}")
-    print(f"Total events saved to database: {total_saved}")
+    if frontier:
+        print(f"Total events skipped as fresh: {frontier.skipped}")
+    print(f"Database writes: {writer.summary()}")
 
 def main():
-    base_url = 'https://www.eventbrite.com/d/ny--new-york--manhattan/events--today/'
-    max_pages = 3
+    parser = argparse.ArgumentParser(description='Scrape Eventbrite events into the events table')
+    parser.add_argument('--url', default='https://www.eventbrite.com/d/ny--new-york--manhattan/events--today/')
+    parser.add_argument('--max-pages', type=int, default=3)
+    parser.add_argument('--harvest', action='store_true',
+                        help='read listing events from __SERVER_DATA__ and search API responses instead of the DOM')
+    parser.add_argument('--listing-only', action='store_true',
+                        help='save the harvested listing fields without opening event pages')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='number of parallel scrape drivers; 0 scrapes serially with one driver')
+    add_scheduler_arguments(parser)
+    add_frontier_arguments(parser)
+    add_journal_arguments(parser)
+    add_spool_arguments(parser)
+    add_cache_arguments(parser)
+    add_driver_arguments(parser)
+    add_report_arguments(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+    metrics.source = 'eventbrite'
     
-    driver = setup_driver()
+    frontier = frontier_from_args(args, 'EVENTBRITE')
+    journal = journal_from_args(args, 'EVENTBRITE')
+    driver_options = driver_options_from_args(args)
+    writer = writer_from_args(args)
+    writer.on_flush.append(journal.rows_flushed)
+    if frontier:
+        writer.on_flush.append(frontier.rows_flushed)
+    invalidator = invalidator_from_args(args)
+    if invalidator:
+        writer.on_change.append(invalidator.rows_changed)
+    driver = None
     
     try:
-        scrape_all_pages(driver, base_url, max_pages)
+        if args.listing_only:
+            scrape_listing_only(args.url, writer, args.max_pages, frontier, driver_options)
+        elif args.workers > 0 or args.harvest:
+            # Harvesting needs its own performance-logging listing driver, so
+            # a serial harvest run is a pool with a single scrape worker
+            scrape_all_pages_parallel(args.url, writer, args.max_pages, max(args.workers, 1),
+                                      frontier, driver_options, args.harvest, journal)
+        else:
+            driver = create_driver(**driver_options)
+            scrape_all_pages(driver, args.url, writer, args.max_pages, frontier, journal)
         
     except KeyboardInterrupt:
         print("\nScraping interrupted by user")
+    except CircuitOpenError as e:
+        print(f"\nScraping stopped early: {e}")
     except Exception as e:
         print(f"Unexpected error: {e}")
     finally:
-        driver.quit()
+        writer.close()
+        journal.close()
+        print(f"Journal: {journal.summary()}")
+        if invalidator:
+            print(f"Cache: {invalidator.summary()}")
+        if driver:
+            driver.quit()
+        if frontier:
+            frontier.save()
+        scheduler.report()
+        finish_run(args)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,196 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+from cache_invalidation import EVENTS_TIMEZONE
+from geo_tiles import geo_tile
+from instrumentation import metrics
+import arrow
+import datetime
+import re
+
+# The one shape an event has between extraction and the database. Field
+# names are the events columns, so the upsert templates, the spool and the
+# writer callbacks all read the same attributes. Each source's extractor
+# output is normalized into it exactly once: timestamps parsed, coordinates
+# coerced, display strings and geo tile built.
+
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+MONTHS = ('January', 'February', 'March', 'April', 'May', 'June', 'July',
+          'August', 'September', 'October', 'November', 'December')
+MONTH_NUMBERS = {name[:3].lower(): number for number, name in enumerate(MONTHS, 1)}
+
+# Eventbrite's rendered date strings, e.g. "Saturday, June 1 · 7:30 - 10pm EDT"
+DISPLAY_DATE_PATTERN = re.compile(
+    r'\b(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+(\d{1,2})(?:,?\s+(\d{4}))?\b', re.I)
+DISPLAY_TIME_PATTERN = re.compile(r'(?<![\d:])(\d{1,2})(:\d{2})?\s*([ap])?\.?(?:m\b\.?)?(?!\d)', re.I)
+# A date without a year this long in the past is taken to be next year's
+PAST_DATE_GRACE = datetime.timedelta(days=30)
+
+@dataclass(slots=True)
+class EventRecord:
+    event_source: str
+    event_page_url: str = None
+    event_title: str = None
+    event_summary: str = None
+    event_address: str = None
+    event_image_url: str = None
+    directions_url: str = None
+    event_start_date: str = None
+    event_date_time: str = None
+    event_start_time: datetime.datetime = None
+    event_end_time: datetime.datetime = None
+    latitude: float = None
+    longitude: float = None
+    geo_tile: int = None
+    total_capacity: int = None
+    tickets_sold: int = None
+    tickets_remaining: int = None
+    content_hash: str = None
+
+@lru_cache(maxsize=4096)
+def parse_timestamp(value):
+    # Listing and detail pages repeat the same strings, so each is parsed
+    # once per process. ISO 8601 takes the fast path; anything else goes
+    # through arrow. Like arrow.get, a timestamp without an offset is UTC.
+    if not value:
+        return None
+    try:
+        if isinstance(value, str):
+            try:
+                parsed = datetime.datetime.fromisoformat(value)
+            except ValueError:
+                parsed = arrow.get(value).datetime
+        else:
+            parsed = arrow.get(value).datetime
+    except (ValueError, TypeError) as e:
+        # arrow's ParserError is a ValueError
+        metrics.count('unparsed_timestamp')
+        print(f"Could not parse timestamp {value!r}: {e}")
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed
+
+def parse_display_datetime(text, now=None, timezone=EVENTS_TIMEZONE):
+    # (start, end) from a rendered date string, for pages whose structured
+    # data had no timestamps. The first date and the times after it are
+    # used; a time without am/pm takes the next one's, and an end before the
+    # start is on the next day. (None, None) when no date and time are found.
+    date = DISPLAY_DATE_PATTERN.search(text or '')
+    if not date:
+        return None, None
+    times = [
+        [int(hour), int(minute[1:]) if minute else 0, meridiem.lower()]
+        for hour, minute, meridiem in DISPLAY_TIME_PATTERN.findall(text, date.end())
+        if minute or meridiem
+    ]
+    if not times:
+        return None, None
+    for current, following in zip(reversed(times[:-1]), reversed(times[1:])):
+        current[2] = current[2] or following[2]
+
+    zone = ZoneInfo(timezone)
+    now = now or datetime.datetime.now(zone)
+    month, day, year = MONTH_NUMBERS[date.group(1).lower()], int(date.group(2)), date.group(3)
+    try:
+        start_day = datetime.date(int(year) if year else now.year, month, day)
+        if not year and start_day < now.date() - PAST_DATE_GRACE:
+            start_day = start_day.replace(year=start_day.year + 1)
+        start, end = (
+            datetime.datetime.combine(start_day, datetime.time(clock_hour(hour, meridiem), minute), zone)
+            for hour, minute, meridiem in (times[0], times[-1])
+        )
+    except ValueError:
+        metrics.count('unparsed_timestamp')
+        return None, None
+    if len(times) == 1:
+        return start, None
+    if end <= start:
+        end += datetime.timedelta(days=1)
+    return start, end
+
+def clock_hour(hour, meridiem):
+    if meridiem == 'p' and hour < 12:
+        return hour + 12
+    if meridiem == 'a' and hour == 12:
+        return 0
+    return hour
+
+def coordinate(value):
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def format_day(dt):
+    # arrow's 'dddd, MMMM D'
+    return f"{WEEKDAYS[dt.weekday()]}, {MONTHS[dt.month - 1]} {dt.day}"
+
+def format_clock(dt):
+    # arrow's 'h:mm A'
+    return f"{dt.hour % 12 or 12}:{dt.minute:02d} {'PM' if dt.hour >= 12 else 'AM'}"
+
+def format_date_time_range(start_dt, end_dt):
+    if not start_dt:
+        return None
+    start_readable = f"{format_day(start_dt)}, {start_dt.year} at {format_clock(start_dt)}"
+    if end_dt:
+        return f"{start_readable} - {format_clock(end_dt)}"
+    return start_readable
+
+def located(record):
+    record.latitude = coordinate(record.latitude)
+    record.longitude = coordinate(record.longitude)
+    record.geo_tile = geo_tile(record.latitude, record.longitude)
+    return record
+
+def eventbrite_record(event_data, ticket_data=None):
+    start_dt = parse_timestamp(event_data.get('start_datetime'))
+    end_dt = parse_timestamp(event_data.get('end_datetime'))
+    if not start_dt:
+        # The DOM fallback only has the rendered strings
+        display = ' '.join(filter(None, (event_data.get('start_date'), event_data.get('date_time'))))
+        start_dt, end_dt = parse_display_datetime(display)
+        # A start without an end still has to match the time window queries
+        end_dt = end_dt or start_dt
+    ticket_data = ticket_data or {}
+
+    return located(EventRecord(
+        event_source='EVENTBRITE',
+        event_page_url=event_data.get('page_url'),
+        event_title=event_data.get('title'),
+        event_summary=event_data.get('summary'),
+        event_address=event_data.get('address'),
+        event_image_url=event_data.get('image'),
+        directions_url=event_data.get('directions_url'),
+        event_start_date=event_data.get('start_date') or (format_day(start_dt) if start_dt else None),
+        event_date_time=event_data.get('date_time') or format_date_time_range(start_dt, end_dt),
+        event_start_time=start_dt,
+        event_end_time=end_dt,
+        latitude=event_data.get('latitude'),
+        longitude=event_data.get('longitude'),
+        total_capacity=ticket_data.get('total_capacity'),
+        tickets_sold=ticket_data.get('tickets_sold'),
+        tickets_remaining=ticket_data.get('tickets_remaining'),
+    ))
+
+def meetup_record(meetup_data):
+    start_dt = parse_timestamp(meetup_data.get('start_datetime'))
+    end_dt = parse_timestamp(meetup_data.get('end_datetime'))
+
+    return located(EventRecord(
+        event_source='MEETUP',
+        event_page_url=meetup_data.get('event_url'),
+        event_title=meetup_data.get('title'),
+        event_summary=meetup_data.get('description'),
+        event_address=meetup_data.get('full_address') or meetup_data.get('venue_address'),
+        event_image_url=meetup_data.get('image_url'),
+        event_date_time=format_date_time_range(start_dt, end_dt),
+        event_start_time=start_dt,
+        event_end_time=end_dt,
+        latitude=meetup_data.get('latitude'),
+        longitude=meetup_data.get('longitude'),
+        tickets_sold=meetup_data.get('going_count'),
+    ))
@@ -0,0 +1,132 @@
+from urllib.parse import urlsplit, urlunsplit
+from database_utils import setup_database_connection
+import json
+import os
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'frontier.json')
+
+# An upsert whose content hash matched leaves time_updated alone but still
+# records a snapshot, so the last time an event was seen is the latest of
+# the two (or time_added for rows written before snapshots existed)
+KNOWN_URLS_QUERY = """
+SELECT events.event_page_url,
+       EXTRACT(EPOCH FROM GREATEST(events.time_updated, events.time_added, seen.last_seen)
+                          AT TIME ZONE current_setting('TimeZone'))
+FROM events
+LEFT JOIN (
+    SELECT event_id, max(captured_at) AS last_seen
+    FROM event_snapshots
+    WHERE captured_at >= LOCALTIMESTAMP - make_interval(secs => %(freshness)s)
+    GROUP BY event_id
+) seen ON seen.event_id = events.id
+WHERE events.event_source = %(source)s AND events.event_page_url IS NOT NULL
+  AND GREATEST(events.time_updated, events.time_added, seen.last_seen) IS NOT NULL
+"""
+
+def frontier_key(url):
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme, parts.netloc.lower(), parts.path.rstrip('/'), '', ''))
+
+def load_known_urls(source, freshness):
+    conn = setup_database_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(KNOWN_URLS_QUERY, {'source': source, 'freshness': freshness})
+            return {frontier_key(url): float(updated) for url, updated in cursor.fetchall()}
+    finally:
+        conn.close()
+
+class Frontier:
+    # Remembers when each event URL was last written so a run only visits
+    # events that are new or older than the freshness window. The database
+    # is the source of truth; the cache file keeps the check working offline.
+
+    def __init__(self, source, freshness_minutes=60, cache_path=DEFAULT_CACHE_PATH):
+        self.source = source
+        self.freshness = freshness_minutes * 60
+        self.cache_path = cache_path
+        self.known = {}
+        self.skipped = 0
+        self.lock = threading.Lock()
+
+    def load(self):
+        cached = self.read_cache()
+        try:
+            self.known = load_known_urls(self.source, self.freshness)
+            print(f"Frontier: {len(self.known)} known {self.source} events loaded from database")
+        except Exception as e:
+            print(f"Frontier: database unavailable ({e}), using cached frontier")
+            self.known = {}
+        # Keep the newer timestamp when the cache saw a write the database did not
+        for key, updated in cached.items():
+            if updated > self.known.get(key, 0):
+                self.known[key] = updated
+        return self
+
+    def read_cache(self):
+        try:
+            with open(self.cache_path, encoding='utf-8') as f:
+                return json.load(f).get(self.source, {})
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        try:
+            with open(self.cache_path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        with self.lock:
+            data[self.source] = dict(self.known)
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        tmp_path = self.cache_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.cache_path)
+
+    def is_fresh(self, url):
+        with self.lock:
+            updated = self.known.get(frontier_key(url))
+        return updated is not None and time.time() - updated < self.freshness
+
+    def record_skip(self):
+        with self.lock:
+            self.skipped += 1
+
+    def should_skip(self, url):
+        # True for a fresh URL, which is counted as skipped
+        if self.is_fresh(url):
+            self.record_skip()
+            return True
+        return False
+
+    def filter(self, urls):
+        for url in urls:
+            if not self.should_skip(url):
+                yield url
+
+    def mark(self, url):
+        if not url:
+            return
+        with self.lock:
+            self.known[frontier_key(url)] = time.time()
+
+    def rows_flushed(self, source, rows):
+        # EventWriter.on_flush callback: an event is only fresh once its row
+        # is committed, so a failed write leaves it due for the next run
+        if source != self.source:
+            return
+        for row in rows:
+            self.mark(row.event_page_url)
+
+def add_frontier_arguments(parser):
+    parser.add_argument('--freshness-minutes', type=float, default=60,
+                        help='skip events written to the database within this many minutes')
+    parser.add_argument('--full', action='store_true', help='visit every event regardless of freshness')
+
+def frontier_from_args(args, source):
+    if args.full:
+        return None
+    return Frontier(source, args.freshness_minutes).load()
@@ -0,0 +1,33 @@
+import math
+
+# Events are bucketed into a fixed TILE_SIZE degree grid, numbered row by row
+# from (-90, -180). A tile is about 1.1 km by 0.85 km in NYC, so a two mile
+# radius search covers roughly 60 tiles. The backend computes the same ids
+# (GeoTiles.java) and searches the tiles of a bounding box through the
+# (geo_tile, event_start_time, event_end_time) index.
+TILE_SIZE = 0.01
+LAT_TILES = 18000
+LNG_TILES = 36000
+# Larger searches skip the tile filter, as GeoTiles.tilesInBounds does
+MAX_SEARCH_TILES = 1000
+
+def tile_index(value, offset, count):
+    return min(max(math.floor((value + offset) / TILE_SIZE), 0), count - 1)
+
+def geo_tile(latitude, longitude):
+    if latitude is None or longitude is None:
+        return None
+    return tile_index(latitude, 90, LAT_TILES) * LNG_TILES + tile_index(longitude, 180, LNG_TILES)
+
+def tiles_in_bounds(north, south, east, west):
+    lat_range = range(tile_index(south, 90, LAT_TILES), tile_index(north, 90, LAT_TILES) + 1)
+    lng_range = range(tile_index(west, 180, LNG_TILES), tile_index(east, 180, LNG_TILES) + 1)
+    return [row * LNG_TILES + column for row in lat_range for column in lng_range]
+
+def tile_index_sql(column, offset, count):
+    # Same float8 arithmetic as tile_index, so SQL and Python agree at the edges
+    return (f"LEAST(GREATEST(floor(({column} + {offset}::float8) / {TILE_SIZE}::float8), 0), {count - 1})")
+
+# For backfills and generated test data
+GEO_TILE_SQL = (f"({tile_index_sql('latitude', 90, LAT_TILES)} * {LNG_TILES} + "
+                f"{tile_index_sql('longitude', 180, LNG_TILES)})::integer")
@@ -0,0 +1,161 @@
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+import json
+import math
+import os
+import threading
+import time
+
+DEFAULT_REPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'reports')
+
+# listing: listing page fetch/harvest, navigation: detail page load,
+# extraction: reading event fields, tickets: ticket class parsing,
+# db_write: one upsert batch, throttle: time spent waiting on the scheduler
+STAGES = ('listing', 'navigation', 'extraction', 'tickets', 'db_write', 'throttle')
+QUANTILES = (0.5, 0.95, 0.99)
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+class Metrics:
+    def __init__(self, source='scraper'):
+        self.source = source
+        self.timings = defaultdict(list)
+        self.failures = Counter()
+        self.counters = Counter()
+        self.started = time.time()
+        self.lock = threading.Lock()
+
+    def reset(self):
+        with self.lock:
+            self.timings = defaultdict(list)
+            self.failures = Counter()
+            self.counters = Counter()
+            self.started = time.time()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.fail(name)
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def observe(self, name, seconds):
+        with self.lock:
+            self.timings[name].append(seconds)
+
+    def fail(self, name, count=1):
+        with self.lock:
+            self.failures[name] += count
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] += value
+
+    def snapshot(self):
+        with self.lock:
+            timings = {name: sorted(values) for name, values in self.timings.items()}
+            failures = dict(self.failures)
+            counters = dict(self.counters)
+
+        stages = {}
+        for name in sorted(set(STAGES) | set(timings) | set(failures)):
+            values = timings.get(name, [])
+            stages[name] = {
+                'count': len(values),
+                'total_seconds': sum(values),
+                'p50': percentile(values, 0.5),
+                'p95': percentile(values, 0.95),
+                'p99': percentile(values, 0.99),
+                'max': values[-1] if values else None,
+                'failures': failures.get(name, 0),
+            }
+
+        return {
+            'source': self.source,
+            'started_at': self.started,
+            'duration_seconds': time.time() - self.started,
+            'stages': stages,
+            'counters': counters,
+        }
+
+    def prometheus_text(self, snapshot=None):
+        snapshot = snapshot or self.snapshot()
+        source = snapshot['source']
+        lines = [
+            '# HELP scraper_stage_duration_seconds Time spent in each scraper stage.',
+            '# TYPE scraper_stage_duration_seconds summary',
+        ]
+        for name, stage in snapshot['stages'].items():
+            labels = f'source="{source}",stage="{name}"'
+            for q in QUANTILES:
+                value = stage[f'p{int(q * 100)}']
+                lines.append(f'scraper_stage_duration_seconds{{{labels},quantile="{q}"}} '
+                             f'{"NaN" if value is None else repr(value)}')
+            lines.append(f'scraper_stage_duration_seconds_sum{{{labels}}} {stage["total_seconds"]!r}')
+            lines.append(f'scraper_stage_duration_seconds_count{{{labels}}} {stage["count"]}')
+
+        lines += [
+            '# HELP scraper_stage_failures_total Failures recorded per scraper stage.',
+            '# TYPE scraper_stage_failures_total counter',
+        ]
+        for name, stage in snapshot['stages'].items():
+            lines.append(f'scraper_stage_failures_total{{source="{source}",stage="{name}"}} {stage["failures"]}')
+
+        lines += [
+            '# HELP scraper_events_total Events counted per outcome.',
+            '# TYPE scraper_events_total counter',
+        ]
+        for name, value in sorted(snapshot['counters'].items()):
+            lines.append(f'scraper_events_total{{source="{source}",outcome="{name}"}} {value}')
+
+        lines += [
+            '# HELP scraper_run_duration_seconds Wall-clock duration of the scraper run.',
+            '# TYPE scraper_run_duration_seconds gauge',
+            f'scraper_run_duration_seconds{{source="{source}"}} {snapshot["duration_seconds"]!r}',
+        ]
+        return '\n'.join(lines) + '\n'
+
+    def write_report(self, report_dir=DEFAULT_REPORT_DIR):
+        snapshot = self.snapshot()
+        os.makedirs(report_dir, exist_ok=True)
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started))
+        base = os.path.join(report_dir, f"{self.source}-{stamp}")
+
+        with open(base + '.json', 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, indent=2)
+        with open(base + '.prom', 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text(snapshot))
+
+        return base + '.json', base + '.prom'
+
+    def print_summary(self):
+        snapshot = self.snapshot()
+        print(f"\nSTAGE TIMINGS ({snapshot['duration_seconds']:.1f}s run)")
+        for name, stage in snapshot['stages'].items():
+            if not stage['count'] and not stage['failures']:
+                continue
+            print(f"{name:>11}: n={stage['count']:<5} total={stage['total_seconds']:.1f}s "
+                  f"p50={format_seconds(stage['p50'])} p95={format_seconds(stage['p95'])} "
+                  f"p99={format_seconds(stage['p99'])} failures={stage['failures']}")
+
+def format_seconds(value):
+    return '-' if value is None else f"{value:.3f}s"
+
+def add_report_arguments(parser):
+    parser.add_argument('--report-dir', default=DEFAULT_REPORT_DIR,
+                        help='directory for the JSON and Prometheus run reports')
+
+def finish_run(args):
+    metrics.print_summary()
+    json_path, prom_path = metrics.write_report(args.report_dir)
+    print(f"Run report written to {json_path} and {prom_path}")
+
+metrics = Metrics()
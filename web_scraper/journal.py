@@ -0,0 +1,249 @@
+from frontier import frontier_key
+import argparse
+import json
+import os
+import threading
+import time
+
+DEFAULT_JOURNAL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'journal')
+
+# discovered: an event URL was queued from a listing
+# completed:  its row was committed to the database
+# failed:     a scrape attempt failed (attempt counts from 1)
+# dead:       max_attempts reached, the URL is no longer retried
+# listed:     every event URL on a listing page has been discovered
+
+class Journal:
+    # Append-only NDJSON log of a run. A --resume run replays it to skip
+    # listing pages and events that already finished, scrape what was
+    # discovered but never saved, and retry failures with exponential
+    # backoff until they are dead-lettered.
+
+    def __init__(self, source, journal_dir=DEFAULT_JOURNAL_DIR, max_attempts=4, base_delay=10, max_delay=600,
+                 retry_wait=60):
+        self.source = source
+        self.path = os.path.join(journal_dir, f"{source.lower()}.ndjson")
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_wait = retry_wait
+        self.discovered = {}
+        self.completed = set()
+        self.failures = {}
+        self.dead = set()
+        self.listed = set()
+        self.unsaved = set()
+        self.file = None
+        self.lock = threading.Lock()
+
+    def open(self, resume=False):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if resume:
+            self.replay()
+            print(f"Journal: resuming {self.source} with {len(self.completed)} completed, "
+                  f"{len(self.pending())} pending, {len(self.failures)} failing and {len(self.dead)} dead URLs")
+        elif os.path.exists(self.path):
+            os.replace(self.path, self.path.replace('.ndjson', '.prev.ndjson'))
+        self.file = open(self.path, 'a', encoding='utf-8')
+        return self
+
+    def replay(self):
+        try:
+            f = open(self.path, encoding='utf-8')
+        except OSError:
+            return
+        with f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A crash can leave the last line half written
+                    continue
+                self.apply(entry)
+
+    def apply(self, entry):
+        kind = entry.get('event')
+        if kind == 'listed':
+            self.listed.add(entry['listing'])
+            return
+        url = entry.get('url')
+        key = frontier_key(url) if url else None
+        if kind == 'discovered':
+            self.discovered.setdefault(key, url)
+        elif kind == 'completed':
+            self.completed.add(key)
+            self.failures.pop(key, None)
+        elif kind == 'failed':
+            self.failures[key] = (entry['attempt'], entry['t'])
+        elif kind == 'dead':
+            self.dead.add(key)
+            self.failures.pop(key, None)
+
+    def append(self, entry):
+        entry['t'] = time.time()
+        with self.lock:
+            self.apply(entry)
+            if self.file:
+                self.file.write(json.dumps(entry) + '\n')
+                self.file.flush()
+
+    def close(self):
+        # Called after the writer's final flush. Events still unsaved never
+        # reached rows_flushed (their write failed), so they stay discovered
+        # and a --resume run scrapes them again.
+        with self.lock:
+            unsaved = len(self.unsaved)
+            self.unsaved.clear()
+        if unsaved:
+            print(f"Journal: {unsaved} scraped events were not saved and are left for the next --resume run")
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def is_listed(self, listing_url):
+        with self.lock:
+            return listing_url in self.listed
+
+    def mark_listed(self, listing_url):
+        self.append({'event': 'listed', 'listing': listing_url})
+
+    def next_attempt_at(self, key):
+        attempts, failed_at = self.failures[key]
+        return failed_at + min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+
+    def claim(self, url):
+        # Records a newly discovered URL and says whether to scrape it now
+        key = frontier_key(url)
+        with self.lock:
+            if key in self.completed or key in self.dead:
+                return False
+            known = key in self.discovered
+            if key in self.failures and time.time() < self.next_attempt_at(key):
+                return False
+        if not known:
+            self.append({'event': 'discovered', 'url': url})
+        return True
+
+    def pending(self):
+        # Discovered in an earlier run but never saved, failed or dead-lettered
+        with self.lock:
+            return [
+                url for key, url in self.discovered.items()
+                if key not in self.completed and key not in self.dead and key not in self.failures
+            ]
+
+    def record(self, url, success, error=None):
+        key = frontier_key(url)
+        if success:
+            # Completed once the writer commits the row
+            with self.lock:
+                self.unsaved.add(url)
+            return
+
+        with self.lock:
+            attempt = self.failures.get(key, (0, 0))[0] + 1
+        self.append({'event': 'failed', 'url': url, 'attempt': attempt, 'error': error})
+        if attempt >= self.max_attempts:
+            print(f"Journal: giving up on {url} after {attempt} attempts")
+            self.append({'event': 'dead', 'url': url, 'attempts': attempt})
+
+    def rows_flushed(self, source, rows):
+        # EventWriter.on_flush callback
+        keys = {frontier_key(row.event_page_url) for row in rows if row.event_page_url}
+        with self.lock:
+            saved = [url for url in self.unsaved if frontier_key(url) in keys]
+            self.unsaved.difference_update(saved)
+        for url in saved:
+            self.append({'event': 'completed', 'url': url})
+
+    def retry_queue(self):
+        with self.lock:
+            # A retry that succeeded stays failed until its row is flushed
+            unsaved = {frontier_key(url) for url in self.unsaved}
+            return sorted(
+                (self.next_attempt_at(key), self.discovered.get(key, key))
+                for key in self.failures
+                if key not in self.completed and key not in self.dead and key not in unsaved
+            )
+
+    def retries_due(self):
+        # Whether a failure's next attempt is within retry_wait
+        queue = self.retry_queue()
+        return bool(queue) and queue[0][0] - time.time() <= self.retry_wait
+
+    def iter_retries(self):
+        # Yields failed URLs as their backoff expires. Failures whose next
+        # attempt is more than retry_wait away are left for the next --resume.
+        attempted = set()
+        while True:
+            queue = [(ready_at, url) for ready_at, url in self.retry_queue() if (url, ready_at) not in attempted]
+            if not queue:
+                return
+            ready_at, url = queue[0]
+            wait = ready_at - time.time()
+            if wait > self.retry_wait:
+                print(f"Journal: {len(queue)} failed URLs left for the next --resume run")
+                return
+            if wait > 0:
+                time.sleep(wait)
+            attempted.add((url, ready_at))
+            yield url
+
+    def retry_failed(self, scrape):
+        retried = 0
+        for url in self.iter_retries():
+            retried += 1
+            try:
+                success = scrape(url)
+            except Exception as e:
+                self.record(url, False, str(e))
+                continue
+            self.record(url, success, None if success else 'scrape failed')
+        return retried
+
+    def summary(self):
+        with self.lock:
+            return (f"{len(self.discovered)} discovered, {len(self.completed)} completed, "
+                    f"{len(self.failures)} awaiting retry, {len(self.dead)} dead")
+
+def journal_event_urls(journal, event_urls):
+    # Events the interrupted run discovered but never saved come first,
+    # then whatever the listing turns up that is not finished yet
+    seen = set()
+    for url in journal.pending():
+        seen.add(frontier_key(url))
+        yield url
+    for url in event_urls:
+        key = frontier_key(url)
+        if key in seen or not journal.claim(url):
+            continue
+        seen.add(key)
+        yield url
+
+def add_journal_arguments(parser):
+    parser.add_argument('--resume', action='store_true',
+                        help='continue the last run from its journal instead of starting over')
+    parser.add_argument('--max-attempts', type=int, default=4,
+                        help='failed scrapes of one URL before it is dead-lettered')
+    parser.add_argument('--retry-wait', type=float, default=60,
+                        help='longest backoff to wait for within a run before leaving retries to --resume')
+
+def journal_from_args(args, source):
+    return Journal(source, max_attempts=args.max_attempts, retry_wait=args.retry_wait).open(args.resume)
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect a scraper journal')
+    parser.add_argument('source', help='MEETUP or EVENTBRITE')
+    parser.add_argument('--dead', action='store_true', help='list dead-lettered URLs')
+    parser.add_argument('--journal-dir', default=DEFAULT_JOURNAL_DIR)
+    args = parser.parse_args()
+
+    journal = Journal(args.source, args.journal_dir)
+    journal.replay()
+    print(journal.summary())
+    if args.dead:
+        for key in sorted(journal.dead):
+            print(journal.discovered.get(key, key))
+
+if __name__ == "__main__":
+    main()
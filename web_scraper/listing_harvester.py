@@ -0,0 +1,117 @@
+from selenium.common.exceptions import WebDriverException
+from scheduler import wait_for
+import base64
+import json
+
+class NetworkRecorder:
+    # Reads JSON responses the page fetched (GraphQL / search API calls) out
+    # of the Chrome performance log. The driver must be created with
+    # create_driver(performance_log=True).
+    #
+    # A response is matched on Network.responseReceived, but its body can
+    # only be read once Network.loadingFinished arrives; until then it is
+    # tracked in loading, and dropped on Network.loadingFailed.
+
+    def __init__(self, driver, url_filter):
+        self.driver = driver
+        self.url_filter = url_filter
+        self.loading = set()
+        self.pending = []
+
+    def poll(self):
+        try:
+            entries = self.driver.get_log('performance')
+        except WebDriverException:
+            return False
+
+        found = False
+        for entry in entries:
+            message = json.loads(entry['message'])['message']
+            method = message.get('method')
+            params = message.get('params', {})
+            if method == 'Network.responseReceived':
+                response = params['response']
+                if 'json' in response.get('mimeType', '') and self.url_filter(response.get('url', '')):
+                    self.loading.add(params['requestId'])
+            elif method == 'Network.loadingFinished' and params.get('requestId') in self.loading:
+                self.loading.discard(params['requestId'])
+                self.pending.append(params['requestId'])
+                found = True
+            elif method == 'Network.loadingFailed':
+                self.loading.discard(params.get('requestId'))
+        return found
+
+    def wait_for_response(self, timeout):
+        return bool(self.pending) or bool(wait_for(self.driver, lambda d: self.poll(), timeout))
+
+    def wait_for_loading(self, timeout):
+        # Lets responses that started before the last scroll finish loading
+        self.poll()
+        if self.loading:
+            wait_for(self.driver, lambda d: self.poll() or not self.loading, timeout)
+
+    def drain(self):
+        self.poll()
+        request_ids, self.pending = self.pending, []
+        for request_id in request_ids:
+            payload = self.response_body(request_id)
+            if payload is not None:
+                yield payload
+
+    def response_body(self, request_id):
+        try:
+            body = self.driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+        except WebDriverException:
+            # The body is gone once the page navigates or Chrome evicts it
+            return None
+        text = body.get('body', '')
+        if body.get('base64Encoded'):
+            text = base64.b64decode(text).decode('utf-8', errors='replace')
+        try:
+            return json.loads(text)
+        except ValueError:
+            return None
+
+def find_records(payload, is_record):
+    # Iterative walk so deeply nested GraphQL payloads cannot hit the
+    # recursion limit
+    stack = [payload]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if is_record(node):
+                yield node
+                continue
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+
+def harvest_scrolling_listing(driver, recorder, extract_records, embedded_payload=None, idle_timeout=6,
+                              max_scrolls=50, pace=None):
+    # Yields records as soon as they arrive: first whatever the page
+    # rendered server side, then each response triggered by scrolling. Stops
+    # once a scroll produces no new responses within idle_timeout.
+    if embedded_payload is not None:
+        yield from extract_records(embedded_payload)
+
+    for _ in range(max_scrolls):
+        for payload in recorder.drain():
+            yield from extract_records(payload)
+
+        if pace:
+            pace()
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        if not recorder.wait_for_response(idle_timeout):
+            break
+
+    recorder.wait_for_loading(idle_timeout)
+    for payload in recorder.drain():
+        yield from extract_records(payload)
+
+def unique_records(records, key):
+    seen = set()
+    for record in records:
+        value = key(record)
+        if value and value not in seen:
+            seen.add(value)
+            yield record
@@ -0,0 +1,331 @@
+import argparse
+import gc
+import json
+import os
+import threading
+import time
+import psycopg2
+from urllib.parse import quote
+from database_utils import SchemaError
+from spool import add_spool_arguments, writer_from_args
+from driver_pool import DriverPool
+from sources import (SessionDriver, iter_query_event_urls, scrape_source_url, source_listing_driver_options,
+                     DAEMON_RECYCLE_PAGES, DAEMON_MAX_DRIVER_RSS_MB)
+from driver_factory import create_driver, add_driver_arguments, driver_options_from_args
+from scheduler import default_scheduler as scheduler, add_scheduler_arguments, configure_from_args, CircuitOpenError
+from frontier import frontier_key, add_frontier_arguments, frontier_from_args
+from journal import add_journal_arguments, journal_from_args
+from cache_invalidation import add_cache_arguments, invalidator_from_args
+from cache_warming import add_warming_arguments, warmer_from_args
+from dedup import add_dedup_arguments, dedup_active_events
+from instrumentation import metrics, add_report_arguments, finish_run
+from memory import memory_summary, peak_rss_mb
+
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scrape_config.json')
+
+SOURCES = ('meetup', 'eventbrite')
+# Both sites accept the same date range slugs
+DATE_RANGES = ('today', 'tomorrow', 'this-week', 'this-weekend', 'next-week')
+
+MEETUP_FIND_URL = 'https://www.meetup.com/find/?location={location}&source=EVENTS&dateRange={date_range}&eventType=inPerson'
+EVENTBRITE_FIND_URL = 'https://www.eventbrite.com/d/{location}/events--{date_range}/'
+
+def meetup_listing_url(location, date_range):
+    return MEETUP_FIND_URL.format(location=quote(location), date_range=date_range)
+
+def eventbrite_listing_url(location, date_range):
+    return EVENTBRITE_FIND_URL.format(location=location, date_range=date_range)
+
+LISTING_URL_BUILDERS = {
+    'meetup': meetup_listing_url,
+    'eventbrite': eventbrite_listing_url,
+}
+
+def load_config(path):
+    with open(path, encoding='utf-8') as f:
+        config = json.load(f)
+
+    for source in config.get('sources', []):
+        if source not in SOURCES:
+            raise ValueError(f"Unknown source {source!r}, expected one of {', '.join(SOURCES)}")
+    for date_range in config.get('date_ranges', []):
+        if date_range not in DATE_RANGES:
+            raise ValueError(f"Unknown date range {date_range!r}, expected one of {', '.join(DATE_RANGES)}")
+    return config
+
+def listing_queries(config, source, locations=None):
+    # Every location x date range the source has a slug for
+    queries = []
+    for location in config['locations']:
+        if locations and location['name'].lower() not in locations:
+            continue
+        slug = location.get(source)
+        if not slug:
+            continue
+        for date_range in config['date_ranges']:
+            label = f"{location['name']} / {date_range}"
+            queries.append((label, LISTING_URL_BUILDERS[source](slug, date_range)))
+    return queries
+
+class SeenUrls:
+    # Shared across every listing query and source so an event found by two
+    # overlapping searches (neighbouring boroughs, today and this-week) is
+    # scraped once per run
+
+    def __init__(self):
+        self.urls = set()
+        self.duplicates = 0
+        self.lock = threading.Lock()
+
+    def claim(self, url):
+        key = frontier_key(url)
+        with self.lock:
+            if key in self.urls:
+                self.duplicates += 1
+                return False
+            self.urls.add(key)
+            return True
+
+def build_source_pool(source, queries, writer, seen, frontier, workers, driver_options, engine='selenium',
+                      max_pages=3, harvest=False, journal=None, recycle_pages=None, max_driver_rss_mb=None):
+    def expand_listing(driver):
+        if journal:
+            # Left unsaved by the interrupted run
+            for event_url in journal.pending():
+                if seen.claim(event_url):
+                    yield event_url
+        
+        for label, url in queries:
+            print(f"\n[{source}] Listing {label}")
+            try:
+                for event_url in iter_query_event_urls(source, engine, driver, url, max_pages, harvest):
+                    if not seen.claim(event_url):
+                        continue
+                    if journal and not journal.claim(event_url):
+                        continue
+                    if frontier and frontier.should_skip(event_url):
+                        continue
+                    yield event_url
+            except CircuitOpenError:
+                # The source is paused for good; its other queries would fail too
+                raise
+            except Exception as e:
+                # One broken search should not end the rest of the source's queries
+                metrics.fail('listing')
+                print(f"[{source}] Listing {label} failed: {e}")
+
+    def scrape_url(driver, url, index):
+        success = scrape_source_url(source, engine, driver, url, index, writer)
+        if journal:
+            journal.record(url, success, None if success else 'scrape failed')
+        return success
+
+    if engine == 'http':
+        new_driver = new_listing_driver = SessionDriver
+    else:
+        new_driver = lambda: create_driver(**driver_options)
+        new_listing_driver = lambda: create_driver(**source_listing_driver_options(source, driver_options, harvest))
+
+    return DriverPool(
+        expand_listing=expand_listing,
+        scrape_url=scrape_url,
+        num_workers=workers,
+        create_driver=new_driver,
+        create_listing_driver=new_listing_driver,
+        recycle_pages=recycle_pages,
+        max_driver_rss_mb=max_driver_rss_mb,
+        retries=journal,
+    )
+
+def run_pools(pools):
+    # Each source drains its own queue in its own thread; the shared
+    # scheduler keeps every worker of a domain inside that domain's limit
+    threads = [
+        threading.Thread(target=pool.run, name=f'source-{source}', daemon=True)
+        for source, pool in pools.items()
+    ]
+    for thread in threads:
+        thread.start()
+
+    try:
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=0.5)
+    except KeyboardInterrupt:
+        print("\nStopping all sources...")
+        for pool in pools.values():
+            pool.stop.set()
+        scheduler.cancel()
+        for thread in threads:
+            thread.join()
+        raise
+
+def run_once(args, source_queries, driver_options, invalidator, warmer=None):
+    # One pass over every listing query of every source. Returns False when
+    # it was interrupted.
+    seen = SeenUrls()
+    frontiers = {}
+    journals = {}
+    pools = {}
+    writer = None
+    recycle_pages = args.recycle_pages or (DAEMON_RECYCLE_PAGES if args.daemon else None)
+    max_driver_rss_mb = args.max_driver_rss_mb or (DAEMON_MAX_DRIVER_RSS_MB if args.daemon else None)
+    completed = True
+
+    try:
+        writer = writer_from_args(args)
+        if invalidator:
+            writer.on_change.append(invalidator.rows_changed)
+        for source, queries in source_queries.items():
+            frontiers[source] = frontier_from_args(args, source.upper())
+            journals[source] = journal_from_args(args, source.upper())
+            writer.on_flush.append(journals[source].rows_flushed)
+            if frontiers[source]:
+                writer.on_flush.append(frontiers[source].rows_flushed)
+            engine = args.meetup_engine if source == 'meetup' else 'selenium'
+            pools[source] = build_source_pool(source, queries, writer, seen, frontiers[source], args.workers,
+                                              driver_options, engine, args.max_pages, args.harvest, journals[source],
+                                              recycle_pages, max_driver_rss_mb)
+            print(f"{source}: {len(queries)} listing queries, {args.workers} workers ({engine})")
+
+        run_pools(pools)
+    except KeyboardInterrupt:
+        print("\nScraping interrupted by user")
+        completed = False
+    finally:
+        if writer:
+            writer.close()
+        for journal in journals.values():
+            journal.close()
+        for frontier in frontiers.values():
+            if frontier:
+                frontier.save()
+
+    print("\nRUN COMPLETED")
+    for source, pool in pools.items():
+        skipped = frontiers[source].skipped if frontiers.get(source) else 0
+        print(f"{source}: {pool.stats.succeeded}/{pool.stats.scraped} events scraped, "
+              f"{pool.stats.discovered} discovered, {skipped} skipped as fresh")
+    print(f"Duplicate URLs across queries: {seen.duplicates}")
+    for source, journal in journals.items():
+        print(f"{source} journal: {journal.summary()}")
+    print(f"Database writes: {writer.summary()}")
+    if args.dedup and args.spool:
+        print("Dedup: skipped, spooled events are deduplicated by spool.py load --dedup")
+    elif args.dedup:
+        try:
+            changed = dedup_active_events()
+        except (psycopg2.Error, SchemaError) as e:
+            print(f"Dedup failed: {e}")
+            changed = []
+        if invalidator and changed:
+            invalidator.rows_changed('DEDUP', changed)
+    if invalidator:
+        print(f"Cache: {invalidator.summary()}")
+    # Last, so the warmed searches already see this run's writes and links
+    if warmer and args.spool:
+        print("Cache warming: skipped, spooled events are warmed by spool.py load --warm-cache")
+    elif warmer:
+        warmer.warm()
+        print(f"Cache warming: {warmer.summary()}")
+    peak_driver_mb = max((pool.stats.peak_driver_mb for pool in pools.values()), default=0)
+    recycled = sum(pool.stats.recycled for pool in pools.values())
+    print(f"Memory: {memory_summary(peak_driver_mb, recycled)}")
+    return completed
+
+def run_daemon(args, source_queries, driver_options, invalidator, warmer=None):
+    # Runs a pass every --interval-minutes (back to back when a pass takes
+    # longer). Everything a pass builds (pools, drivers, writer, journals,
+    # seen URLs) is dropped at its end and stage timings are reported and
+    # reset, so memory stays flat however long the process runs.
+    interval = args.interval_minutes * 60
+    passes = 0
+    while True:
+        passes += 1
+        started = time.monotonic()
+        print(f"\nPASS {passes} started {time.strftime('%Y-%m-%d %H:%M:%S')}")
+        try:
+            completed = run_once(args, source_queries, driver_options, invalidator, warmer)
+        except Exception as e:
+            # A database outage or similar fails this pass, not the daemon;
+            # run_once has closed what it opened and the next pass retries
+            print(f"Pass {passes} failed: {e}")
+            completed = True
+        scheduler.report()
+        finish_run(args)
+        metrics.reset()
+        gc.collect()
+        if not completed:
+            break
+        # A source that failed for the whole pass gets another chance
+        scheduler.reset_circuits()
+
+        wait = interval - (time.monotonic() - started)
+        if wait > 0:
+            print(f"Next pass in {wait / 60:.1f} minutes")
+            try:
+                time.sleep(wait)
+            except KeyboardInterrupt:
+                break
+    print(f"\nDaemon stopped after {passes} passes, peak RSS {peak_rss_mb():.0f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description='Scrape every configured location, source and date range')
+    parser.add_argument('--config', default=DEFAULT_CONFIG_PATH, help='JSON file of locations, sources and date ranges')
+    parser.add_argument('--sources', nargs='+', choices=SOURCES, help='override the sources in the config')
+    parser.add_argument('--locations', nargs='+', help='only scrape these location names from the config')
+    parser.add_argument('--date-ranges', nargs='+', choices=DATE_RANGES, help='override the date ranges in the config')
+    parser.add_argument('--workers', type=int, default=4, help='scrape workers per source')
+    parser.add_argument('--max-pages', type=int, default=3, help='Eventbrite listing pages per query')
+    parser.add_argument('--meetup-engine', choices=('selenium', 'http'), default='selenium')
+    parser.add_argument('--harvest', action='store_true',
+                        help='read listings from embedded JSON and API responses instead of the DOM')
+    parser.add_argument('--daemon', action='store_true', help='keep scraping in passes until interrupted')
+    parser.add_argument('--interval-minutes', type=float, default=30, help='time between the starts of daemon passes')
+    parser.add_argument('--recycle-pages', type=int,
+                        help=f'replace a scrape driver after this many pages (daemon default {DAEMON_RECYCLE_PAGES})')
+    parser.add_argument('--max-driver-rss-mb', type=float,
+                        help=f'replace a scrape driver whose browser processes pass this RSS '
+                             f'(daemon default {DAEMON_MAX_DRIVER_RSS_MB})')
+    add_scheduler_arguments(parser)
+    add_frontier_arguments(parser)
+    add_journal_arguments(parser)
+    add_spool_arguments(parser)
+    add_cache_arguments(parser)
+    add_dedup_arguments(parser)
+    add_warming_arguments(parser)
+    add_driver_arguments(parser)
+    add_report_arguments(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+    metrics.source = 'all'
+
+    config = load_config(args.config)
+    if args.sources:
+        config['sources'] = args.sources
+    if args.date_ranges:
+        config['date_ranges'] = args.date_ranges
+    locations = {name.lower() for name in args.locations} if args.locations else None
+
+    source_queries = {}
+    for source in config['sources']:
+        queries = listing_queries(config, source, locations)
+        if queries:
+            source_queries[source] = queries
+    if not source_queries:
+        print("Nothing to scrape for the selected locations and sources")
+        return
+
+    driver_options = driver_options_from_args(args)
+    invalidator = invalidator_from_args(args)
+    warmer = warmer_from_args(args, args.config)
+    if args.daemon:
+        run_daemon(args, source_queries, driver_options, invalidator, warmer)
+        return
+
+    run_once(args, source_queries, driver_options, invalidator, warmer)
+    scheduler.report()
+    finish_run(args)
+
+if __name__ == "__main__":
+    main()
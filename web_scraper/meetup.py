@@ -1,24 +1,64 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.common.action_chains import ActionChains
-from selenium.webdriver.common.keys import Keys
-import time
+from selenium.webdriver.common.by import By
 import json
+import re
 import arrow
-import random
-import platform
-from database_utils import save_meetup_event
+import argparse
+from urllib.parse import urljoin, urlsplit, urlunsplit
+from database_utils import EventWriter
+from spool import add_spool_arguments, writer_from_args
+from http_fetch import create_session
+from driver_pool import DriverPool
+from driver_factory import create_driver, add_driver_arguments, driver_options_from_args
+from scheduler import default_scheduler as scheduler, wait_for, add_scheduler_arguments, configure_from_args, CircuitOpenError
+from frontier import add_frontier_arguments, frontier_from_args
+from journal import add_journal_arguments, journal_from_args, journal_event_urls
+from cache_invalidation import add_cache_arguments, invalidator_from_args
+from instrumentation import metrics, add_report_arguments, finish_run
+from listing_harvester import NetworkRecorder, find_records, harvest_scrolling_listing, unique_records
+
+NEXT_DATA_PATTERN = re.compile(
+    r'<script[^>]*\bid=["\']__NEXT_DATA__["\'][^>]*>(.*?)</script>',
+    re.DOTALL | re.IGNORECASE
+)
+EVENT_HREF_PATTERN = re.compile(r'href=["\']([^"\']*/events/\d+/?[^"\']*)["\']')
+EVENT_PATH_PATTERN = re.compile(r'/events/\d+/?$')
+GRAPHQL_URL_PATTERN = re.compile(r'meetup\.com/gql')
+
+EVENT_ELEMENTS_XPATH = '//div[@class="absolute inset-0"]'
+# Counted and read inside the page, so scrolling a long listing leaves no
+# WebElement references behind in Python or in the driver
+COUNT_XPATH_SCRIPT = (
+    "return document.evaluate(arguments[0], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null)"
+    ".snapshotLength"
+)
+EVENT_HREFS_SCRIPT = "return Array.from(document.querySelectorAll('a[href*=\"/events/\"]'), a => a.href)"
+LISTING_READY = (By.XPATH, '//a[contains(@href, "/events/")]')
+EVENT_PAGE_READY = (By.ID, '__NEXT_DATA__')
 
 def extract_meetup_json_data(driver):
     script_element = driver.find_element("xpath", '//script[@id="__NEXT_DATA__"]')
     json_content = script_element.get_attribute('innerHTML')
-    data = json.loads(json_content)
+    return parse_meetup_next_data(json.loads(json_content))
+
+def extract_meetup_json_data_from_html(html):
+    match = NEXT_DATA_PATTERN.search(html)
+    if not match:
+        return None
+    return parse_meetup_next_data(json.loads(match.group(1)))
+
+def parse_meetup_next_data(data):
     event_data = data.get('props', {}).get('pageProps', {}).get('event', {})
     
     if not event_data:
         return None
-        
+    
+    return parse_meetup_event(event_data)
+
+def parse_meetup_event(event_data):
+    # Shared by the event page's __NEXT_DATA__ and the listing's GraphQL
+    # results, which use the same field names
+    going = event_data.get('goingCount') or event_data.get('going') or {}
+    
     extracted_data = {
         'title': event_data.get('title'),
         'description': event_data.get('description'),
@@ -26,7 +66,7 @@ def extract_meetup_json_data(driver):
         'start_datetime': event_data.get('dateTime'),
         'end_datetime': event_data.get('endTime'),
         'timezone': event_data.get('timezone'),
-        'going_count': event_data.get('goingCount', {}).get('totalCount', 0),
+        'going_count': going.get('totalCount', 0),
     }
     
     venue = event_data.get('venue', {})
@@ -42,7 +82,7 @@ def extract_meetup_json_data(driver):
     
     photo = event_data.get('featuredEventPhoto', {})
     if photo:
-        extracted_data['image_url'] = photo.get('source')
+        extracted_data['image_url'] = photo.get('source') or photo.get('highResUrl')
     
     if extracted_data.get('venue_address') and extracted_data.get('venue_city'):
         full_address = f"{extracted_data['venue_address']}, {extracted_data['venue_city']}"
@@ -52,6 +92,30 @@ def extract_meetup_json_data(driver):
     
     return extracted_data
 
+def normalize_event_url(url):
+    parts = urlsplit(url)
+    path = parts.path if parts.path.endswith('/') else parts.path + '/'
+    return urlunsplit((parts.scheme, parts.netloc, path, '', ''))
+
+def unique_event_urls(urls):
+    seen = set()
+    unique = []
+    for url in urls:
+        if not url:
+            continue
+        url = normalize_event_url(url)
+        if EVENT_PATH_PATTERN.search(urlsplit(url).path) and url not in seen:
+            seen.add(url)
+            unique.append(url)
+    return unique
+
+def get_event_urls_from_listing_html(html, listing_url):
+    return unique_event_urls(urljoin(listing_url, href) for href in EVENT_HREF_PATTERN.findall(html))
+
+def get_event_urls_from_listing_driver(driver, max_scrolls=5):
+    scroll_and_load_all_events(driver, max_scrolls=max_scrolls)
+    return unique_event_urls(driver.execute_script(EVENT_HREFS_SCRIPT) or [])
+
 def format_iso_datetime_to_readable(iso_datetime):
     if not iso_datetime:
         return None
@@ -64,10 +128,11 @@ def scroll_and_load_all_events(driver, max_scrolls=5):
     
     while scrolls < max_scrolls:
         driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(random.uniform(2, 4))
+        # Wait for the next batch of cards to render instead of a fixed pause
+        wait_for(driver, lambda d: d.execute_script("return document.body.scrollHeight") > last_height, timeout=4)
         
-        event_elements = driver.find_elements("xpath", '//div[@class="absolute inset-0"]')
-        print(f"Found {len(event_elements)} event elements after scroll {scrolls + 1}")
+        event_count = driver.execute_script(COUNT_XPATH_SCRIPT, EVENT_ELEMENTS_XPATH)
+        print(f"Found {event_count} event elements after scroll {scrolls + 1}")
         
         new_height = driver.execute_script("return document.body.scrollHeight")
         if new_height == last_height and scrolls > 2:
@@ -76,100 +141,334 @@ def scroll_and_load_all_events(driver, max_scrolls=5):
         last_height = new_height
         scrolls += 1
     
-    final_events = driver.find_elements("xpath", '//div[@class="absolute inset-0"]')
-    if len(final_events) == 0:
-        final_events = driver.find_elements("xpath", '//a[contains(@href, "/events/")]')
-    
-    return final_events
+    return driver.execute_script(COUNT_XPATH_SCRIPT, EVENT_ELEMENTS_XPATH)
 
-def open_event_in_new_tab(driver, event_element):
-    main_window = driver.current_window_handle
+def scrape_event_url(driver, event_url, event_index, writer):
+    try:
+        if not scheduler.get(driver, event_url, EVENT_PAGE_READY):
+            # A challenge page or one that never rendered; retried later
+            print(f"Event {event_index}: {event_url} did not load")
+            return False
+        
+        with metrics.stage('extraction'):
+            meetup_data = extract_meetup_json_data(driver)
+        
+        if not meetup_data:
+            metrics.fail('extraction')
+            print(f"Event {event_index}: No data extracted")
+            return False
+        
+        metrics.count('extracted')
+        writer.add_meetup_event(meetup_data)
+        print_event_summary(meetup_data, event_index)
+        return True
+        
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        # A missing __NEXT_DATA__ script, a timeout or malformed JSON on one
+        # page; the caller records the failure like any other
+        print(f"Event {event_index}: Error scraping {event_url}: {e}")
+        return False
+
+def scrape_single_event_http(session, event_url, event_index, writer):
+    try:
+        html = scheduler.fetch(session, event_url)
+        with metrics.stage('extraction'):
+            meetup_data = extract_meetup_json_data_from_html(html)
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        print(f"Event {event_index}: Failed to fetch {event_url}: {e}")
+        return False
+    
+    if not meetup_data:
+        metrics.fail('extraction')
+        print(f"Event {event_index}: No data extracted")
+        return False
     
-    modifier_key = Keys.COMMAND if platform.system() == "Darwin" else Keys.CONTROL
-    ActionChains(driver).key_down(modifier_key).click(event_element).key_up(modifier_key).perform()
-    time.sleep(2)
+    metrics.count('extracted')
     
-    all_windows = driver.window_handles
-    if len(all_windows) > 1:
-        for window in all_windows:
-            if window != main_window:
-                driver.switch_to.window(window)
-                break
+    if not meetup_data.get('event_url'):
+        meetup_data['event_url'] = event_url
     
-    return main_window
+    writer.add_meetup_event(meetup_data)
+    print_event_summary(meetup_data, event_index)
+    return True
 
-def close_tab_and_return_to_main(driver, main_window):
-    current_window = driver.current_window_handle
-    if current_window != main_window:
-        driver.close()
-        driver.switch_to.window(main_window)
-        time.sleep(1)
+def print_event_summary(meetup_data, event_index):
+    print(f"\nEVENT {event_index}:")
+    print(f"Title: {meetup_data.get('title')}")
+    print(f"Time: {format_iso_datetime_to_readable(meetup_data.get('start_datetime'))} - {format_iso_datetime_to_readable(meetup_data.get('end_datetime'))}")
+    print(f"Raw Start: {meetup_data.get('start_datetime')}")
+    print(f"Raw End: {meetup_data.get('end_datetime')}")
+    print(f"Address: {meetup_data.get('full_address')}")
+    print(f"Venue: {meetup_data.get('venue_name')}")
+    print(f"Going: {meetup_data.get('going_count')}")
+    print(f"Coordinates: {meetup_data.get('latitude')}, {meetup_data.get('longitude')}")
+    print(f"URL: {meetup_data.get('event_url')}")
+    print(f"✓ Queued for database")
 
-def scrape_single_event(driver, event_element, event_index, main_window):
-    open_event_in_new_tab(driver, event_element)
-    time.sleep(random.uniform(2, 4))
-    
-    meetup_data = extract_meetup_json_data(driver)
+def run_selenium_engine(website, frontier=None, driver_options=None, harvest=False, writer=None, journal=None):
+    driver = create_driver(**(driver_options or {}))
+    writer = writer or EventWriter()
+    successful_scrapes = 0
+    event_urls = []
     
-    if meetup_data:
-        db_success = save_meetup_event(meetup_data)
+    try:
+        if harvest:
+            # A separate driver records the performance log so the detail
+            # driver does not buffer network events for the whole run
+            listing_driver = create_driver(**listing_driver_options(driver_options, True))
+            try:
+                event_urls = list(iter_listing_event_urls(listing_driver, website, harvest=True))
+            finally:
+                listing_driver.quit()
+        else:
+            event_urls = list(iter_listing_event_urls(driver, website))
+        event_urls = filter_event_urls(event_urls, frontier, journal)
         
-        print(f"\nEVENT {event_index}:")
-        print(f"Title: {meetup_data.get('title')}")
-        print(f"Time: {format_iso_datetime_to_readable(meetup_data.get('start_datetime'))} - {format_iso_datetime_to_readable(meetup_data.get('end_datetime'))}")
-        print(f"Raw Start: {meetup_data.get('start_datetime')}")
-        print(f"Raw End: {meetup_data.get('end_datetime')}")
-        print(f"Address: {meetup_data.get('full_address')}")
-        print(f"Venue: {meetup_data.get('venue_name')}")
-        print(f"Going: {meetup_data.get('going_count')}")
-        print(f"Coordinates: {meetup_data.get('latitude')}, {meetup_data.get('longitude')}")
-        print(f"URL: {meetup_data.get('event_url')}")
+        if not event_urls:
+            print("No events found")
+            return
         
-        if db_success:
-            print(f"✓ Saved to database")
-        else:
-            print(f"✗ Database save failed")
-            
-        success = True
-    else:
-        print(f"Event {event_index}: No data extracted")
-        success = False
+        print(f"\nScraping {len(event_urls)} events")
+        
+        for i, event_url in enumerate(event_urls, 1):
+            success = scrape_event_url(driver, event_url, i, writer)
+            record_scrape(event_url, success, journal)
+            if success:
+                successful_scrapes += 1
+        
+        if journal:
+            journal.retry_failed(lambda url: scrape_event_url(driver, url, 0, writer))
+    finally:
+        writer.close()
+        driver.quit()
     
-    close_tab_and_return_to_main(driver, main_window)
-    time.sleep(random.uniform(1, 2))
+    print(f"\nCompleted: {successful_scrapes}/{len(event_urls)} events scraped successfully")
+    print(f"Database writes: {writer.summary()}")
+
+def is_meetup_event_record(node):
+    return isinstance(node.get('eventUrl'), str) and bool(node.get('title'))
+
+def meetup_records_from_payload(payload):
+    for node in find_records(payload, is_meetup_event_record):
+        yield parse_meetup_event(node)
+
+def harvest_listing_records(driver, website, idle_timeout=6, max_scrolls=50):
+    # Reads events from the listing's own __NEXT_DATA__ and the GraphQL
+    # responses fired while scrolling, instead of scraping rendered cards.
+    # Needs a driver created with performance_log=True.
+    recorder = NetworkRecorder(driver, lambda url: GRAPHQL_URL_PATTERN.search(url))
+    if not scheduler.get(driver, website, LISTING_READY, stage='listing'):
+        print(f"Listing {website} did not load")
+        return []
     
-    return success
+    next_data = driver.execute_script(
+        "var s = document.getElementById('__NEXT_DATA__'); return s ? s.textContent : null;"
+    )
+    records = harvest_scrolling_listing(
+        driver,
+        recorder,
+        meetup_records_from_payload,
+        embedded_payload=json.loads(next_data) if next_data else None,
+        idle_timeout=idle_timeout,
+        max_scrolls=max_scrolls,
+        pace=lambda: scheduler.acquire(website),
+    )
+    return unique_records(records, lambda record: normalize_event_url(record['event_url']))
 
-def main():
-    website = 'https://www.meetup.com/find/?location=us--ny--Manhattan&source=EVENTS&dateRange=today&eventType=inPerson'
+def iter_listing_event_urls(driver, website, max_scrolls=5, harvest=False):
+    if harvest:
+        for record in harvest_listing_records(driver, website):
+            yield normalize_event_url(record['event_url'])
+        return
+    
+    if not scheduler.get(driver, website, LISTING_READY, stage='listing'):
+        print(f"Listing {website} did not load")
+        return
+    yield from get_event_urls_from_listing_driver(driver, max_scrolls=max_scrolls)
+
+def listing_driver_options(driver_options, harvest):
+    options = dict(driver_options or {})
+    if harvest:
+        options['performance_log'] = True
+    return options
+
+def run_listing_only_engine(website, frontier=None, driver_options=None, writer=None):
+    # Saves the fields the listing responses already carry without opening
+    # any event page
+    driver = create_driver(**listing_driver_options(driver_options, True))
+    writer = writer or EventWriter()
+    saved = 0
     
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service)
+    try:
+        for i, record in enumerate(harvest_listing_records(driver, website), 1):
+            event_url = normalize_event_url(record['event_url'])
+            if frontier and frontier.should_skip(event_url):
+                continue
+            writer.add_meetup_event(record)
+            print_event_summary(record, i)
+            saved += 1
+    finally:
+        writer.close()
+        driver.quit()
     
-    driver.get(website)
-    time.sleep(3)
+    print(f"\nCompleted: {saved} listing events queued")
+    print(f"Database writes: {writer.summary()}")
+
+def run_pool_engine(website, workers, frontier=None, driver_options=None, harvest=False, writer=None, journal=None):
+    writer = writer or EventWriter()
     
-    event_elements = scroll_and_load_all_events(driver, max_scrolls=5)
+    def expand_listing(driver):
+        event_urls = iter_listing_event_urls(driver, website, harvest=harvest)
+        if journal:
+            event_urls = journal_event_urls(journal, event_urls)
+        yield from frontier.filter(event_urls) if frontier else event_urls
     
-    if not event_elements:
-        print("No events found")
-        return
+    def scrape_url(driver, url, index):
+        success = scrape_event_url(driver, url, index, writer)
+        record_scrape(url, success, journal)
+        return success
+    
+    pool = DriverPool(
+        expand_listing=expand_listing,
+        scrape_url=scrape_url,
+        num_workers=workers,
+        create_driver=lambda: create_driver(**(driver_options or {})),
+        create_listing_driver=lambda: create_driver(**listing_driver_options(driver_options, harvest)),
+        retries=journal,
+    )
+    
+    try:
+        pool.run()
+    except KeyboardInterrupt:
+        print("\nScraping interrupted by user")
+    finally:
+        writer.close()
     
-    main_window = driver.current_window_handle
-    print(f"\nScraping {len(event_elements)} events")
+    print(f"\nCompleted: {pool.stats.succeeded}/{pool.stats.scraped} events scraped successfully")
+    print(f"Database writes: {writer.summary()}")
+
+def filter_event_urls(event_urls, frontier=None, journal=None):
+    if journal:
+        event_urls = journal_event_urls(journal, event_urls)
+    if frontier:
+        event_urls = list(frontier.filter(event_urls))
+        print(f"Skipping {frontier.skipped} events that are still fresh")
+    return list(event_urls)
+
+def record_scrape(url, success, journal=None):
+    # The frontier marks the event once the writer commits its row
+    if journal:
+        journal.record(url, success, None if success else 'scrape failed')
+
+def collect_event_urls(session, website, listing):
+    if listing == 'http':
+        event_urls = get_event_urls_from_listing_html(scheduler.fetch(session, website, stage='listing'), website)
+        if event_urls:
+            return event_urls
+        print("No event links in listing HTML, falling back to browser listing")
     
+    driver = create_driver()
+    try:
+        if not scheduler.get(driver, website, LISTING_READY, stage='listing'):
+            print(f"Listing {website} did not load")
+            return []
+        return get_event_urls_from_listing_driver(driver, max_scrolls=5)
+    finally:
+        driver.quit()
+
+def run_http_engine(website, listing='http', event_urls=None, frontier=None, writer=None, journal=None):
+    session = create_session()
     successful_scrapes = 0
+    writer = writer or EventWriter()
+    
+    try:
+        if event_urls is None:
+            event_urls = collect_event_urls(session, website, listing)
+        
+        event_urls = filter_event_urls(event_urls, frontier, journal)
+        
+        if not event_urls:
+            print("No events found")
+            return
+        
+        print(f"\nScraping {len(event_urls)} events over HTTP")
+        
+        for i, event_url in enumerate(event_urls, 1):
+            success = scrape_single_event_http(session, event_url, i, writer)
+            record_scrape(event_url, success, journal)
+            if success:
+                successful_scrapes += 1
+        
+        if journal:
+            journal.retry_failed(lambda url: scrape_single_event_http(session, url, 0, writer))
+    finally:
+        writer.close()
+        session.close()
     
-    for i, event_element in enumerate(event_elements, 1):
-        success = scrape_single_event(driver, event_element, i, main_window)
-        if success:
-            successful_scrapes += 1
-        time.sleep(random.uniform(2, 4))
+    print(f"\nCompleted: {successful_scrapes}/{len(event_urls)} events scraped successfully")
+    print(f"Database writes: {writer.summary()}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Scrape Meetup events into the events table')
+    parser.add_argument('--url', default='https://www.meetup.com/find/?location=us--ny--Manhattan&source=EVENTS&dateRange=today&eventType=inPerson')
+    parser.add_argument('--engine', choices=('selenium', 'http'), default='selenium',
+                        help='fetch event pages in a browser tab or over plain HTTP')
+    parser.add_argument('--listing', choices=('http', 'selenium'), default='http',
+                        help='how the http engine collects event URLs from the listing page')
+    parser.add_argument('--harvest', action='store_true',
+                        help='read listing events from the page\'s JSON responses instead of scrolling the DOM')
+    parser.add_argument('--listing-only', action='store_true',
+                        help='save the harvested listing fields without opening event pages')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='number of parallel drivers for the selenium engine; 0 uses a single driver')
+    add_scheduler_arguments(parser)
+    add_frontier_arguments(parser)
+    add_journal_arguments(parser)
+    add_spool_arguments(parser)
+    add_cache_arguments(parser)
+    add_driver_arguments(parser)
+    add_report_arguments(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+    metrics.source = 'meetup'
+    
+    frontier = frontier_from_args(args, 'MEETUP')
+    journal = journal_from_args(args, 'MEETUP')
+    driver_options = driver_options_from_args(args)
+    writer = writer_from_args(args)
+    writer.on_flush.append(journal.rows_flushed)
+    if frontier:
+        writer.on_flush.append(frontier.rows_flushed)
+    invalidator = invalidator_from_args(args)
+    if invalidator:
+        writer.on_change.append(invalidator.rows_changed)
     
-    print(f"\nCompleted: {successful_scrapes}/{len(event_elements)} events scraped successfully")
+    try:
+        if args.listing_only:
+            run_listing_only_engine(args.url, frontier, driver_options, writer)
+        elif args.engine == 'http':
+            run_http_engine(args.url, args.listing, frontier=frontier, writer=writer, journal=journal)
+        elif args.workers > 0:
+            run_pool_engine(args.url, args.workers, frontier, driver_options, args.harvest, writer, journal)
+        else:
+            run_selenium_engine(args.url, frontier, driver_options, args.harvest, writer, journal)
+    except CircuitOpenError as e:
+        print(f"\nScraping stopped early: {e}")
+    finally:
+        if frontier:
+            frontier.save()
     
-    time.sleep(5)
-    driver.quit()
+    # The engines close the writer, so everything scraped is saved by now
+    journal.close()
+    print(f"Journal: {journal.summary()}")
+    if invalidator:
+        print(f"Cache: {invalidator.summary()}")
+    scheduler.report()
+    finish_run(args)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,71 @@
+import os
+import resource
+import sys
+
+# Resident memory of the scraper and of the browsers it drives. Chrome runs
+# as chromedriver -> browser -> one process per renderer, so a driver's
+# footprint is the RSS of that whole process tree. Read from /proc, so the
+# per-process figures are Linux only and None elsewhere.
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+def rss_mb(pid=None):
+    try:
+        with open(f"/proc/{pid or os.getpid()}/statm", encoding='ascii') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        return None
+
+def child_pids():
+    # {parent pid: [child pids]} for every process visible in /proc
+    children = {}
+    try:
+        entries = os.listdir('/proc')
+    except OSError:
+        return children
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", encoding='ascii', errors='replace') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name is parenthesised and may itself contain spaces
+        parent = int(stat.rsplit(')', 1)[1].split()[1])
+        children.setdefault(parent, []).append(int(entry))
+    return children
+
+def process_tree_rss_mb(pid):
+    if rss_mb(pid) is None:
+        return None
+    children = child_pids()
+    total = 0.0
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        total += rss_mb(current) or 0.0
+        stack.extend(children.get(current, ()))
+    return total
+
+def driver_rss_mb(driver):
+    # None for drivers without a local service process, like SessionDriver
+    service = getattr(driver, 'service', None)
+    process = getattr(service, 'process', None)
+    if process is None:
+        return None
+    return process_tree_rss_mb(process.pid)
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 1024
+
+def memory_summary(peak_driver_mb=None, recycled=0):
+    current = rss_mb()
+    summary = f"scraper {'-' if current is None else f'{current:.0f}'} MB now, {peak_rss_mb():.0f} MB peak"
+    if peak_driver_mb:
+        summary += f"; largest driver {peak_driver_mb:.0f} MB"
+    if recycled:
+        summary += f", {recycled} drivers recycled"
+    return summary
@@ -0,0 +1,136 @@
+from database_utils import setup_database_connection
+from geo_tiles import GEO_TILE_SQL
+import argparse
+import time
+
+# Adds geo_tile (and optionally a PostGIS point) to events, backfills rows
+# written before the scraper stored tiles, and builds the indexes the
+# backend's bounding box search uses. Safe to re-run; every step skips work
+# that is already done.
+#
+#   python migrate_geo_tiles.py                 # column, backfill, indexes
+#   python migrate_geo_tiles.py --postgis       # also geo_point + GiST index
+#   python migrate_geo_tiles.py --status
+
+INDEXES = {
+    # Bounding box search: geo_tile = ANY(tiles) AND start <= range end,
+    # with event_end_time checked from the index instead of the heap
+    'events_geo_tile_time_idx': 'events (geo_tile, event_start_time, event_end_time)',
+    # findActiveEvents: event_end_time > now ORDER BY event_end_time
+    'events_end_time_idx': 'events (event_end_time)',
+}
+
+POSTGIS_STATEMENTS = [
+    "CREATE EXTENSION IF NOT EXISTS postgis",
+    # Generated from latitude/longitude, so every writer keeps it current
+    """ALTER TABLE events ADD COLUMN IF NOT EXISTS geo_point geography(Point, 4326)
+       GENERATED ALWAYS AS (
+           CASE WHEN latitude IS NOT NULL AND longitude IS NOT NULL
+                THEN ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)::geography
+           END
+       ) STORED""",
+]
+POSTGIS_INDEXES = {
+    'events_geo_point_idx': 'events USING GIST (geo_point)',
+}
+
+def add_column(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("ALTER TABLE events ADD COLUMN IF NOT EXISTS geo_tile INTEGER")
+    conn.commit()
+
+def backfill(conn, batch_size=10000, pause=0.0):
+    # Walks the primary key in fixed ranges so each UPDATE is a short
+    # transaction and the scraper's upserts are never blocked for long
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT min(id), max(id) FROM events")
+        first_id, last_id = cursor.fetchone()
+    if first_id is None:
+        print("Backfill: events is empty")
+        return 0
+
+    start = time.perf_counter()
+    updated = 0
+    for batch, low in enumerate(range(first_id, last_id + 1, batch_size), 1):
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE events SET geo_tile = {GEO_TILE_SQL} "
+                f"WHERE id >= %s AND id < %s AND geo_tile IS NULL "
+                f"AND latitude IS NOT NULL AND longitude IS NOT NULL",
+                (low, low + batch_size),
+            )
+            updated += cursor.rowcount
+        conn.commit()
+        if batch % 10 == 0:
+            print(f"Backfill: {updated} rows, up to id {low + batch_size - 1} of {last_id}")
+        if pause:
+            time.sleep(pause)
+
+    print(f"Backfill: {updated} rows updated in {time.perf_counter() - start:.1f}s")
+    return updated
+
+def create_indexes(conn, indexes):
+    # CONCURRENTLY cannot run inside a transaction block
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cursor:
+            for name, definition in indexes.items():
+                start = time.perf_counter()
+                cursor.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}")
+                print(f"Index {name}: ready in {time.perf_counter() - start:.1f}s")
+            cursor.execute("ANALYZE events")
+    finally:
+        conn.autocommit = False
+
+def add_postgis(conn):
+    try:
+        with conn.cursor() as cursor:
+            for statement in POSTGIS_STATEMENTS:
+                cursor.execute(statement)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"PostGIS: skipped, {str(e).strip().splitlines()[0]}")
+        return False
+    create_indexes(conn, POSTGIS_INDEXES)
+    return True
+
+def status(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT count(*),
+                   count(*) FILTER (WHERE geo_tile IS NULL AND latitude IS NOT NULL AND longitude IS NOT NULL)
+            FROM events
+        """)
+        total, missing = cursor.fetchone()
+        print(f"{total} events, {missing} with coordinates but no geo_tile")
+        cursor.execute("""
+            SELECT indexname, indexdef FROM pg_indexes
+            WHERE tablename = 'events' ORDER BY indexname
+        """)
+        for name, definition in cursor.fetchall():
+            print(f"{name}: {definition}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Add geo tiles and search indexes to the events table')
+    parser.add_argument('--batch-size', type=int, default=10000, help='primary key range updated per transaction')
+    parser.add_argument('--pause', type=float, default=0.0, help='seconds to sleep between backfill batches')
+    parser.add_argument('--postgis', action='store_true', help='also add a generated geo_point column with a GiST index')
+    parser.add_argument('--status', action='store_true', help='report backfill progress and indexes, change nothing')
+    args = parser.parse_args()
+
+    conn = setup_database_connection()
+    try:
+        if args.status:
+            status(conn)
+            return
+        add_column(conn)
+        backfill(conn, args.batch_size, args.pause)
+        create_indexes(conn, INDEXES)
+        if args.postgis:
+            add_postgis(conn)
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
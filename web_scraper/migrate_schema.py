@@ -0,0 +1,76 @@
+from database_utils import missing_columns, setup_database_connection
+from migrate_geo_tiles import create_indexes
+import argparse
+
+# Adds the columns and tables the scraper writes beyond the backend's Event
+# entity. Run it once before deploying a scraper that needs them; the
+# writers only check that they exist. Safe to re-run: a column that is
+# already there is skipped, so events is only locked while something is
+# actually added.
+#
+#   python migrate_schema.py
+#   python migrate_schema.py --status
+#
+# geo_tile's backfill and the search indexes are in migrate_geo_tiles.py.
+
+# (table.column, statement that adds it)
+MIGRATIONS = [
+    ('events.content_hash', "ALTER TABLE events ADD COLUMN content_hash VARCHAR(64)"),
+    ('events.geo_tile', "ALTER TABLE events ADD COLUMN geo_tile INTEGER"),
+    # Set by dedup.py on every copy of an event except the canonical one
+    ('events.duplicate_of', "ALTER TABLE events ADD COLUMN duplicate_of BIGINT REFERENCES events (id) ON DELETE SET NULL"),
+    # One row per observation of an event, so sales and RSVP velocity can be
+    # computed (see refresh.py) even though events only keeps the latest counts
+    ('event_snapshots.event_id', """CREATE TABLE IF NOT EXISTS event_snapshots (
+        id BIGSERIAL PRIMARY KEY,
+        event_id BIGINT NOT NULL REFERENCES events (id) ON DELETE CASCADE,
+        captured_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        tickets_sold INTEGER,
+        tickets_remaining INTEGER,
+        total_capacity INTEGER
+    )"""),
+]
+
+INDEXES = {
+    'event_snapshots_event_time_idx': 'event_snapshots (event_id, captured_at)',
+    # refresh.py's VELOCITY_WINDOW scan and snapshot retention
+    'event_snapshots_captured_at_idx': 'event_snapshots (captured_at)',
+}
+
+# Gives up instead of queueing the backend's reads behind the ALTER
+LOCK_TIMEOUT = '5s'
+
+def migrate(conn):
+    missing = set(missing_columns(conn))
+    applied = 0
+    with conn.cursor() as cursor:
+        cursor.execute(f"SET lock_timeout = '{LOCK_TIMEOUT}'")
+        for column, statement in MIGRATIONS:
+            if column not in missing:
+                continue
+            cursor.execute(statement)
+            conn.commit()
+            print(f"Added {column}")
+            applied += 1
+    if applied == 0:
+        print("Schema: up to date")
+    return applied
+
+def main():
+    parser = argparse.ArgumentParser(description="Add the scraper's columns and tables to the events database")
+    parser.add_argument('--status', action='store_true', help='list what is missing, change nothing')
+    args = parser.parse_args()
+
+    conn = setup_database_connection()
+    try:
+        if args.status:
+            missing = missing_columns(conn)
+            print(f"Missing: {', '.join(missing)}" if missing else "Schema: up to date")
+            return
+        migrate(conn)
+        create_indexes(conn, INDEXES)
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
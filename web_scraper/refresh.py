@@ -0,0 +1,336 @@
+import argparse
+import heapq
+import queue
+import threading
+import time
+from database_utils import check_schema, setup_database_connection
+from spool import add_spool_arguments, writer_from_args
+from driver_pool import DriverPool
+from driver_factory import create_driver, add_driver_arguments, driver_options_from_args
+from scheduler import TokenBucket, default_scheduler as scheduler, add_scheduler_arguments, configure_from_args
+from cache_invalidation import add_cache_arguments, invalidator_from_args
+from instrumentation import metrics, add_report_arguments, finish_run
+from memory import memory_summary
+from sources import SessionDriver, scrape_source_url, DAEMON_RECYCLE_PAGES, DAEMON_MAX_DRIVER_RSS_MB
+
+# Re-scrapes events that are already in the database, most urgent first,
+# within a fixed number of fetches per hour. An event is due once the time
+# since its last snapshot exceeds its refresh interval, which shrinks as its
+# sales or RSVP count moves faster and as its start gets closer:
+#
+#   by_start    = time to start / START_DIVISOR    (4 days out -> 12h, 2h out -> 15m)
+#   by_velocity = time for the count to move by max(MIN_CHANGE, CHANGE_FRACTION * capacity)
+#                 at its velocity over the last VELOCITY_WINDOW
+#   interval    = min(by_start, by_velocity) within [MIN_INTERVAL, MAX_INTERVAL]
+#
+# Static and sold out events fall back to MAX_INTERVAL unless they start
+# soon; events that have ended or are linked duplicates are never fetched.
+
+MIN_INTERVAL = 15 * 60
+MAX_INTERVAL = 48 * 3600
+# Until there are two snapshots to measure a velocity from
+DEFAULT_INTERVAL = 6 * 3600
+STARTED_INTERVAL = 4 * 3600
+START_DIVISOR = 8
+VELOCITY_WINDOW = 24 * 3600
+# Shortest snapshot span a velocity is trusted over
+MIN_VELOCITY_SPAN = 30 * 60
+# A change worth a fetch: CHANGE_FRACTION of capacity, at least MIN_CHANGE
+CHANGE_FRACTION = 0.02
+MIN_CHANGE = 3
+RELOAD_INTERVAL = 5 * 60
+# Snapshots older than this are deleted, at most once per PRUNE_INTERVAL and
+# PRUNE_BATCH rows per statement. Only VELOCITY_WINDOW of them is ever read.
+SNAPSHOT_RETENTION_DAYS = 14
+PRUNE_INTERVAL = 3600
+PRUNE_BATCH = 10000
+
+# Ages and spans are computed in SQL so they share the database's clock
+# and time zone with the stored timestamps. Only the last VELOCITY_WINDOW of
+# snapshots is scanned; an event not seen within it is aged from its row
+# timestamps, or from the epoch when it has none, so it always comes due.
+REFRESH_CANDIDATES_QUERY = """
+WITH recent AS (
+    SELECT event_id, captured_at, tickets_sold
+    FROM event_snapshots
+    WHERE captured_at >= LOCALTIMESTAMP - make_interval(secs => %(window)s)
+),
+latest AS (
+    SELECT DISTINCT ON (event_id) event_id, captured_at, tickets_sold
+    FROM recent
+    ORDER BY event_id, captured_at DESC
+),
+earliest AS (
+    SELECT DISTINCT ON (event_id) event_id, captured_at, tickets_sold
+    FROM recent
+    WHERE tickets_sold IS NOT NULL
+    ORDER BY event_id, captured_at ASC
+)
+SELECT e.event_page_url,
+       e.event_source,
+       EXTRACT(EPOCH FROM e.event_start_time - LOCALTIMESTAMP),
+       EXTRACT(EPOCH FROM LOCALTIMESTAMP - COALESCE(latest.captured_at, e.time_updated, e.time_added,
+                                                    'epoch'::timestamp)),
+       e.total_capacity,
+       e.tickets_remaining,
+       latest.tickets_sold - earliest.tickets_sold,
+       EXTRACT(EPOCH FROM latest.captured_at - earliest.captured_at)
+FROM events e
+LEFT JOIN latest ON latest.event_id = e.id
+LEFT JOIN earliest ON earliest.event_id = e.id
+WHERE e.event_end_time >= LOCALTIMESTAMP
+  AND e.duplicate_of IS NULL
+  AND e.event_page_url IS NOT NULL
+  AND e.event_source IN ('MEETUP', 'EVENTBRITE')
+"""
+
+PRUNE_SNAPSHOTS_QUERY = """
+DELETE FROM event_snapshots
+WHERE id IN (
+    SELECT id FROM event_snapshots
+    WHERE captured_at < LOCALTIMESTAMP - make_interval(secs => %(seconds)s)
+    LIMIT %(batch)s
+)
+"""
+
+def prune_snapshots(conn, retention_days=SNAPSHOT_RETENTION_DAYS, batch_size=PRUNE_BATCH):
+    # Short deletes so the writers' snapshot inserts are never held up long
+    deleted = 0
+    while True:
+        with conn.cursor() as cursor:
+            cursor.execute(PRUNE_SNAPSHOTS_QUERY, {'seconds': retention_days * 86400, 'batch': batch_size})
+            count = cursor.rowcount
+        conn.commit()
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+def sales_velocity(sold_change, span):
+    # Counts per hour, or None when the snapshots are too close together
+    if sold_change is None or span is None or span < MIN_VELOCITY_SPAN:
+        return None
+    return abs(sold_change) / (span / 3600)
+
+def refresh_interval(time_to_start, velocity, capacity=None, remaining=None):
+    if time_to_start is None:
+        by_start = MAX_INTERVAL
+    elif time_to_start <= 0:
+        by_start = STARTED_INTERVAL
+    else:
+        by_start = time_to_start / START_DIVISOR
+
+    if remaining == 0:
+        by_velocity = MAX_INTERVAL
+    elif velocity is None:
+        by_velocity = DEFAULT_INTERVAL
+    elif velocity == 0:
+        by_velocity = MAX_INTERVAL
+    else:
+        step = max(MIN_CHANGE, CHANGE_FRACTION * (capacity or 0))
+        by_velocity = step / velocity * 3600
+
+    return min(MAX_INTERVAL, max(MIN_INTERVAL, min(by_start, by_velocity)))
+
+class RefreshQueue:
+    # Max-heap of due events by overdue ratio (age / interval), reloaded
+    # from the database every RELOAD_INTERVAL. Dispatched URLs are held back
+    # for MIN_INTERVAL so a failed fetch is not retried straight away.
+
+    def __init__(self, fetches_per_hour, sources=('MEETUP', 'EVENTBRITE'), retention_days=SNAPSHOT_RETENTION_DAYS):
+        self.sources = set(sources)
+        self.retention_days = retention_days
+        self.pruned_at = None
+        # A few minutes of budget can be spent back to back after an idle spell
+        self.budget = TokenBucket(fetches_per_hour / 3600, max(1, fetches_per_hour // 12))
+        self.heap = []
+        self.dispatched_at = {}
+        self.loaded_at = None
+        self.tracked = 0
+        self.dispatched = 0
+        self.lock = threading.Lock()
+
+    def reload(self):
+        conn = setup_database_connection()
+        try:
+            if self.loaded_at is None:
+                check_schema(conn)
+            if self.pruned_at is None or time.monotonic() - self.pruned_at >= PRUNE_INTERVAL:
+                deleted = prune_snapshots(conn, self.retention_days)
+                self.pruned_at = time.monotonic()
+                if deleted:
+                    print(f"Refresh: pruned {deleted} snapshots older than {self.retention_days} days")
+            with conn.cursor() as cursor:
+                cursor.execute(REFRESH_CANDIDATES_QUERY, {'window': VELOCITY_WINDOW})
+                rows = cursor.fetchall()
+        finally:
+            conn.close()
+
+        now = time.monotonic()
+        heap = []
+        for url, source, time_to_start, age, capacity, remaining, sold_change, span in rows:
+            if source not in self.sources:
+                continue
+            if now - self.dispatched_at.get(url, -MIN_INTERVAL) < MIN_INTERVAL:
+                continue
+            time_to_start = float(time_to_start) if time_to_start is not None else None
+            velocity = sales_velocity(sold_change, float(span) if span is not None else None)
+            interval = refresh_interval(time_to_start, velocity, capacity, remaining)
+            overdue = float(age or 0) / interval
+            if overdue >= 1:
+                heap.append((-overdue, url, source))
+        heapq.heapify(heap)
+
+        with self.lock:
+            self.heap = heap
+            self.tracked = len(rows)
+            self.loaded_at = now
+        print(f"Refresh: {len(heap)} of {len(rows)} active events due")
+
+    def pop(self):
+        with self.lock:
+            if not self.heap:
+                return None
+            _, url, source = heapq.heappop(self.heap)
+            self.dispatched_at[url] = time.monotonic()
+            self.dispatched += 1
+            return url, source
+
+    def run(self, outboxes, stop, duration=None):
+        # Spends the budget on the most overdue event across every source and
+        # hands it to that source's pool
+        deadline = time.monotonic() + duration if duration else None
+        while not stop.is_set() and (deadline is None or time.monotonic() < deadline):
+            if self.loaded_at is None or time.monotonic() - self.loaded_at >= RELOAD_INTERVAL:
+                try:
+                    self.reload()
+                except Exception as e:
+                    print(f"Refresh: could not load candidates ({e})")
+                    self.loaded_at = time.monotonic()
+            item = self.pop()
+            if item is None:
+                # Nothing is due until the next reload brings in new snapshots
+                wait = max(1, RELOAD_INTERVAL - (time.monotonic() - self.loaded_at))
+                if deadline is not None:
+                    wait = min(wait, max(0, deadline - time.monotonic()))
+                stop.wait(wait)
+                continue
+            wait = self.budget.reserve()
+            if wait > 0 and stop.wait(wait):
+                break
+            url, source = item
+            outboxes[source].put(url)
+        for outbox in outboxes.values():
+            outbox.put(None)
+
+def iter_outbox(outbox, stop):
+    while not stop.is_set():
+        try:
+            url = outbox.get(timeout=0.5)
+        except queue.Empty:
+            continue
+        if url is None:
+            return
+        yield url
+
+def build_refresh_pool(source, outbox, stop, writer, workers, driver_options, engine):
+    source_name = source.lower()
+
+    def expand_listing(driver):
+        return iter_outbox(outbox, stop)
+
+    def scrape_url(driver, url, index):
+        return scrape_source_url(source_name, engine, driver, url, index, writer)
+
+    if engine == 'http':
+        new_driver = SessionDriver
+    else:
+        new_driver = lambda: create_driver(**driver_options)
+
+    # The listing worker only reads the outbox, so it never needs a browser;
+    # the scrape drivers live as long as the run and are recycled like a
+    # daemon's. An event is due again after its refresh interval, and
+    # RefreshQueue holds a dispatched URL back for MIN_INTERVAL, so the pool
+    # must not drop a URL it has seen before.
+    return DriverPool(
+        expand_listing=expand_listing,
+        scrape_url=scrape_url,
+        num_workers=workers,
+        create_driver=new_driver,
+        create_listing_driver=SessionDriver,
+        recycle_pages=DAEMON_RECYCLE_PAGES,
+        max_driver_rss_mb=DAEMON_MAX_DRIVER_RSS_MB,
+        dedupe=False,
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description='Re-scrape known events, prioritised by sales velocity and start time')
+    parser.add_argument('--fetches-per-hour', type=float, default=600, help='refresh budget across all sources')
+    parser.add_argument('--sources', nargs='+', choices=('meetup', 'eventbrite'), default=['meetup', 'eventbrite'])
+    parser.add_argument('--duration-minutes', type=float, help='stop after this long; runs until interrupted otherwise')
+    parser.add_argument('--workers', type=int, default=2, help='scrape workers per source')
+    parser.add_argument('--meetup-engine', choices=('selenium', 'http'), default='http')
+    parser.add_argument('--snapshot-retention-days', type=float, default=SNAPSHOT_RETENTION_DAYS,
+                        help='delete event snapshots older than this')
+    add_scheduler_arguments(parser)
+    add_spool_arguments(parser)
+    add_cache_arguments(parser)
+    add_driver_arguments(parser)
+    add_report_arguments(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+    metrics.source = 'refresh'
+
+    sources = [source.upper() for source in args.sources]
+    driver_options = driver_options_from_args(args)
+    writer = writer_from_args(args)
+    invalidator = invalidator_from_args(args)
+    if invalidator:
+        writer.on_change.append(invalidator.rows_changed)
+
+    refresh_queue = RefreshQueue(args.fetches_per_hour, sources, args.snapshot_retention_days)
+    stop = threading.Event()
+    outboxes = {source: queue.Queue() for source in sources}
+    pools = {}
+    for source in sources:
+        engine = args.meetup_engine if source == 'MEETUP' else 'selenium'
+        pools[source] = build_refresh_pool(source, outboxes[source], stop, writer, args.workers, driver_options, engine)
+
+    threads = [threading.Thread(target=pool.run, name=f'refresh-{source.lower()}', daemon=True)
+               for source, pool in pools.items()]
+    for thread in threads:
+        thread.start()
+
+    duration = args.duration_minutes * 60 if args.duration_minutes else None
+    print(f"Refreshing {', '.join(sources)} at up to {args.fetches_per_hour:g} fetches per hour")
+    try:
+        refresh_queue.run(outboxes, stop, duration)
+        # Nothing more is dispatched, so a paused source need not be waited out
+        scheduler.cancel()
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(timeout=0.5)
+    except KeyboardInterrupt:
+        print("\nRefresh interrupted by user")
+        stop.set()
+        for pool in pools.values():
+            pool.stop.set()
+        scheduler.cancel()
+        for thread in threads:
+            thread.join()
+    finally:
+        writer.close()
+
+    print("\nREFRESH COMPLETED")
+    for source, pool in pools.items():
+        print(f"{source}: {pool.stats.succeeded}/{pool.stats.scraped} events refreshed")
+    print(f"Dispatched {refresh_queue.dispatched} of {refresh_queue.tracked} active events")
+    peak_driver_mb = max((pool.stats.peak_driver_mb for pool in pools.values()), default=0)
+    print(f"Memory: {memory_summary(peak_driver_mb, sum(pool.stats.recycled for pool in pools.values()))}")
+    print(f"Database writes: {writer.summary()}")
+    if invalidator:
+        print(f"Cache: {invalidator.summary()}")
+    scheduler.report()
+    finish_run(args)
+
+if __name__ == "__main__":
+    main()
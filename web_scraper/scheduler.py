@@ -0,0 +1,284 @@
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import WebDriverException
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+from http_fetch import fetch_html
+from instrumentation import metrics
+from adaptive import (AimdLimit, BlockedError, CircuitBreaker, CircuitOpenError, CHALLENGE, CHALLENGE_SELECTOR,
+                      CLOSED, DEFAULT_MAX_CONCURRENCY, ERROR, OK, OPEN, SLOW, is_challenge_html,
+                      is_challenge_title, outcome_for_status, retry_after_seconds)
+from collections import Counter
+import random
+import requests
+import threading
+import time
+
+# requests per second, burst size
+DEFAULT_DOMAIN_LIMITS = {
+    'meetup.com': (0.5, 3),
+    'eventbrite.com': (0.5, 3),
+}
+DEFAULT_LIMIT = (1.0, 2)
+
+def domain_of(url):
+    host = urlsplit(url).hostname or ''
+    parts = host.split('.')
+    return '.'.join(parts[-2:]) if len(parts) > 2 else host
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        # Takes a token now and returns how long the caller must wait before
+        # using it; the balance may go negative so concurrent callers queue up
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+class DomainStats:
+    def __init__(self):
+        self.requests = 0
+        self.throttled = 0.0
+        self.working = 0.0
+        self.outcomes = Counter()
+
+class Attempt:
+    # Filled in by get/fetch; None until the response says otherwise
+    def __init__(self):
+        self.outcome = None
+        self.retry_after = None
+
+class PolitenessScheduler:
+    # Keeps every worker of a domain inside that domain's request rate and
+    # concurrency, adapts both to how the domain is answering and pauses it
+    # through its circuit breaker (adaptive.py)
+
+    def __init__(self, domain_limits=None, default_limit=DEFAULT_LIMIT, jitter=0.0,
+                 max_concurrency=DEFAULT_MAX_CONCURRENCY, adaptive=True):
+        self.domain_limits = dict(DEFAULT_DOMAIN_LIMITS if domain_limits is None else domain_limits)
+        self.default_limit = default_limit
+        self.jitter = jitter
+        self.max_concurrency = max_concurrency
+        self.adaptive = adaptive
+        self.buckets = {}
+        self.limits = {}
+        self.breakers = {}
+        self.stats = {}
+        self.cancelled = threading.Event()
+        self.lock = threading.Lock()
+
+    def configure(self, rps=None, burst=None, jitter=None, max_concurrency=None, adaptive=None):
+        with self.lock:
+            if rps is not None or burst is not None:
+                for domain, (rate, size) in list(self.domain_limits.items()):
+                    self.domain_limits[domain] = (rps or rate, burst or size)
+                rate, size = self.default_limit
+                self.default_limit = (rps or rate, burst or size)
+                self.buckets = {}
+            if jitter is not None:
+                self.jitter = jitter
+            if max_concurrency is not None:
+                self.max_concurrency = max_concurrency
+                self.buckets = {}
+            if adaptive is not None:
+                self.adaptive = adaptive
+                self.buckets = {}
+
+    def bucket_for(self, domain):
+        with self.lock:
+            if domain not in self.buckets:
+                rate, burst = self.domain_limits.get(domain, self.default_limit)
+                self.buckets[domain] = TokenBucket(rate, burst)
+                self.limits[domain] = AimdLimit(self.buckets[domain], self.max_concurrency, self.adaptive)
+                self.breakers.setdefault(domain, CircuitBreaker())
+                self.stats.setdefault(domain, DomainStats())
+            return self.buckets[domain], self.stats[domain]
+
+    def cancel(self):
+        # Wakes every request waiting on a paused domain or a free slot so
+        # an interrupted run can shut down; they raise CircuitOpenError
+        self.cancelled.set()
+
+    def reset_circuits(self):
+        # Closes the breakers that gave up, for the next pass of a long run
+        with self.lock:
+            for domain, breaker in list(self.breakers.items()):
+                if breaker.gave_up():
+                    print(f"[{domain}] Circuit reset for the next pass")
+                    self.breakers[domain] = CircuitBreaker()
+
+    def wait_for_circuit(self, domain):
+        breaker = self.breakers[domain]
+        while True:
+            wait = breaker.admit()
+            if wait is None:
+                raise CircuitOpenError(domain, breaker.reason)
+            if wait <= 0:
+                return
+            if self.cancelled.wait(wait):
+                raise CircuitOpenError(domain, 'run stopped')
+
+    def acquire(self, url):
+        domain = domain_of(url)
+        bucket, stats = self.bucket_for(domain)
+        self.wait_for_circuit(domain)
+        # A Retry-After pause holds the domain even when tokens are left
+        wait = max(bucket.reserve(), self.limits[domain].pause_remaining())
+        if self.jitter:
+            wait += random.uniform(0, self.jitter)
+        if wait > 0 and self.cancelled.wait(wait):
+            raise CircuitOpenError(domain, 'run stopped')
+        metrics.observe('throttle', wait)
+        with self.lock:
+            stats.requests += 1
+            stats.throttled += wait
+
+    def record_work(self, url, seconds):
+        _, stats = self.bucket_for(domain_of(url))
+        with self.lock:
+            stats.working += seconds
+
+    @contextmanager
+    def attempt(self, url):
+        # Holds one of the domain's concurrent slots for a request and feeds
+        # its outcome and latency back into the domain's limits and breaker
+        domain = domain_of(url)
+        limit = self.limits[domain]
+        if not limit.enter(self.cancelled):
+            raise CircuitOpenError(domain, 'run stopped')
+        attempt = Attempt()
+        start = time.monotonic()
+        try:
+            yield attempt
+        except Exception:
+            if attempt.outcome is None:
+                attempt.outcome = ERROR
+            raise
+        finally:
+            limit.leave()
+            elapsed = time.monotonic() - start
+            if attempt.outcome is None:
+                attempt.outcome = SLOW if elapsed > limit.slow_after() else OK
+            self.record_work(url, elapsed)
+            self.record_outcome(domain, attempt, elapsed)
+
+    def record_outcome(self, domain, attempt, elapsed):
+        limit = self.limits[domain]
+        breaker = self.breakers[domain]
+        with self.lock:
+            self.stats[domain].outcomes[attempt.outcome] += 1
+        if attempt.outcome != OK:
+            metrics.count(attempt.outcome)
+
+        if limit.update(attempt.outcome, elapsed, attempt.retry_after):
+            print(f"[{domain}] {attempt.outcome} response, backing off to {limit.describe()}")
+
+        state = breaker.record(attempt.outcome)
+        if state == OPEN:
+            metrics.count('circuit_trip')
+            if breaker.gave_up():
+                print(f"[{domain}] Circuit open after {breaker.trips} trips ({attempt.outcome}), "
+                      f"failing fast for the rest of the run")
+            else:
+                print(f"[{domain}] Circuit open ({attempt.outcome}), pausing {domain} "
+                      f"for {breaker.current_cooldown():.0f}s")
+        elif state == CLOSED:
+            print(f"[{domain}] Circuit closed, probe succeeded at {limit.describe()}")
+
+    def get(self, driver, url, ready=None, timeout=15, stage='navigation'):
+        self.acquire(url)
+        with self.attempt(url) as attempt:
+            with metrics.stage(stage):
+                driver.get(url)
+                ready_in_time = wait_for_page_ready(driver, ready, timeout)
+            if is_challenge_page(driver):
+                # Extraction would only find empty fields on it
+                attempt.outcome = CHALLENGE
+                ready_in_time = False
+            elif not ready_in_time:
+                attempt.outcome = SLOW
+            if not ready_in_time:
+                metrics.fail(stage)
+            return ready_in_time
+
+    def fetch(self, session, url, timeout=15, stage='navigation'):
+        self.acquire(url)
+        with self.attempt(url) as attempt:
+            with metrics.stage(stage):
+                try:
+                    html = fetch_html(session, url, timeout)
+                except requests.HTTPError as e:
+                    attempt.outcome = outcome_for_status(e.response.status_code)
+                    attempt.retry_after = retry_after_seconds(e.response.headers.get('Retry-After'))
+                    raise
+                if is_challenge_html(html):
+                    attempt.outcome = CHALLENGE
+                    raise BlockedError(url, CHALLENGE)
+                return html
+
+    def report(self):
+        with self.lock:
+            stats = dict(self.stats)
+            limits = dict(self.limits)
+            breakers = dict(self.breakers)
+        for domain, domain_stats in sorted(stats.items()):
+            print(f"{domain}: {domain_stats.requests} requests, "
+                  f"{domain_stats.throttled:.1f}s throttled, {domain_stats.working:.1f}s fetching")
+            problems = ', '.join(f"{count} {outcome}" for outcome, count in sorted(domain_stats.outcomes.items())
+                                 if outcome != OK)
+            print(f"  limits {limits[domain].describe()}, {limits[domain].decreases} cuts, "
+                  f"{breakers[domain].describe()}{'; ' + problems if problems else ''}")
+
+def wait_for_page_ready(driver, ready=None, timeout=15):
+    # ready is an expected_conditions-style callable (or a (By, value)
+    # locator) that must also hold once the document has loaded
+    condition = EC.presence_of_element_located(ready) if isinstance(ready, tuple) else ready
+    try:
+        WebDriverWait(driver, timeout).until(
+            lambda d: d.execute_script("return document.readyState") in ('interactive', 'complete')
+        )
+        if condition:
+            WebDriverWait(driver, timeout).until(condition)
+        return True
+    except TimeoutException:
+        return False
+
+def is_challenge_page(driver):
+    try:
+        return is_challenge_title(driver.title) or driver.execute_script(
+            "return document.querySelector(arguments[0]) !== null", CHALLENGE_SELECTOR)
+    except WebDriverException:
+        return False
+
+def wait_for(driver, condition, timeout):
+    try:
+        return WebDriverWait(driver, timeout).until(condition)
+    except TimeoutException:
+        return None
+
+def add_scheduler_arguments(parser):
+    parser.add_argument('--rps', type=float, help='requests per second allowed per domain')
+    parser.add_argument('--burst', type=int, help='requests allowed back to back per domain')
+    parser.add_argument('--jitter', type=float, default=0.0, help='max random seconds added to each wait')
+    parser.add_argument('--max-concurrency', type=int,
+                        help=f'requests in flight allowed per domain (default {DEFAULT_MAX_CONCURRENCY})')
+    parser.add_argument('--fixed-rate', action='store_true',
+                        help='keep --rps and --max-concurrency fixed instead of backing off when a site struggles')
+
+def configure_from_args(args):
+    default_scheduler.configure(rps=args.rps, burst=args.burst, jitter=args.jitter,
+                                max_concurrency=args.max_concurrency, adaptive=not args.fixed_rate)
+
+default_scheduler = PolitenessScheduler()
@@ -0,0 +1,38 @@
+import meetup
+import event_brite
+from http_fetch import create_session
+from scheduler import default_scheduler as scheduler
+
+# Dispatches listing and event pages to the source modules, shared by the
+# one-off and daemon runs in main.py and the refresh scheduler.
+
+# Driver recycling used by --daemon and refresh.py unless set explicitly
+DAEMON_RECYCLE_PAGES = 200
+DAEMON_MAX_DRIVER_RSS_MB = 1024
+
+class SessionDriver:
+    # Lets the HTTP engine run in a DriverPool, which quits its drivers
+    def __init__(self):
+        self.session = create_session()
+
+    def quit(self):
+        self.session.close()
+
+def iter_query_event_urls(source, engine, driver, url, max_pages, harvest):
+    if source == 'eventbrite':
+        return event_brite.iter_listing_event_urls(driver, url, max_pages, harvest)
+    if engine == 'http':
+        html = scheduler.fetch(driver.session, url, stage='listing')
+        return meetup.get_event_urls_from_listing_html(html, url)
+    return meetup.iter_listing_event_urls(driver, url, harvest=harvest)
+
+def scrape_source_url(source, engine, driver, url, index, writer):
+    if source == 'eventbrite':
+        return event_brite.scrape_event_url(driver, url, writer)
+    if engine == 'http':
+        return meetup.scrape_single_event_http(driver.session, url, index, writer)
+    return meetup.scrape_event_url(driver, url, index, writer)
+
+def source_listing_driver_options(source, driver_options, harvest):
+    module = event_brite if source == 'eventbrite' else meetup
+    return module.listing_driver_options(driver_options, harvest)
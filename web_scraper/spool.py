@@ -0,0 +1,316 @@
+from database_utils import (
+    UPSERTS, EventWriter, compute_content_hash, check_schema, notify, setup_database_connection, start_flush_thread,
+)
+from event_record import EventRecord, eventbrite_record, meetup_record
+from cache_invalidation import add_cache_arguments, invalidator_from_args
+from cache_warming import add_warming_arguments, warmer_from_args
+from dedup import add_dedup_arguments, dedup_active_events
+from dataclasses import asdict
+import argparse
+import datetime
+import glob
+import json
+import os
+import re
+import threading
+import time
+
+DEFAULT_SPOOL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'spool')
+
+STAGING_TABLE = """
+CREATE TEMP TABLE events_staging (
+    seq BIGSERIAL,
+    event_title TEXT,
+    event_start_date TEXT,
+    event_date_time TEXT,
+    event_summary TEXT,
+    event_address TEXT,
+    event_image_url TEXT,
+    directions_url TEXT,
+    event_page_url TEXT,
+    latitude DOUBLE PRECISION,
+    longitude DOUBLE PRECISION,
+    geo_tile INTEGER,
+    total_capacity INTEGER,
+    tickets_sold INTEGER,
+    tickets_remaining INTEGER,
+    event_start_time TIMESTAMPTZ,
+    event_end_time TIMESTAMPTZ,
+    event_source TEXT,
+    content_hash VARCHAR(64),
+    scraped_at TIMESTAMPTZ
+) ON COMMIT DROP
+"""
+
+STAGING_COLUMNS = [
+    'event_title', 'event_start_date', 'event_date_time', 'event_summary',
+    'event_address', 'event_image_url', 'directions_url', 'event_page_url',
+    'latitude', 'longitude', 'geo_tile', 'total_capacity', 'tickets_sold', 'tickets_remaining',
+    'event_start_time', 'event_end_time', 'event_source', 'content_hash', 'scraped_at',
+]
+
+COPY_STAGING = f"COPY events_staging ({', '.join(STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+
+# The spooled observation time, not the load time, so sales velocity is
+# measured from when the page was actually scraped
+SNAPSHOT_STAGING = """
+INSERT INTO event_snapshots (event_id, captured_at, tickets_sold, tickets_remaining, total_capacity)
+SELECT events.id, COALESCE(staged.scraped_at, CURRENT_TIMESTAMP), staged.tickets_sold,
+       staged.tickets_remaining, staged.total_capacity
+FROM events_staging staged
+JOIN events ON events.event_page_url = staged.event_page_url
+"""
+
+# What the merge returns for each inserted or updated event
+MERGE_RETURNING = ['inserted', 'event_page_url', 'latitude', 'longitude', 'event_start_time', 'event_end_time']
+
+def merge_query(source):
+    # Same columns, conflict handling and content hash check as the
+    # per-batch upsert, fed by the latest staged copy of each event
+    query, template = UPSERTS[source]
+    columns = re.sub(r'%\((\w+)\)s', r'\1', template.strip()[1:-1])
+    select = (
+        f"SELECT DISTINCT ON (event_page_url) {columns} FROM events_staging "
+        f"WHERE event_source = '{source}' AND event_page_url IS NOT NULL "
+        f"ORDER BY event_page_url, seq DESC"
+    )
+    upsert = query.replace('VALUES %s', select)
+    returning = ', '.join(['(xmax = 0) AS inserted'] + MERGE_RETURNING[1:])
+    return re.sub(r'RETURNING .*', f'RETURNING {returning}', upsert)
+
+def spool_value(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot spool {type(value).__name__}")
+
+class SpoolWriter:
+    # Drop-in for EventWriter that appends normalized rows to a local NDJSON
+    # file, one per run, so scraping never waits on or fails with the
+    # database. `python spool.py load` moves finished spools into Postgres.
+
+    def __init__(self, spool_dir=DEFAULT_SPOOL_DIR, batch_size=50, flush_interval=30):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        os.makedirs(spool_dir, exist_ok=True)
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        self.path = os.path.join(spool_dir, f"events-{stamp}-{os.getpid()}.ndjson")
+        # Left as .part until close() so the loader never reads a live spool
+        self.file = open(self.path + '.part', 'a', encoding='utf-8')
+        self.pending = []
+        self.last_flush = time.monotonic()
+        self.lock = threading.Lock()
+        self.saved = 0
+        self.failed = 0
+        self.on_flush = []
+        # Spooled rows reach the database in load_spools, which notifies then
+        self.on_change = []
+        self.closed = threading.Event()
+        self.flusher = start_flush_thread(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add_eventbrite_event(self, event_data, ticket_data):
+        self.add(eventbrite_record(event_data, ticket_data))
+
+    def add_meetup_event(self, meetup_data):
+        self.add(meetup_record(meetup_data))
+
+    def add(self, record):
+        record.content_hash = compute_content_hash(record)
+        scraped_at = datetime.datetime.now(datetime.timezone.utc)
+        with self.lock:
+            self.pending.append((record, scraped_at))
+            due = (len(self.pending) >= self.batch_size or
+                   time.monotonic() - self.last_flush >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def flush_if_due(self):
+        with self.lock:
+            due = self.pending and time.monotonic() - self.last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, []
+            self.last_flush = time.monotonic()
+            if not pending or not self.file:
+                return
+            for record, scraped_at in pending:
+                line = asdict(record)
+                line['scraped_at'] = scraped_at
+                self.file.write(json.dumps(line, default=spool_value) + '\n')
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.saved += len(pending)
+
+        rows = [record for record, _ in pending]
+        for source in {row.event_source for row in rows}:
+            source_rows = [row for row in rows if row.event_source == source]
+            for callback in self.on_flush:
+                try:
+                    callback(source, source_rows)
+                except Exception as e:
+                    print(f"Flush callback failed: {e}")
+
+    def summary(self):
+        return f"{self.saved} spooled to {self.path}, {self.failed} failed"
+
+    def close(self):
+        self.closed.set()
+        self.flusher.join()
+        self.flush()
+        with self.lock:
+            if not self.file:
+                return
+            self.file.close()
+            self.file = None
+        if self.saved:
+            os.replace(self.path + '.part', self.path)
+        else:
+            os.remove(self.path + '.part')
+
+class CopyStream:
+    # File-like reader over generated CSV lines for cursor.copy_expert, so a
+    # spool is streamed into COPY without building the whole payload
+    def __init__(self, lines):
+        self.lines = iter(lines)
+        self.buffer = ''
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            line = next(self.lines, None)
+            if line is None:
+                break
+            self.buffer += line
+        if size < 0:
+            size = len(self.buffer)
+        chunk, self.buffer = self.buffer[:size], self.buffer[size:]
+        return chunk
+
+def csv_field(value):
+    # Unquoted empty is NULL in COPY's csv format, quoted empty is ''
+    if value is None:
+        return ''
+    return '"' + str(value).replace('"', '""') + '"'
+
+def spool_csv_lines(path, counts):
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                # A crashed run can leave its last line half written
+                counts['skipped'] += 1
+                continue
+            counts['rows'] += 1
+            yield ','.join(csv_field(row.get(column)) for column in STAGING_COLUMNS) + '\n'
+
+def ready_spools(spool_dir=DEFAULT_SPOOL_DIR, include_partial=False):
+    paths = glob.glob(os.path.join(spool_dir, 'events-*.ndjson'))
+    if include_partial:
+        paths += glob.glob(os.path.join(spool_dir, 'events-*.ndjson.part'))
+    return sorted(paths)
+
+def load_spools(paths, keep=False, on_change=()):
+    if not paths:
+        print("No spool files to load")
+        return
+
+    start = time.perf_counter()
+    counts = {'rows': 0, 'skipped': 0}
+    conn = setup_database_connection()
+    try:
+        check_schema(conn)
+        with conn.cursor() as cursor:
+            cursor.execute(STAGING_TABLE)
+            for path in paths:
+                cursor.copy_expert(COPY_STAGING, CopyStream(spool_csv_lines(path, counts)))
+
+            results = {}
+            for source in UPSERTS:
+                cursor.execute(merge_query(source))
+                results[source] = [dict(zip(MERGE_RETURNING, row)) for row in cursor.fetchall()]
+            cursor.execute(SNAPSHOT_STAGING)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    for source, changed in results.items():
+        if changed:
+            notify(on_change, source, [
+                EventRecord(source, **{column: row[column] for column in MERGE_RETURNING[1:]}) for row in changed
+            ])
+
+    # Only after the commit; loading a spool twice is harmless because
+    # unchanged rows are skipped by their content hash
+    loaded_dir = os.path.join(os.path.dirname(paths[0]), 'loaded')
+    for path in paths:
+        if keep:
+            os.makedirs(loaded_dir, exist_ok=True)
+            os.replace(path, os.path.join(loaded_dir, os.path.basename(path).replace('.part', '')))
+        else:
+            os.remove(path)
+
+    elapsed = time.perf_counter() - start
+    print(f"Loaded {counts['rows']} rows from {len(paths)} spool files in {elapsed:.2f}s"
+          f" ({counts['skipped']} unreadable lines skipped)")
+    for source, changed in results.items():
+        inserted = sum(1 for row in changed if row['inserted'])
+        print(f"{source}: {inserted} inserted, {len(changed) - inserted} updated")
+
+def add_spool_arguments(parser):
+    parser.add_argument('--spool', action='store_true',
+                        help='write events to a local spool instead of the database; load it with spool.py load')
+    parser.add_argument('--spool-dir', default=DEFAULT_SPOOL_DIR)
+
+def writer_from_args(args):
+    return SpoolWriter(args.spool_dir) if args.spool else EventWriter()
+
+def main():
+    parser = argparse.ArgumentParser(description='Load spooled events into Postgres')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    load = commands.add_parser('load', help='COPY finished spools into a staging table and merge them into events')
+    load.add_argument('--spool-dir', default=DEFAULT_SPOOL_DIR)
+    load.add_argument('--include-partial', action='store_true',
+                      help='also load .part spools left behind by crashed runs')
+    load.add_argument('--keep', action='store_true', help='move loaded spools to loaded/ instead of deleting them')
+    add_cache_arguments(load)
+    add_dedup_arguments(load)
+    add_warming_arguments(load)
+
+    status = commands.add_parser('status', help='list spools waiting to be loaded')
+    status.add_argument('--spool-dir', default=DEFAULT_SPOOL_DIR)
+
+    args = parser.parse_args()
+    if args.command == 'load':
+        invalidator = invalidator_from_args(args)
+        on_change = [invalidator.rows_changed] if invalidator else []
+        load_spools(ready_spools(args.spool_dir, args.include_partial), args.keep, on_change)
+        if args.dedup:
+            changed = dedup_active_events()
+            if invalidator and changed:
+                invalidator.rows_changed('DEDUP', changed)
+        if invalidator:
+            print(f"Cache: {invalidator.summary()}")
+        warmer = warmer_from_args(args)
+        if warmer:
+            warmer.warm()
+            print(f"Cache warming: {warmer.summary()}")
+    else:
+        for path in ready_spools(args.spool_dir, include_partial=True):
+            with open(path, encoding='utf-8') as f:
+                rows = sum(1 for _ in f)
+            print(f"{os.path.basename(path)}: {rows} rows")
+
+if __name__ == "__main__":
+    main()
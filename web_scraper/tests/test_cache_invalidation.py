@@ -0,0 +1,50 @@
+import datetime
+import json
+
+import fakeredis
+
+from cache_invalidation import CHANGES_STREAM, CacheInvalidator, cache_key
+from event_record import EventRecord
+
+EVENING = (datetime.datetime(2030, 1, 1, 18), datetime.datetime(2030, 1, 2))
+NEXT_WEEK = (datetime.datetime(2030, 1, 8), datetime.datetime(2030, 1, 9))
+
+def test_only_searches_covering_a_changed_cell_are_unlinked():
+    client = fakeredis.FakeRedis()
+    midtown = cache_key(40.77, 40.74, -73.97, -74.0, *EVENING)
+    midtown_next_week = cache_key(40.77, 40.74, -73.97, -74.0, *NEXT_WEEK)
+    brooklyn = cache_key(40.66, 40.64, -73.94, -73.96, *EVENING)
+    for key in (midtown, midtown_next_week, brooklyn, 'sessions:1'):
+        client.set(key, '[]')
+
+    invalidator = CacheInvalidator(client)
+    changed = EventRecord(
+        event_source='MEETUP',
+        event_page_url='https://www.meetup.com/nyc-python/events/301234567/',
+        event_start_time=datetime.datetime(2030, 1, 1, 19),
+        event_end_time=datetime.datetime(2030, 1, 1, 21),
+        latitude=40.758,
+        longitude=-73.9855,
+    )
+    evicted = invalidator.rows_changed('MEETUP', [changed])
+
+    assert evicted == 1
+    assert not client.exists(midtown)
+    assert client.exists(midtown_next_week)
+    assert client.exists(brooklyn)
+    assert client.exists('sessions:1')
+
+    [(_, entry)] = client.xrange(CHANGES_STREAM)
+    assert entry[b'source'] == b'MEETUP'
+    assert json.loads(entry[b'cells']) == {'4075:-7399': ['2030-01-01T19:00:00', '2030-01-01T21:00:00']}
+
+def test_events_without_coordinates_publish_nothing():
+    client = fakeredis.FakeRedis()
+    key = cache_key(40.77, 40.74, -73.97, -74.0, *EVENING)
+    client.set(key, '[]')
+
+    evicted = CacheInvalidator(client).rows_changed('EVENTBRITE', [EventRecord(event_source='EVENTBRITE')])
+
+    assert evicted == 0
+    assert client.exists(key)
+    assert client.xlen(CHANGES_STREAM) == 0
@@ -0,0 +1,70 @@
+import datetime
+import json
+
+import fakeredis
+import pytest
+
+import cache_warming
+from cache_invalidation import cache_key
+from conftest import read_fixture
+
+# A row as VIEWPORT_QUERY returns it, in EVENT_PROPERTIES order
+ROW = (
+    42, 'Python Project Night', 'Tue, Jan 1, 7:00 PM - 9:00 PM', 'Bring a laptop', '1 Penn Plaza, New York, NY',
+    'https://secure.meetupstatic.com/photos/event/1.jpeg', 'https://www.meetup.com/nyc-python/events/301234567/',
+    40.758, -73.9855, 12, datetime.datetime(2030, 1, 1, 19), datetime.datetime(2030, 1, 1, 21), 'MEETUP',
+    datetime.datetime(2029, 12, 30, 8, 15, 30, 250000), datetime.datetime(2029, 12, 31, 9),
+)
+MIDTOWN = {'name': 'midtown', 'north': 40.77, 'south': 40.74, 'east': -73.97, 'west': -74.0}
+
+@pytest.mark.parametrize('bounds, start, end, expected', [
+    # %.4f rounds half up; LocalDateTime.toString() drops zero seconds
+    ((40.71235, 40.7, -74.0, -74.00005), datetime.datetime(2030, 1, 1), datetime.datetime(2030, 1, 1, 23, 59, 59, 500000),
+     'events:bounds:40.7124:40.7000:-74.0000:-74.0001time:2030-01-01T00:00:2030-01-01T23:59:59.500'),
+    ((40.77, 40.74, -73.97, -74.0), datetime.datetime(2030, 1, 1, 18, 0, 5), datetime.datetime(2030, 1, 2, 0, 0, 5, 123456),
+     'events:bounds:40.7700:40.7400:-73.9700:-74.0000time:2030-01-01T18:00:05:2030-01-02T00:00:05.123456'),
+])
+def test_cache_key_matches_create_cache_key(bounds, start, end, expected):
+    assert cache_key(*bounds, start, end) == expected
+
+def test_serialized_events_match_the_backend_serializer():
+    expected = json.loads(read_fixture('warmed_events.json'))
+
+    assert cache_warming.serialize_events([ROW]) == json.dumps(expected, separators=(',', ':'))
+
+class Connection:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, query, params):
+        self.params = params
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+def test_warm_round_trips_through_redis(monkeypatch):
+    monkeypatch.setattr(cache_warming, 'setup_database_connection', lambda: Connection([ROW]))
+    monkeypatch.setattr(cache_warming, 'check_schema', lambda conn: None)
+    client = fakeredis.FakeRedis()
+    warmer = cache_warming.CacheWarmer(client, [MIDTOWN], ranges=('tonight', 'tomorrow'))
+
+    assert warmer.warm(now=datetime.datetime(2030, 1, 1, 12)) == 2
+
+    tonight = 'events:bounds:40.7700:40.7400:-73.9700:-74.0000time:2030-01-01T18:00:2030-01-02T00:00'
+    tomorrow = 'events:bounds:40.7700:40.7400:-73.9700:-74.0000time:2030-01-02T00:00:2030-01-03T00:00'
+    assert json.loads(client.get(tonight)) == json.loads(read_fixture('warmed_events.json'))
+    # The event ends before tomorrow starts
+    assert client.get(tomorrow) == b'[]'
+    assert 0 < client.ttl(tonight) <= cache_warming.CACHE_TTL
@@ -0,0 +1,35 @@
+import threading
+
+from driver_pool import DriverPool
+from journal import Journal
+
+class FakeDriver:
+    def quit(self):
+        pass
+
+def test_failures_recorded_by_the_last_workers_are_retried_after_the_pool_drains(tmp_path):
+    journal = Journal('MEETUP', journal_dir=str(tmp_path), base_delay=0).open()
+    urls = ['https://www.meetup.com/a/events/1/', 'https://www.meetup.com/b/events/2/']
+    attempts = []
+    lock = threading.Lock()
+
+    def scrape_url(driver, url, index):
+        with lock:
+            attempts.append(url)
+            # The last URL fails once, after the listing has been exhausted
+            success = url != urls[-1] or attempts.count(url) > 1
+        journal.record(url, success)
+        return success
+
+    pool = DriverPool(
+        expand_listing=lambda driver: (url for url in urls if journal.claim(url)),
+        scrape_url=scrape_url,
+        num_workers=2,
+        create_driver=FakeDriver,
+        retries=journal,
+    )
+    stats = pool.run()
+
+    assert attempts.count(urls[-1]) == 2
+    assert (stats.scraped, stats.succeeded) == (3, 2)
+    assert not journal.retries_due()
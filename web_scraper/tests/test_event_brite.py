@@ -0,0 +1,29 @@
+import event_brite
+
+EVENT_URL = 'https://www.eventbrite.com/e/rooftop-jazz-night-tickets-912345678901'
+
+class Writer:
+    def __init__(self):
+        self.records = []
+
+    def add(self, record):
+        self.records.append(record)
+
+def not_ready(driver, url, ready=None, timeout=15, stage='navigation'):
+    # What scheduler.get returns for a challenge or a page that never rendered
+    return False
+
+def test_event_page_that_did_not_load_is_a_failure_and_not_extracted(monkeypatch):
+    monkeypatch.setattr(event_brite.scheduler, 'get', not_ready)
+    monkeypatch.setattr(event_brite, 'extract_event_details', lambda driver: ({'title': 'Challenge page'}, None))
+    writer = Writer()
+
+    assert event_brite.scrape_event_url(None, EVENT_URL, writer) is False
+    assert writer.records == []
+
+def test_listing_that_did_not_load_yields_no_event_urls(monkeypatch):
+    monkeypatch.setattr(event_brite.scheduler, 'get', not_ready)
+
+    urls = event_brite.iter_listing_event_urls(None, 'https://www.eventbrite.com/d/ny--new-york/events/', 3)
+
+    assert list(urls) == []
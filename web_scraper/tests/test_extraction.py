@@ -0,0 +1,150 @@
+import datetime
+import json
+
+import pytest
+
+import event_brite
+import meetup
+from conftest import read_fixture
+from event_record import eventbrite_record, meetup_record, parse_display_datetime
+
+class PageDriver:
+    # Answers the one script read_server_data runs the way a browser would
+    def __init__(self, page_source, exposes_global=True):
+        self.page_source = page_source
+        self.exposes_global = exposes_global
+
+    def execute_script(self, script):
+        assert script == event_brite.SERVER_DATA_SCRIPT
+        if not self.exposes_global:
+            return None
+        server_data = event_brite.extract_server_data(self.page_source)
+        return json.dumps(server_data) if server_data else None
+
+@pytest.fixture
+def eventbrite_page():
+    return read_fixture('eventbrite_event.html')
+
+def test_server_data_is_decoded_past_closing_braces_in_strings(eventbrite_page):
+    server_data = event_brite.extract_server_data(eventbrite_page)
+
+    assert server_data['event']['summary'] == 'Live quartet; doors at 7 };\n no cover'
+    assert len(server_data['event_listing_response']['tickets']['ticketClasses']) == 3
+
+def test_extract_event_from_page_source(eventbrite_page):
+    event_data, ticket_data = event_brite.extract_event_from_page_source(eventbrite_page)
+
+    assert event_data == {
+        'title': 'Rooftop Jazz Night',
+        'summary': 'Live quartet; doors at 7 };\n no cover',
+        'address': '545 W 30th St, New York, NY 10001',
+        'latitude': '40.7536',
+        'longitude': '-74.0022',
+        'image': 'https://img.evbuc.com/jazz.jpg',
+        'page_url': 'https://www.eventbrite.com/e/rooftop-jazz-night-tickets-912345678901',
+        'start_datetime': '2030-06-01T19:30:00-04:00',
+        'end_datetime': '2030-06-01T22:00:00-04:00',
+    }
+    # A class without a capacity counts as neither sold nor remaining
+    assert ticket_data == {
+        'total_capacity': 120,
+        'tickets_sold': 83,
+        'tickets_remaining': 37,
+        'ticket_statuses': ['AVAILABLE', 'SOLD_OUT', 'HIDDEN'],
+    }
+
+@pytest.mark.parametrize('exposes_global', [True, False])
+def test_extract_event_from_driver_with_and_without_the_global(eventbrite_page, exposes_global):
+    # Without window.__SERVER_DATA__ the payload is raw_decoded from page_source
+    driver = PageDriver(eventbrite_page, exposes_global)
+
+    assert event_brite.extract_event_from_driver(driver) == event_brite.extract_event_from_page_source(eventbrite_page)
+
+def test_page_without_server_data():
+    assert event_brite.extract_server_data('<html><h1>Just a moment...</h1></html>') is None
+    assert event_brite.extract_event_from_page_source('<html></html>') == ({}, None)
+
+def test_truncated_server_data_is_not_an_error(eventbrite_page):
+    truncated = eventbrite_page[:eventbrite_page.index('"venue"')]
+
+    assert event_brite.extract_event_from_page_source(truncated) == ({}, None)
+    assert event_brite.read_server_data(PageDriver(truncated, exposes_global=False)) is None
+
+def test_eventbrite_record_from_extracted_page(eventbrite_page):
+    record = eventbrite_record(*event_brite.extract_event_from_page_source(eventbrite_page))
+
+    assert record.event_title == 'Rooftop Jazz Night'
+    assert (record.latitude, record.longitude) == (40.7536, -74.0022)
+    assert record.event_start_date == 'Saturday, June 1'
+    assert record.event_date_time == 'Saturday, June 1, 2030 at 7:30 PM - 10:00 PM'
+    assert record.event_start_time.isoformat() == '2030-06-01T19:30:00-04:00'
+    assert (record.total_capacity, record.tickets_sold, record.tickets_remaining) == (120, 83, 37)
+    assert record.geo_tile is not None
+
+def test_extract_meetup_json_data_from_html():
+    meetup_data = meetup.extract_meetup_json_data_from_html(read_fixture('meetup_event.html'))
+
+    assert meetup_data == {
+        'title': 'Python Hack Night',
+        'description': 'Bring a laptop. Pizza at 7:30 </script> is escaped.',
+        'event_url': 'https://www.meetup.com/nyc-python/events/301234567/',
+        'start_datetime': '2030-05-01T19:00:00-04:00',
+        'end_datetime': '2030-05-01T21:30:00-04:00',
+        'timezone': 'America/New_York',
+        'going_count': 42,
+        'venue_name': 'Bryant Park',
+        'venue_address': '41 W 40th St',
+        'venue_city': 'New York',
+        'venue_state': 'NY',
+        'latitude': 40.7536,
+        'longitude': -73.9832,
+        'image_url': 'https://secure.meetupstatic.com/photos/event/highres_1.jpeg',
+        'full_address': '41 W 40th St, New York, NY',
+    }
+
+def test_meetup_record_from_extracted_page():
+    record = meetup_record(meetup.extract_meetup_json_data_from_html(read_fixture('meetup_event.html')))
+
+    assert record.event_source == 'MEETUP'
+    assert record.event_address == '41 W 40th St, New York, NY'
+    assert record.event_date_time == 'Wednesday, May 1, 2030 at 7:00 PM - 9:30 PM'
+    assert record.tickets_sold == 42
+
+def test_meetup_page_without_next_data():
+    assert meetup.extract_meetup_json_data_from_html('<html><title>Meetup</title></html>') is None
+
+def test_meetup_listing_urls_are_normalized_and_unique():
+    urls = meetup.get_event_urls_from_listing_html(read_fixture('meetup_listing.html'), 'https://www.meetup.com/find/')
+
+    assert urls == [
+        'https://www.meetup.com/nyc-python/events/301234567/',
+        'https://www.meetup.com/jazz-lovers/events/301234568/',
+    ]
+
+NOW = datetime.datetime(2030, 5, 20, tzinfo=datetime.timezone.utc)
+
+@pytest.mark.parametrize('text, start, end', [
+    ('Saturday, June 1 · 7:30 - 10pm EDT', (2030, 6, 1, 19, 30), (2030, 6, 1, 22, 0)),
+    ('Fri, May 31, 2030 11pm - 2am', (2030, 5, 31, 23, 0), (2030, 6, 1, 2, 0)),
+    # Long past without a year, so next year's
+    ('Sat, Jan 4 · 6:00 PM', (2031, 1, 4, 18, 0), None),
+    ('Saturday, June 1', None, None),
+])
+def test_display_datetime_from_the_dom_fallback(text, start, end):
+    parsed_start, parsed_end = parse_display_datetime(text, NOW, 'America/New_York')
+
+    as_tuple = lambda dt: dt and (dt.year, dt.month, dt.day, dt.hour, dt.minute)
+    assert (as_tuple(parsed_start), as_tuple(parsed_end)) == (start, end)
+
+def test_dom_fallback_record_gets_timestamps():
+    record = eventbrite_record({
+        'title': 'Rooftop Jazz Night',
+        'page_url': 'https://www.eventbrite.com/e/rooftop-jazz-night-tickets-912345678901',
+        'start_date': 'Saturday, June 1, 2030',
+        'date_time': 'Saturday, June 1 · 7:30 - 10pm EDT',
+    })
+
+    assert record.event_start_time.isoformat() == '2030-06-01T19:30:00-04:00'
+    assert record.event_end_time.isoformat() == '2030-06-01T22:00:00-04:00'
+    # The rendered strings are kept as they were shown
+    assert record.event_date_time == 'Saturday, June 1 · 7:30 - 10pm EDT'
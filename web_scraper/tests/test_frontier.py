@@ -0,0 +1,16 @@
+from event_record import EventRecord
+from frontier import Frontier
+
+URL = 'https://www.meetup.com/nyc-python/events/301234567/'
+
+def test_events_are_fresh_only_once_their_rows_are_committed(tmp_path):
+    frontier = Frontier('MEETUP', cache_path=str(tmp_path / 'frontier.json'))
+
+    # Scraped, but the write has not been committed (or failed)
+    assert not frontier.is_fresh(URL)
+
+    frontier.rows_flushed('EVENTBRITE', [EventRecord(event_source='EVENTBRITE', event_page_url=URL)])
+    assert not frontier.is_fresh(URL)
+
+    frontier.rows_flushed('MEETUP', [EventRecord(event_source='MEETUP', event_page_url=URL.rstrip('/'))])
+    assert frontier.is_fresh(URL)
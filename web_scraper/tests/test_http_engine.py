@@ -0,0 +1,67 @@
+import os
+import sys
+
+import pytest
+
+import meetup
+from conftest import read_fixture
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+from corpus import ORIGIN_TOKEN
+from recording_writer import RecordingWriter
+from replay_server import start_replay_server
+
+EVENT_ID = '301234567'
+
+class ClosingWriter(RecordingWriter):
+    closed = False
+
+    def close(self):
+        super().close()
+        self.closed = True
+
+@pytest.fixture
+def fast_scheduler(monkeypatch):
+    # The replay server is local, so nothing needs pacing
+    monkeypatch.setattr(meetup.scheduler, 'default_limit', (1e6, 10 ** 6))
+    monkeypatch.setattr(meetup.scheduler, 'jitter', 0)
+    monkeypatch.setattr(meetup.scheduler, 'adaptive', False)
+    monkeypatch.setattr(meetup.scheduler, 'buckets', {})
+
+def serve(corpus_dir, listing_html):
+    pages = {
+        'meetup/find/index.html': listing_html,
+        f'meetup/events/{EVENT_ID}/index.html': read_fixture('meetup_event.html'),
+    }
+    for path, html in pages.items():
+        path = os.path.join(corpus_dir, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(html)
+    return start_replay_server(corpus_dir)
+
+def test_http_engine_scrapes_replayed_pages(tmp_path, fast_scheduler):
+    listing = f'<a href="{ORIGIN_TOKEN}/meetup/events/{EVENT_ID}/?recId=a1">Python Hack Night</a>'
+    server, origin = serve(str(tmp_path), listing)
+    writer = ClosingWriter()
+    try:
+        meetup.run_http_engine(f"{origin}/meetup/find/", writer=writer)
+    finally:
+        server.shutdown()
+
+    assert writer.closed
+    [record] = writer.rows.values()
+    assert record.event_source == 'MEETUP'
+    assert record.event_title == 'Python Hack Night'
+    assert record.event_page_url == 'https://www.meetup.com/nyc-python/events/301234567/'
+    assert (record.latitude, record.longitude) == (40.7536, -73.9832)
+    assert record.event_start_time is not None
+
+def test_http_engine_closes_the_writer_when_there_are_no_events():
+    writer = ClosingWriter()
+
+    meetup.run_http_engine('http://127.0.0.1:9/meetup/find/', event_urls=[], writer=writer)
+
+    assert writer.closed
+    assert writer.rows == {}
@@ -0,0 +1,20 @@
+from event_record import EventRecord
+from journal import Journal
+
+SAVED = 'https://www.meetup.com/nyc-python/events/301234567/'
+UNSAVED = 'https://www.meetup.com/nyc-python/events/301234568/'
+
+def test_only_flushed_events_are_completed(tmp_path):
+    journal = Journal('MEETUP', journal_dir=str(tmp_path)).open()
+    for url in (SAVED, UNSAVED):
+        assert journal.claim(url)
+        journal.record(url, True)
+    # The writer's final flush committed one row and failed the other
+    journal.rows_flushed('MEETUP', [EventRecord(event_source='MEETUP', event_page_url=SAVED)])
+    journal.close()
+
+    resumed = Journal('MEETUP', journal_dir=str(tmp_path)).open(resume=True)
+
+    assert resumed.pending() == [UNSAVED]
+    assert not resumed.claim(SAVED)
+    resumed.close()
@@ -0,0 +1,47 @@
+import json
+
+from listing_harvester import NetworkRecorder
+
+def log_entry(method, **params):
+    return {'message': json.dumps({'message': {'method': method, 'params': params}})}
+
+def response_received(request_id, url='https://www.meetup.com/gql2'):
+    return log_entry('Network.responseReceived', requestId=request_id,
+                     response={'url': url, 'mimeType': 'application/json'})
+
+class LoggingDriver:
+    # Hands out one batch of performance log entries per get_log call and
+    # only serves bodies that have finished loading, like Chrome
+    def __init__(self, batches, bodies):
+        self.batches = list(batches)
+        self.bodies = bodies
+        self.finished = set()
+
+    def get_log(self, name):
+        batch = self.batches.pop(0) if self.batches else []
+        for entry in batch:
+            message = json.loads(entry['message'])['message']
+            if message['method'] == 'Network.loadingFinished':
+                self.finished.add(message['params']['requestId'])
+        return batch
+
+    def execute_cdp_cmd(self, command, params):
+        assert params['requestId'] in self.finished, 'body read before it finished loading'
+        return {'body': json.dumps(self.bodies[params['requestId']])}
+
+def test_bodies_are_read_only_after_loading_finished():
+    driver = LoggingDriver(
+        [
+            [response_received('1'), response_received('2'), response_received('3', url='https://cdn.example.com/x')],
+            [log_entry('Network.loadingFinished', requestId='1'), log_entry('Network.loadingFailed', requestId='2')],
+        ],
+        {'1': {'page': 1}},
+    )
+    recorder = NetworkRecorder(driver, lambda url: 'gql2' in url)
+
+    # Still loading: nothing to read yet
+    assert list(recorder.drain()) == []
+    assert recorder.loading == {'1', '2'}
+
+    assert list(recorder.drain()) == [{'page': 1}]
+    assert recorder.loading == set()
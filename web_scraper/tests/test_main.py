@@ -0,0 +1,23 @@
+import argparse
+
+import psycopg2
+
+import main
+
+def test_daemon_survives_a_failed_pass(monkeypatch):
+    passes = []
+
+    def run_once(args, source_queries, driver_options, invalidator, warmer=None):
+        passes.append(len(passes) + 1)
+        if len(passes) == 1:
+            raise psycopg2.OperationalError('connection refused')
+        # An interrupted pass stops the daemon
+        return False
+
+    monkeypatch.setattr(main, 'run_once', run_once)
+    monkeypatch.setattr(main, 'finish_run', lambda args: None)
+    monkeypatch.setattr(main.scheduler, 'report', lambda: None)
+
+    main.run_daemon(argparse.Namespace(interval_minutes=0), {}, {}, None)
+
+    assert passes == [1, 2]
@@ -0,0 +1,26 @@
+import meetup
+
+class Writer:
+    def __init__(self):
+        self.events = []
+
+    def add_meetup_event(self, meetup_data):
+        self.events.append(meetup_data)
+
+def not_ready(driver, url, ready=None, timeout=15, stage='navigation'):
+    # What scheduler.get returns for a challenge or a page that never rendered
+    return False
+
+def test_event_page_that_did_not_load_is_a_failure_and_not_extracted(monkeypatch):
+    monkeypatch.setattr(meetup.scheduler, 'get', not_ready)
+    monkeypatch.setattr(meetup, 'extract_meetup_json_data', lambda driver: {'title': 'Challenge page'})
+    writer = Writer()
+
+    assert meetup.scrape_event_url(None, 'https://www.meetup.com/nyc-python/events/301234567/', 1, writer) is False
+    assert writer.events == []
+
+def test_listing_that_did_not_load_yields_no_event_urls(monkeypatch):
+    monkeypatch.setattr(meetup.scheduler, 'get', not_ready)
+    monkeypatch.setattr(meetup, 'get_event_urls_from_listing_driver', lambda driver, max_scrolls: ['stale'])
+
+    assert list(meetup.iter_listing_event_urls(None, 'https://www.meetup.com/find/')) == []
@@ -0,0 +1,27 @@
+import queue
+import threading
+
+import refresh
+
+def test_refresh_pool_scrapes_a_url_every_time_it_is_dispatched(monkeypatch):
+    scraped = []
+    lock = threading.Lock()
+
+    def scrape_source_url(source, engine, driver, url, index, writer):
+        with lock:
+            scraped.append(url)
+        return True
+
+    monkeypatch.setattr(refresh, 'scrape_source_url', scrape_source_url)
+    outbox = queue.Queue()
+    url = 'https://www.meetup.com/nyc-python/events/301234567/'
+    # Dispatched again by RefreshQueue once its refresh interval passed
+    for item in (url, url, None):
+        outbox.put(item)
+
+    pool = refresh.build_refresh_pool('MEETUP', outbox, threading.Event(), writer=None, workers=2,
+                                      driver_options={}, engine='http')
+    stats = pool.run()
+
+    assert scraped == [url, url]
+    assert (stats.discovered, stats.scraped, stats.succeeded) == (2, 2, 2)